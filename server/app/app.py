@@ -1,19 +1,31 @@
 import base64
 import os 
 import logging
-from flask import Flask, jsonify
+from flask import Flask, jsonify, Response, request
 from flask_cors import CORS
-from flask_socketio import SocketIO, emit
+from flask_socketio import emit
+from app.extensions import socketio
 from app.web_socket_handlers import * 
 from app.config import Config
+from app import metrics
 from app.routes.api import api as api_blueprint
+from app.transcription.warm_up import start_warm_up, readiness
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-socketio = SocketIO(cors_allowed_origins="*")
-
-def create_app(config_class=Config):
+def create_app(config_class=Config, warm_up=True):
+    """
+    Build the Flask app.
+    
+    ``flask run`` finds and calls this factory itself, so the module builds
+    no app at import time; worker processes that re-import it start nothing.
+    
+    Args:
+        config_class (type): Configuration to load
+        warm_up (bool): Start the background warm-up (and worker pool) when
+            PRELOAD_DEFAULT_MODEL is set; off in processes that do not serve
+    """
     app = Flask(__name__)
     app.config.from_object(config_class)
     
@@ -23,28 +35,51 @@ def create_app(config_class=Config):
     
     app.register_blueprint(api_blueprint, url_prefix='/api')
     
+    # Load the default model and run a dummy inference in the background so
+    # the first request doesn't pay for it
+    if config_class.PRELOAD_DEFAULT_MODEL and warm_up:
+        start_warm_up()
+    
+    # Liveness: answers as soon as the process is up
     @app.route('/')
     def health_check():
         return jsonify({
             'status': 'ok',
             'message': 'Meeting API is running'
         })
+    
+    # Readiness: 503 until the models are warm, so traffic only reaches warm servers
+    @app.route('/ready')
+    def readiness_check():
+        ready, details = readiness()
+        return jsonify(details), 200 if ready else 503
+    
+    if config_class.ENABLE_METRICS:
+        @app.route('/metrics')
+        def metrics_endpoint():
+            body, content_type = metrics.render()
+            return Response(body, content_type=content_type)
 
     return app  # Ensure the app instance is returned
 
-app = create_app()  # Create the app instance using the create_app function
-
 @socketio.on('connect')
 def handle_connect():
     logger.info('Client connected')
+    metrics.SOCKET_CONNECTIONS.inc()
 
 @socketio.on('disconnect')
 def handle_disconnect():
     logger.info('Client disconnected')
+    metrics.SOCKET_CONNECTIONS.dec()
+    # Stop the decoders, refinement tasks and models of any recordings left open
+    close_client_sessions(request.sid)
     
 
 if __name__ == '__main__':
     logger.info('Starting Transcription API server')
+    # The debug reloader re-runs this module in a child process that serves;
+    # this one only watches files and must not warm up or start workers
+    app = create_app(warm_up=os.environ.get('WERKZEUG_RUN_MAIN') == 'true')
     socketio.run(app, debug=True, host='0.0.0.0', port=5000)
 
     
@@ -0,0 +1,92 @@
+import struct
+from collections import namedtuple
+import numpy as np
+
+# Binary audio frame layout (little-endian):
+#   uint8   version (FRAME_VERSION)
+#   uint8   format code (see FRAME_FORMATS)
+#   uint16  recording_id length in bytes
+#   uint32  sample rate in Hz (ignored for webm)
+#   uint32  sequence number
+#   bytes   recording_id (UTF-8), zero-padded to a multiple of 4 bytes
+#   bytes   payload
+# The padding keeps float32 payloads 4-byte aligned so they can be viewed in place.
+FRAME_HEADER = struct.Struct('<BBHII')
+FRAME_VERSION = 1
+FRAME_FORMATS = {0: 'pcm16', 1: 'float32', 2: 'webm'}
+
+AudioFrame = namedtuple('AudioFrame', ['recording_id', 'format', 'sample_rate', 'sequence', 'payload'])
+
+def parse_audio_frame(frame):
+    """
+    Split a binary audio frame into its header fields and payload.
+    
+    Args:
+        frame (bytes): Frame as received from Socket.IO
+    
+    Returns:
+        AudioFrame: Header fields and a memoryview of the payload (no copy)
+    
+    Raises:
+        ValueError: If the frame is truncated or uses an unknown version or format
+    """
+    view = memoryview(frame)
+    if len(view) < FRAME_HEADER.size:
+        raise ValueError("Audio frame is shorter than its header")
+    
+    version, format_code, id_length, sample_rate, sequence = FRAME_HEADER.unpack_from(view)
+    if version != FRAME_VERSION:
+        raise ValueError(f"Unsupported audio frame version: {version}")
+    if format_code not in FRAME_FORMATS:
+        raise ValueError(f"Unknown audio frame format: {format_code}")
+    
+    payload_start = FRAME_HEADER.size + -(-id_length // 4) * 4
+    if len(view) < payload_start:
+        raise ValueError("Audio frame is shorter than its recording id")
+    
+    recording_id = bytes(view[FRAME_HEADER.size:FRAME_HEADER.size + id_length]).decode('utf-8')
+    return AudioFrame(recording_id, FRAME_FORMATS[format_code], sample_rate, sequence, view[payload_start:])
+
+def frame_samples(payload, audio_format, sample_rate, preprocessor, decoder=None):
+    """
+    Turn a raw audio payload into samples for a StreamingSession.
+    
+    PCM at the preprocessor's rate is returned as a view of the payload:
+    int16 stays int16 and is scaled when the session copies it into its
+    buffer, so neither format is copied here. Other rates are resampled.
+    WebM/Opus fragments go to the recording's StreamingDecoder when one is
+    given, and are otherwise decoded as a complete file. A payload without
+    a format (a base64 WAV chunk from an older client, say) is always
+    decoded on its own as a complete file.
+    
+    Args:
+        payload (bytes-like): Audio data
+        audio_format (str): 'pcm16', 'float32', 'webm', or None for a complete file
+        sample_rate (int): Rate of PCM payloads, defaults to the preprocessor's
+        preprocessor (AudioPreprocessor): Used to resample and decode
+        decoder (StreamingDecoder): Persistent decoder for WebM fragments
+    
+    Returns:
+        np.ndarray: Mono int16 or float32 samples at the preprocessor's rate
+    """
+    if audio_format is None:
+        return preprocessor.decode_bytes(bytes(payload))
+    
+    if audio_format == 'webm':
+        if decoder is not None:
+            return decoder.feed(payload)
+        return preprocessor.decode_bytes(bytes(payload))
+    
+    if audio_format == 'pcm16':
+        samples = np.frombuffer(payload, dtype='<i2', count=len(payload) // 2)
+        if sample_rate and sample_rate != preprocessor.sample_rate:
+            return preprocessor.pcm16_to_float(samples, sample_rate)
+        return samples
+    
+    if audio_format == 'float32':
+        samples = np.frombuffer(payload, dtype='<f4', count=len(payload) // 4)
+        if sample_rate and sample_rate != preprocessor.sample_rate:
+            return preprocessor.resample(samples, sample_rate)
+        return samples
+    
+    raise ValueError(f"Unsupported audio format: {audio_format}")
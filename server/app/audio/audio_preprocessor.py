@@ -1,96 +1,647 @@
+import os
 from io import BytesIO
-import numpy as np
-import librosa
-import webrtcvad
 import tempfile
-import os
+import itertools
+import subprocess
+import threading
+import numpy as np
 import logging
-import soundfile as sf
-from scipy.signal import butter, lfilter
+from app.config import Config
+
+# librosa, soundfile and webrtcvad are imported where they are first used so
+# that importing the app (and answering health checks) stays fast
 
 logger = logging.getLogger(__name__)
 
+# Leading atom types of MP4/M4A/MOV files. Their index ('moov') is often written
+# after the audio, which ffmpeg can only reach when it can seek in the input
+_ISO_MEDIA_ATOMS = (b'ftyp', b'moov', b'mdat', b'wide', b'free', b'skip')
+
+def needs_seekable_input(head):
+    """Whether encoded audio starting with ``head`` is an MP4/MOV container that cannot be read from a pipe."""
+    return head[4:8] in _ISO_MEDIA_ATOMS
+
 class AudioPreprocessor:
-    def __init__(self, sample_rate=16000):
+    # Spectrogram frames gated per block, bounding the spectrum held at once
+    GATING_BLOCK_FRAMES = 256
+    
+    def __init__(self, sample_rate=16000, n_fft=2048, hop_length=512):
         self.sample_rate = sample_rate
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        
+        import webrtcvad
         self.vad = webrtcvad.Vad()
-        self.vad.set_mode(3)
+        self.vad.set_mode(Config.VAD_AGGRESSIVENESS)
         logger.info(f"Initialized AudioPreprocessor with sample rate {sample_rate}Hz")
     
-    def preprocess_file(self, file_path, output_path):
+    def load_audio(self, file_path):
+        """
+        Decode an audio file into a mono float32 waveform at self.sample_rate.
+        
+        Args:
+            file_path (str): Path to the audio file
+            
+        Returns:
+            np.ndarray: Decoded waveform
+        """
+        return self._ffmpeg_decode(file_path)
+    
+    def decode_bytes(self, audio_bytes):
+        """
+        Decode an in-memory audio file into a mono float32 waveform.
+        
+        WAV, FLAC and OGG are read directly with soundfile; anything else
+        (MP3, WebM) is piped through ffmpeg without touching disk, except
+        MP4/M4A containers, which ffmpeg reads from a temporary file so it
+        can seek to an index stored after the audio.
+        
+        Args:
+            audio_bytes (bytes): Encoded audio
+            
+        Returns:
+            np.ndarray: Decoded waveform at self.sample_rate
+        """
+        import soundfile as sf
+        
+        try:
+            y, sr = sf.read(BytesIO(audio_bytes), dtype='float32', always_2d=True)
+        except RuntimeError:
+            if needs_seekable_input(audio_bytes):
+                with tempfile.NamedTemporaryFile(suffix='.m4a') as f:
+                    f.write(audio_bytes)
+                    f.flush()
+                    return self._ffmpeg_decode(f.name)
+            return self._ffmpeg_decode("pipe:0", audio_bytes)
+        
+        y = y.mean(axis=1) if y.shape[1] > 1 else y[:, 0]
+        if sr != self.sample_rate:
+            y = self.resample(y, sr)
+        return np.ascontiguousarray(y, dtype=np.float32)
+    
+    def probe_duration(self, audio_bytes):
+        """
+        Duration of an in-memory audio file read from its header, without decoding.
+        
+        Args:
+            audio_bytes (bytes): Encoded audio
+        
+        Returns:
+            float: Seconds, or None for formats soundfile cannot read (MP3, WebM, M4A)
+        """
+        import soundfile as sf
+        
         try:
-            y, sr = librosa.load(file_path, sr=self.sample_rate, mono=True)
-            y = self._normalize_audio(y)
-            y = self._apply_vad(y)
-            y = self._trim_silence(y)
-            y = self._reduce_noise(y)
+            info = sf.info(BytesIO(audio_bytes))
+        except RuntimeError:
+            return None
+        return info.frames / info.samplerate
+    
+    def pcm16_to_float(self, pcm_bytes, sample_rate=None):
+        """
+        Convert raw little-endian 16-bit mono PCM into a float32 waveform.
+        
+        Args:
+            pcm_bytes (bytes): Raw PCM samples
+            sample_rate (int): Rate of the PCM data, defaults to self.sample_rate
             
-            sf.write(output_path, y, self.sample_rate)
-            logger.info(f"Saved preprocessed audio to: {output_path}")
+        Returns:
+            np.ndarray: Waveform at self.sample_rate
+        """
+        y = np.frombuffer(pcm_bytes, dtype=np.int16).astype(np.float32) / 32768.0
+        if sample_rate and sample_rate != self.sample_rate:
+            y = self.resample(y, sample_rate)
+        return y
+    
+    def resample(self, y, sample_rate):
+        """Resample a float32 waveform from sample_rate to self.sample_rate."""
+        import librosa
+        return librosa.resample(y, orig_sr=sample_rate, target_sr=self.sample_rate).astype(np.float32, copy=False)
+    
+    def _ffmpeg_command(self, source):
+        return [
+            "ffmpeg", "-nostdin", "-loglevel", "error", "-threads", "0",
+            "-i", source,
+            "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le",
+            "-ar", str(self.sample_rate),
+            "-"
+        ]
+    
+    def _ffmpeg_decode(self, source, input_bytes=None):
+        try:
+            out = subprocess.run(self._ffmpeg_command(source), input=input_bytes, capture_output=True, check=True).stdout
+        except subprocess.CalledProcessError as e:
+            raise RuntimeError(f"Failed to decode audio: {e.stderr.decode(errors='ignore')}") from e
+        
+        return np.frombuffer(out, dtype=np.int16).astype(np.float32) / 32768.0
+    
+    def stream_file(self, file_path, block_seconds=None):
+        """
+        Decode an audio file through an ffmpeg pipe in fixed-size blocks.
+        
+        Args:
+            file_path (str): Path to the audio file
+            block_seconds (float): Block length, defaults to Config.PREPROCESS_BLOCK_SECONDS
+            
+        Yields:
+            np.ndarray: Mono float32 blocks at self.sample_rate
+        """
+        process = subprocess.Popen(self._ffmpeg_command(file_path), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        yield from self._read_blocks(process, block_seconds)
+    
+    def stream_bytes(self, chunks, block_seconds=None):
+        """
+        Decode an encoded audio stream through an ffmpeg pipe as it arrives.
+        
+        A writer thread feeds ``chunks`` to ffmpeg's stdin while blocks are
+        read from its stdout, so decoding keeps pace with a download instead
+        of waiting for it to finish. An exception raised by ``chunks`` stops
+        ffmpeg and is re-raised here. MP4/M4A streams are written to a
+        temporary file first and decoded from there, since ffmpeg may need
+        to seek to their index.
+        
+        Args:
+            chunks (iterable): Pieces of an encoded audio file
+            block_seconds (float): Block length, defaults to Config.PREPROCESS_BLOCK_SECONDS
+            
+        Yields:
+            np.ndarray: Mono float32 blocks at self.sample_rate
+        """
+        # The container is recognised from the first eight bytes
+        chunks = iter(chunks)
+        head = b''
+        while len(head) < 8:
+            chunk = next(chunks, None)
+            if chunk is None:
+                break
+            head += chunk
+        chunks = itertools.chain([head], chunks)
+        if needs_seekable_input(head):
+            yield from self._stream_spooled(chunks, block_seconds)
+            return
+        
+        process = subprocess.Popen(
+            self._ffmpeg_command("pipe:0"),
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        )
+        failure = []
+        
+        def feed():
+            try:
+                for chunk in chunks:
+                    process.stdin.write(chunk)
+            except (BrokenPipeError, ValueError):
+                pass  # ffmpeg exited or the reader stopped
+            except Exception as e:
+                failure.append(e)
+                process.kill()
+            finally:
+                try:
+                    process.stdin.close()
+                except OSError:
+                    pass
+        
+        writer = threading.Thread(target=feed, daemon=True)
+        writer.start()
+        try:
+            for block in self._read_blocks(process, block_seconds, failure):
+                yield block
+        finally:
+            writer.join(timeout=1)
+    
+    def _stream_spooled(self, chunks, block_seconds=None):
+        fd, path = tempfile.mkstemp(suffix='.m4a')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+            yield from self.stream_file(path, block_seconds)
+        finally:
+            os.remove(path)
+    
+    def _read_blocks(self, process, block_seconds=None, failure=()):
+        block_seconds = block_seconds or Config.PREPROCESS_BLOCK_SECONDS
+        block_bytes = int(block_seconds * self.sample_rate) * 2
+        
+        try:
+            while True:
+                data = process.stdout.read(block_bytes)
+                if not data:
+                    break
+                yield np.frombuffer(data[:len(data) & ~1], dtype=np.int16).astype(np.float32) / 32768.0
             
-            return output_path
+            returncode = process.wait()
+            if failure:
+                raise failure[0]
+            if returncode != 0:
+                raise RuntimeError(f"Failed to decode audio: {process.stderr.read().decode(errors='ignore')}")
+        finally:
+            process.stdout.close()
+            if process.poll() is None:
+                process.kill()
+            process.wait()
+            process.stderr.close()
+    
+    def preprocess(self, y, threshold_db=-40, return_kept=False, copy=True):
+        """
+        Run the fused preprocessing chain on a waveform.
+        
+        The signal is peak-normalized, VAD-gated, stripped of silence and
+        denoised. Denoising runs the overlap-add spectral gate of
+        _denoise_stream over the waveform block by block, writing back into
+        the working buffer, so only one block of spectrum exists at a time.
+        The frame power it collects drives silence detection, and non-speech
+        and silent stretches are cut in a single final pass.
+        
+        Args:
+            y (np.ndarray): Mono float32 waveform at self.sample_rate
+            threshold_db (int): Frames this far below the loudest frame count as silence
+            return_kept (bool): Also return the kept (start, end) sample
+                intervals of the input, or None if nothing was cut, so times in
+                the output can be mapped back with source_times()
+            copy (bool): Work on a copy of ``y``. With False, a writable
+                float32 ``y`` is overwritten, which saves a waveform-sized
+                allocation when the caller no longer needs the input
+            
+        Returns:
+            np.ndarray: Preprocessed waveform
+        """
+        if copy:
+            y = np.array(y, dtype=np.float32)
+        else:
+            y = np.require(y, dtype=np.float32, requirements=['C', 'W'])
+        if len(y) < self.n_fft:
+            return (y, None) if return_kept else y
+        
+        self._normalize_audio(y)
+        speech = self.speech_intervals(y)
+        frame_power = self._denoise(y)
+        
+        keep = self._keep_frames(frame_power, speech, threshold_db)
+        starts, ends = self._runs(keep)
+        if len(starts) == 0:
+            return (y, None) if return_kept else y
+        
+        y_trimmed = np.concatenate([
+            y[start * self.hop_length:min(end * self.hop_length, len(y))]
+            for start, end in zip(starts, ends)
+        ])
+        
+        original_duration = len(y) / self.sample_rate
+        trimmed_duration = len(y_trimmed) / self.sample_rate
+        reduction = 100 * (original_duration - trimmed_duration) / original_duration
+        
+        logger.info(f"Trimmed silence: {original_duration:.2f}s → {trimmed_duration:.2f}s ({reduction:.1f}% reduction)")
+        
+        if return_kept:
+            kept = np.stack([starts, ends], axis=1) * self.hop_length
+            return y_trimmed, np.minimum(kept, len(y))
+        return y_trimmed
+    
+    def source_times(self, times, kept):
+        """
+        Map times in a trimmed waveform back onto the untrimmed input.
+        
+        Args:
+            times (array-like): Seconds in the output of preprocess()
+            kept (np.ndarray): Intervals returned by preprocess(return_kept=True)
+            
+        Returns:
+            np.ndarray: Seconds in the original waveform
+        """
+        samples = np.asarray(times, dtype=np.float64) * self.sample_rate
+        if kept is None:
+            return samples / self.sample_rate
+        
+        lengths = kept[:, 1] - kept[:, 0]
+        trimmed_ends = np.cumsum(lengths)
+        index = np.minimum(np.searchsorted(trimmed_ends, samples, side='right'), len(kept) - 1)
+        offset = samples - (trimmed_ends[index] - lengths[index])
+        return (kept[index, 0] + np.minimum(offset, lengths[index])) / self.sample_rate
+    
+    def preprocess_file(self, file_path):
+        try:
+            return self.preprocess(self.load_audio(file_path), copy=False)
         except Exception as e:
             logger.error(f"Error preprocessing audio: {str(e)}")
             raise
     
     def preprocess_bytes(self, audio_bytes):
         try:
-            audio_in = BytesIO(audio_bytes)
-            y, sr = sf.read(audio_in, dtype='float32')
-            
-            y = self._normalize_audio(y)
-            y = self._apply_vad(y)
-            y = self._trim_silence(y)
-            y = self._reduce_noise(y)
-            
-            audio_out = BytesIO()
-            sf.write(audio_out, y, self.sample_rate, format="WAV")
-            return audio_out.getvalue()
+            return self.preprocess(self.decode_bytes(audio_bytes), copy=False)
         except Exception as e:
             logger.error(f"Error preprocessing audio bytes: {str(e)}")
             raise
     
-    def _apply_vad(self, y, frame_duration_ms=30):
-        frame_size = int(self.sample_rate * frame_duration_ms / 1000)
-        frames = [y[i:i+frame_size] for i in range(0, len(y), frame_size)]
+    def preprocess_stream(self, blocks, max_duration=None, denoise=True, vad=True):
+        """
+        Normalize, denoise and VAD-gate a stream of raw blocks in bounded memory.
         
-        speech_frames = [f for f in frames if self.vad.is_speech(f.tobytes(), self.sample_rate)]
+        Blocks are denoised with an overlap-add STFT that carries state across
+        block boundaries, and speech is assembled into regions that may span
+        blocks. Only one block, its spectrogram and the open speech region are
+        held at a time, however long the input is.
+        
+        Args:
+            blocks (iterable): Mono float32 blocks at self.sample_rate
+            max_duration (float): Longest region in seconds, defaults to Config.VAD_MAX_SEGMENT_DURATION
+            denoise (bool): Normalize and denoise before VAD; otherwise only segment
+            vad (bool): Keep only speech; otherwise the whole stream is cut into
+                consecutive regions of max_duration
+            
+        Yields:
+            tuple: (start, audio) speech regions, start in seconds from the beginning of the stream
+        """
+        max_duration = max_duration or Config.VAD_MAX_SEGMENT_DURATION
+        max_samples = int(max_duration * self.sample_rate)
+        
+        position = 0
+        region_start = 0
+        region = []
+        region_length = 0
+        
+        for block in (self._denoise_stream(blocks) if denoise else blocks):
+            for start, end in (self.speech_intervals(block) if vad else [(0, len(block))]):
+                for piece_start in range(start, end, max_samples):
+                    piece_end = min(piece_start + max_samples, end)
+                    
+                    # Only a region left open at the previous block edge can be extended
+                    if region and (piece_start != 0 or region_length + piece_end - piece_start > max_samples):
+                        yield region_start / self.sample_rate, np.concatenate(region)
+                        region, region_length = [], 0
+                    
+                    if not region:
+                        region_start = position + piece_start
+                    region.append(block[piece_start:piece_end])
+                    region_length += piece_end - piece_start
+                    
+                    if piece_end < len(block):
+                        yield region_start / self.sample_rate, np.concatenate(region)
+                        region, region_length = [], 0
+            
+            position += len(block)
         
-        return np.concatenate(speech_frames) if speech_frames else y
+        if region:
+            yield region_start / self.sample_rate, np.concatenate(region)
     
-    def _trim_silence(self, y, threshold_db=-40):
-        threshold = librosa.db_to_amplitude(threshold_db)
-        intervals = librosa.effects.split(y, top_db=abs(threshold_db))
+    def _denoise(self, y):
+        """
+        Spectrally gate a normalized waveform in place, block by block.
         
-        if len(intervals) == 0:
-            return y
+        Returns:
+            np.ndarray: Mean power of each frame before gating, aligned with
+                the centred frames of a full STFT of ``y``
+        """
+        block_samples = self.GATING_BLOCK_FRAMES * self.hop_length
+        blocks = (y[start:start + block_samples] for start in range(0, len(y), block_samples))
         
-        y_trimmed = np.concatenate([y[start:end] for start, end in intervals])
+        # Each block is copied into the stream's buffer before any output for
+        # it is produced, so output can overwrite the samples behind it
+        frame_power = []
+        position = 0
+        for out in self._denoise_stream(blocks, normalize=False, frame_power=frame_power):
+            y[position:position + len(out)] = out
+            position += len(out)
         
-        original_duration = len(y) / self.sample_rate
-        trimmed_duration = len(y_trimmed) / self.sample_rate
-        reduction = 100 * (original_duration - trimmed_duration) / original_duration
+        # The stream's frames start (n_fft / 2 - hop) samples before a centred STFT's
+        offset = (self.n_fft // 2 - self.hop_length) // self.hop_length
+        return np.concatenate(frame_power)[offset:offset + 1 + len(y) // self.hop_length]
+    
+    def _denoise_stream(self, blocks, normalize=True, frame_power=None):
+        """
+        Peak-normalize and spectrally gate a block stream with overlap-add.
         
-        logger.info(f"Trimmed silence: {original_duration:.2f}s → {trimmed_duration:.2f}s ({reduction:.1f}% reduction)")
+        Each bin's magnitude is mapped to exp(log1p(|S|) - log1p(noise)).
+        The noise profile is taken from the first second of the stream and
+        the normalization peak is the running maximum, so neither needs the
+        whole signal up front.
         
-        return y_trimmed
+        Args:
+            blocks (iterable): Mono float32 blocks
+            normalize (bool): Divide by the running peak; off for input that is already normalized
+            frame_power (list): If given, receives arrays of each frame's mean
+                power before gating
+            
+        Yields:
+            np.ndarray: Processed blocks, sample-aligned with the input
+        """
+        n_fft, hop = self.n_fft, self.hop_length
+        overlap = n_fft // hop - 1
+        window = np.hanning(n_fft + 1)[:-1].astype(np.float32)
+        window_norm = float(np.sum(window ** 2) / hop)
+        
+        # Leading zeros stand in for librosa's centre padding and are dropped from the output
+        pending = np.zeros(n_fft - hop, dtype=np.float32)
+        carry = np.zeros((overlap, hop), dtype=np.float32)
+        skip = n_fft - hop
+        remaining = 0
+        log_noise = None
+        peak = 0.0
+        
+        def overlap_add(buffer):
+            nonlocal carry, log_noise
+            n_frames = (len(buffer) - n_fft) // hop + 1
+            if n_frames <= 0:
+                return np.empty(0, dtype=np.float32), buffer
+            
+            frames = np.lib.stride_tricks.sliding_window_view(buffer, n_fft)[::hop][:n_frames] * window
+            spectrum = np.fft.rfft(frames, axis=1)
+            magnitude = np.abs(spectrum)
+            if frame_power is not None:
+                frame_power.append(np.einsum('ij,ij->i', magnitude, magnitude) / magnitude.shape[1])
+            if log_noise is None:
+                noise_frames = max(1, min(n_frames, self.sample_rate // hop))
+                log_noise = np.log1p(magnitude[:noise_frames].mean(axis=0) * 2)
+            
+            gain = np.log1p(magnitude)
+            gain -= log_noise
+            np.exp(gain, out=gain)
+            np.maximum(magnitude, 1e-10, out=magnitude)
+            gain /= magnitude
+            spectrum *= gain
+            
+            frames = (np.fft.irfft(spectrum, n=n_fft, axis=1) * window).astype(np.float32)
+            frames = frames.reshape(n_frames, overlap + 1, hop)
+            
+            ola = np.zeros((n_frames + overlap, hop), dtype=np.float32)
+            ola[:overlap] += carry
+            for j in range(overlap + 1):
+                ola[j:j + n_frames] += frames[:, j]
+            carry = ola[n_frames:]
+            
+            return ola[:n_frames].ravel() / window_norm, buffer[n_frames * hop:]
+        
+        def emit(out):
+            nonlocal skip, remaining
+            dropped = min(skip, len(out))
+            skip -= dropped
+            out = out[dropped:dropped + remaining]
+            remaining -= len(out)
+            return out
+        
+        for block in blocks:
+            if len(block) == 0:
+                continue
+            remaining += len(block)
+            if normalize:
+                peak = max(peak, float(block.max()), -float(block.min()))
+                block = block / peak if peak > 0 else block
+            
+            buffer = np.concatenate([pending, block])
+            out, pending = overlap_add(buffer)
+            out = emit(out)
+            if len(out):
+                yield out
+        
+        # Flush: pad so the last frames cover the tail, then drain the carry
+        out, _ = overlap_add(np.concatenate([pending, np.zeros(n_fft, dtype=np.float32)]))
+        out = emit(np.concatenate([out, carry.ravel() / window_norm]))
+        if len(out):
+            yield out
     
-    def _normalize_audio(self, y):
-        return librosa.util.normalize(y)
+    def speech_intervals(self, y, frame_duration_ms=None, padding_ms=None, min_speech_ms=None):
+        """
+        Run webrtcvad over a waveform and return smoothed speech intervals.
+        
+        The signal is converted to 16-bit PCM and split into fixed-size frames
+        in one vectorized pass (the final partial frame is zero-padded so every
+        frame is a valid VAD length). Runs of speech shorter than
+        ``min_speech_ms`` are discarded and the rest are padded by
+        ``padding_ms`` on both sides, which also bridges short pauses.
+        
+        Args:
+            y (np.ndarray): Mono float32 waveform at self.sample_rate
+            frame_duration_ms (int): VAD frame length (10, 20 or 30 ms)
+            padding_ms (int): Hangover added before and after each speech run
+            min_speech_ms (int): Shortest speech run kept
+            
+        Returns:
+            np.ndarray: Array of shape (n, 2) with (start, end) sample indexes
+        """
+        frame_duration_ms = frame_duration_ms or Config.VAD_FRAME_MS
+        padding_ms = Config.VAD_PADDING_MS if padding_ms is None else padding_ms
+        min_speech_ms = Config.VAD_MIN_SPEECH_MS if min_speech_ms is None else min_speech_ms
+        
+        frame_size = int(self.sample_rate * frame_duration_ms / 1000)
+        n_frames = -(-len(y) // frame_size)
+        if n_frames == 0:
+            return np.empty((0, 2), dtype=np.int64)
+        
+        pcm = np.zeros(n_frames * frame_size, dtype=np.int16)
+        np.multiply(np.clip(y, -1.0, 1.0), 32767, out=pcm[:len(y)], casting='unsafe')
+        
+        frame_bytes = frame_size * 2
+        buffer = memoryview(pcm).cast('B')
+        is_speech = np.fromiter(
+            (self.vad.is_speech(buffer[i:i + frame_bytes], self.sample_rate)
+             for i in range(0, len(buffer), frame_bytes)),
+            dtype=bool, count=n_frames
+        )
+        
+        # Drop speech runs that are too short to be words
+        min_frames = max(1, int(min_speech_ms / frame_duration_ms))
+        starts, ends = self._runs(is_speech)
+        for start, end in zip(starts, ends):
+            if end - start < min_frames:
+                is_speech[start:end] = False
+        
+        # Hangover: dilate the remaining speech frames on both sides
+        pad_frames = int(padding_ms / frame_duration_ms)
+        if pad_frames:
+            kernel = np.ones(2 * pad_frames + 1, dtype=np.int32)
+            is_speech = np.convolve(is_speech.astype(np.int32), kernel, mode='same') > 0
+        
+        starts, ends = self._runs(is_speech)
+        intervals = np.stack([starts, ends], axis=1) * frame_size
+        return np.minimum(intervals, len(y)).astype(np.int64)
     
-    def _reduce_noise(self, y):
-        noise_sample = y[:min(len(y), self.sample_rate)]
+    @staticmethod
+    def _runs(mask):
+        edges = np.diff(np.concatenate(([False], mask, [False])).astype(np.int8))
+        return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    
+    def detect_voice_activity(self, audio_bytes):
+        """
+        Detect speech in an encoded audio file.
+        
+        Args:
+            audio_bytes (bytes): Encoded audio
+            
+        Returns:
+            list: (start, end) pairs in seconds
+        """
+        return self.detect_speech_segments(self.decode_bytes(audio_bytes))
+    
+    def detect_speech_segments(self, y, merge_gap=None, max_duration=None):
+        """
+        Find the speech regions of a waveform.
+        
+        Adjacent regions separated by less than ``merge_gap`` seconds are merged,
+        and regions are capped at ``max_duration`` seconds so each one fits
+        a single Whisper window.
+        
+        Args:
+            y (np.ndarray): Mono float32 waveform at self.sample_rate
+            merge_gap (float): Longest silence in seconds bridged between regions
+            max_duration (float): Longest region in seconds
+            
+        Returns:
+            list: (start, end) pairs in seconds
+        """
+        merge_gap = Config.VAD_MERGE_GAP if merge_gap is None else merge_gap
+        max_duration = Config.VAD_MAX_SEGMENT_DURATION if max_duration is None else max_duration
         
-        S_full = librosa.stft(y)
-        magnitude = np.abs(S_full)
-        phase = np.angle(S_full)
+        segments = []
+        for start, end in self.speech_intervals(y) / self.sample_rate:
+            if segments and start - segments[-1][1] <= merge_gap and end - segments[-1][0] <= max_duration:
+                segments[-1][1] = end
+                continue
+            
+            # Split regions longer than one window
+            while end - start > max_duration:
+                segments.append([start, start + max_duration])
+                start += max_duration
+            segments.append([start, end])
         
-        noise_magnitude = np.abs(librosa.stft(noise_sample))
-        noise_profile = np.mean(noise_magnitude, axis=1) * 2
+        return [(float(start), float(end)) for start, end in segments]
+    
+    def _normalize_audio(self, y):
+        peak = max(float(y.max()), -float(y.min()))
+        if peak > 0:
+            y *= 1.0 / peak
+        return y
+    
+    def _keep_frames(self, frame_power, speech, threshold_db):
+        # Frames within threshold_db of the loudest frame
+        ref = frame_power.max()
+        if ref > 0:
+            loud = frame_power > ref * 10.0 ** (threshold_db / 10.0)
+        else:
+            loud = np.ones(len(frame_power), dtype=bool)
         
-        magnitude_filtered = np.exp(np.log1p(magnitude) - np.log1p(noise_profile.reshape(-1, 1)))
+        if len(speech) == 0:
+            return loud
         
-        S_filtered = magnitude_filtered * np.exp(1j * phase)
-        y_filtered = librosa.istft(S_filtered)
+        # Frames overlapping a VAD speech interval
+        voiced = np.zeros(len(frame_power), dtype=bool)
+        for start, end in speech:
+            voiced[start // self.hop_length:-(-end // self.hop_length) + 1] = True
         
-        return y_filtered
+        keep = loud & voiced
+        return keep if keep.any() else loud
+
+_thread_preprocessors = threading.local()
+
+def get_thread_preprocessor(sample_rate=16000):
+    """
+    Return an AudioPreprocessor shared by every caller on the current thread.
+    
+    webrtcvad keeps per-instance state, so instances are shared per thread
+    rather than process-wide.
+    """
+    preprocessors = getattr(_thread_preprocessors, 'by_rate', None)
+    if preprocessors is None:
+        preprocessors = _thread_preprocessors.by_rate = {}
+    if sample_rate not in preprocessors:
+        preprocessors[sample_rate] = AudioPreprocessor(sample_rate=sample_rate)
+    return preprocessors[sample_rate]
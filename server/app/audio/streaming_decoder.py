@@ -0,0 +1,116 @@
+import os
+import logging
+import threading
+import subprocess
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class StreamingDecoder:
+    """
+    Long-lived ffmpeg pipe that decodes a growing WebM/Opus stream.
+    
+    Browser MediaRecorder fragments are only decodable as one continuous
+    stream: the first fragment carries the container header and later ones
+    are bare clusters. Fragments are written to a single ffmpeg process as
+    they arrive, and a reader thread collects 16-bit PCM from its stdout, so
+    the container header is parsed once per recording rather than per chunk.
+    """
+    
+    READ_SIZE = 65536
+    
+    def __init__(self, sample_rate=16000, input_format='matroska'):
+        """
+        Start the decoder process.
+        
+        Args:
+            sample_rate (int): Output sample rate
+            input_format (str): ffmpeg demuxer for the incoming stream
+        """
+        self.sample_rate = sample_rate
+        self.process = subprocess.Popen(
+            [
+                "ffmpeg", "-nostdin", "-loglevel", "error",
+                # Decode as soon as data arrives instead of probing ahead
+                "-fflags", "nobuffer", "-probesize", "32", "-analyzeduration", "0",
+                "-f", input_format, "-i", "pipe:0",
+                "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le",
+                "-ar", str(sample_rate), "-flush_packets", "1",
+                "pipe:1"
+            ],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        )
+        
+        self._pcm = bytearray()
+        self._lock = threading.Lock()
+        self._reader = threading.Thread(target=self._read_output, daemon=True)
+        self._reader.start()
+    
+    def _read_output(self):
+        fd = self.process.stdout.fileno()
+        while True:
+            data = os.read(fd, self.READ_SIZE)
+            if not data:
+                break
+            with self._lock:
+                self._pcm += data
+    
+    def feed(self, fragment):
+        """
+        Write a container fragment and return the PCM decoded so far.
+        
+        ffmpeg decodes asynchronously, so samples for a fragment may only be
+        returned by a later call or by close().
+        
+        Args:
+            fragment (bytes-like): Next piece of the WebM stream
+        
+        Returns:
+            np.ndarray: Mono int16 samples at self.sample_rate (possibly empty)
+        """
+        try:
+            self.process.stdin.write(fragment)
+            self.process.stdin.flush()
+        except (BrokenPipeError, ValueError) as e:
+            raise RuntimeError(f"Audio decoder stopped: {self._error()}") from e
+        return self._drain()
+    
+    def close(self, timeout=5):
+        """
+        Finish the stream and return any remaining samples.
+        
+        Returns:
+            np.ndarray: Mono int16 samples not yet returned by feed()
+        """
+        if self.process.stdin and not self.process.stdin.closed:
+            try:
+                self.process.stdin.close()
+            except BrokenPipeError:
+                pass
+        
+        self._reader.join(timeout)
+        try:
+            self.process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        
+        if self.process.returncode not in (0, None):
+            logger.warning(f"Audio decoder exited with {self.process.returncode}: {self._error()}")
+        self.process.stdout.close()
+        self.process.stderr.close()
+        return self._drain()
+    
+    def _drain(self):
+        with self._lock:
+            # Keep an odd trailing byte for the next call
+            n = len(self._pcm) & ~1
+            pcm = bytes(self._pcm[:n])
+            del self._pcm[:n]
+        # StreamingSession.push scales int16 while copying into its buffer
+        return np.frombuffer(pcm, dtype=np.int16)
+    
+    def _error(self):
+        if self.process.poll() is None:
+            return "still running"
+        return self.process.stderr.read().decode(errors='ignore').strip()
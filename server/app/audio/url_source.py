@@ -0,0 +1,148 @@
+import time
+import logging
+import threading
+from urllib.parse import urljoin, urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+
+# Redirect hops followed before a download is refused
+MAX_REDIRECTS = 5
+
+class DownloadLimitError(Exception):
+    """Raised when a URL download exceeds the configured size or time limit."""
+    pass
+
+def url_error(url):
+    """
+    Check a URL against the allowed schemes and Config.ALLOWED_URL_DOMAINS.
+    
+    A domain allows itself and its subdomains; '*' allows any host.
+    
+    Returns:
+        str: Reason the URL is rejected, or None if it is allowed
+    """
+    parsed = urlparse(url)
+    if parsed.scheme not in ('http', 'https') or not parsed.hostname:
+        return 'Only http and https URLs are supported'
+    
+    host = parsed.hostname.lower()
+    for domain in Config.ALLOWED_URL_DOMAINS:
+        domain = domain.strip().lower()
+        if domain == '*' or host == domain or host.endswith('.' + domain):
+            return None
+    return f'Downloads from {host} are not allowed'
+
+_http_session = None
+_http_session_lock = threading.Lock()
+
+def get_http_session():
+    """Return the process-wide HTTP session, so connections are pooled across downloads."""
+    global _http_session
+    
+    with _http_session_lock:
+        if _http_session is None:
+            _http_session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=Config.MAX_CONCURRENT_JOBS, max_retries=2)
+            _http_session.mount('http://', adapter)
+            _http_session.mount('https://', adapter)
+    return _http_session
+
+def open_url(url, max_bytes=None):
+    """
+    Start downloading a URL after checking it against the download limits.
+    
+    Redirects are followed here rather than by requests, so every target
+    is checked against the allowed domains before it is contacted.
+    
+    Args:
+        url (str): http(s) URL on an allowed domain
+        max_bytes (int): Largest body accepted, defaults to Config.MAX_URL_DOWNLOAD_SIZE
+    
+    Returns:
+        requests.Response: Streaming response whose body has not been read;
+            use it as a context manager and read it with read_url()
+    
+    Raises:
+        ValueError: If the URL, or a redirect target, is not allowed, or
+            there are too many redirects
+        DownloadLimitError: If the declared body size is over the limit
+    """
+    max_bytes = max_bytes or Config.MAX_URL_DOWNLOAD_SIZE
+    
+    for _ in range(MAX_REDIRECTS + 1):
+        error = url_error(url)
+        if error:
+            raise ValueError(error)
+        
+        # The per-read timeout stops a stalled server from holding a worker indefinitely
+        response = get_http_session().get(url, stream=True, allow_redirects=False,
+                                          timeout=(10, min(Config.URL_DOWNLOAD_TIMEOUT, 30)))
+        if not response.is_redirect:
+            break
+        url = urljoin(url, response.headers['Location'])
+        response.close()
+    else:
+        raise ValueError(f"Too many redirects (more than {MAX_REDIRECTS})")
+    
+    try:
+        response.raise_for_status()
+        
+        declared = response.headers.get('Content-Length')
+        if declared and declared.isdigit() and int(declared) > max_bytes:
+            raise DownloadLimitError(f"Remote file is {int(declared) / 2**20:.1f}MB, "
+                                     f"over the {max_bytes / 2**20:.0f}MB limit")
+    except Exception:
+        response.close()
+        raise
+    return response
+
+def read_url(response, max_bytes=None, timeout=None):
+    """
+    Read a response body in chunks, enforcing the download limits as it goes.
+    
+    The time limit covers only the time spent waiting on the network. The
+    consumer usually transcribes each chunk before asking for the next, and
+    that time is not charged to the download. Each read returns as soon as
+    any data arrives, so a server trickling out a few bytes at a time is
+    cut off once the limit passes rather than after a whole chunk.
+    
+    Args:
+        response (requests.Response): Response returned by open_url()
+        max_bytes (int): Largest body accepted, defaults to Config.MAX_URL_DOWNLOAD_SIZE
+        timeout (float): Seconds of network time allowed, defaults to Config.URL_DOWNLOAD_TIMEOUT
+    
+    Yields:
+        bytes: Body chunks as they arrive
+    
+    Raises:
+        DownloadLimitError: If the body is too large or the download too slow
+    """
+    max_bytes = max_bytes or Config.MAX_URL_DOWNLOAD_SIZE
+    timeout = timeout or Config.URL_DOWNLOAD_TIMEOUT
+    
+    received = 0
+    network_time = 0.0
+    while True:
+        read_start = time.monotonic()
+        chunk = response.raw.read1(CHUNK_SIZE, decode_content=True)
+        network_time += time.monotonic() - read_start
+        if not chunk:
+            break
+        
+        received += len(chunk)
+        if received > max_bytes:
+            raise DownloadLimitError(f"Download exceeded the {max_bytes / 2**20:.0f}MB limit")
+        if network_time > timeout:
+            raise DownloadLimitError(f"Download took longer than {timeout}s")
+        yield chunk
+    
+    logger.info(f"Downloaded {received / 2**20:.1f}MB from {response.url} in {network_time:.2f}s of network time")
+
+def cache_validator(response):
+    """Return the ETag or Last-Modified header identifying this version of the body, or None."""
+    return response.headers.get('ETag') or response.headers.get('Last-Modified')
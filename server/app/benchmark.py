@@ -0,0 +1,282 @@
+import os
+import sys
+import json
+import time
+import platform
+import resource
+import argparse
+import subprocess
+from io import BytesIO
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import librosa
+import soundfile as sf
+import torch
+import whisper
+from app.config import Config
+from app.audio.audio_preprocessor import AudioPreprocessor
+from app.transcription.whisper_service import WhisperService
+
+SAMPLE_RATE = 16000
+
+# Synthetic clips are written at a typical capture rate so decoding includes a resample
+SYNTHETIC_SAMPLE_RATE = 44100
+
+BUNDLED_CLIP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "message.mp3")
+
+# Relative slowdown of a stage that counts as a regression against a baseline
+DEFAULT_TOLERANCE = 0.15
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far (never decreases)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return round(peak / (2**20 if sys.platform == "darwin" else 2**10), 1)
+
+def synthetic_speech(seconds, sample_rate=SYNTHETIC_SAMPLE_RATE, seed=0):
+    """
+    Speech-like test signal: voiced bursts separated by pauses, over noise.
+    
+    Bursts are harmonic stacks with a wandering pitch and a syllable-rate
+    envelope, so VAD, silence trimming and denoising all have work to do.
+    The content is not language, so only timings are meaningful.
+    """
+    rng = np.random.default_rng(seed)
+    n = int(seconds * sample_rate)
+    t = np.arange(n) / sample_rate
+    y = 0.01 * rng.standard_normal(n)
+    
+    position = 0.0
+    while position < seconds:
+        burst = rng.uniform(0.8, 3.0)
+        start, end = int(position * sample_rate), int(min(position + burst, seconds) * sample_rate)
+        tb = t[start:end]
+        pitch = 120 + 40 * np.sin(2 * np.pi * rng.uniform(0.5, 2) * tb)
+        phase = 2 * np.pi * np.cumsum(pitch) / sample_rate
+        voice = sum(np.sin(k * phase) / k for k in range(1, 8))
+        envelope = 0.5 * (1 - np.cos(2 * np.pi * 4 * tb)) * np.hanning(len(tb))
+        y[start:end] += 0.2 * voice * envelope
+        position += burst + rng.uniform(0.2, 1.2)
+    
+    return y.astype(np.float32)
+
+def timed(function, *args, repeats=1):
+    """Run function repeats times and return (last result, median seconds)."""
+    timings = []
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        result = function(*args)
+        timings.append(time.perf_counter() - start_time)
+    return result, float(np.median(timings))
+
+def load_clip(name, seconds):
+    """
+    Return (encoded bytes, sample rate) for a named clip.
+    
+    'bundled' is message.mp3; 'synthetic' is a WAV of synthetic_speech.
+    """
+    if name == "bundled":
+        with open(BUNDLED_CLIP, "rb") as f:
+            return f.read(), None
+    
+    buffer = BytesIO()
+    sf.write(buffer, synthetic_speech(seconds), SYNTHETIC_SAMPLE_RATE, format="WAV", subtype="PCM_16")
+    return buffer.getvalue(), SYNTHETIC_SAMPLE_RATE
+
+def benchmark_preprocessing(preprocessor, audio_bytes, sample_rate, repeats):
+    """
+    Time each preprocessing stage separately, mirroring AudioPreprocessor.preprocess.
+    
+    Returns:
+        tuple: (waveform at 16kHz, dict of stage timings in seconds)
+    """
+    stages = {}
+    
+    if sample_rate is None:
+        # Compressed input: ffmpeg decodes and resamples in one pass
+        y, stages["decode"] = timed(preprocessor.decode_bytes, audio_bytes, repeats=repeats)
+        stages["resample"] = 0.0
+    else:
+        decoded, stages["decode"] = timed(lambda b: sf.read(BytesIO(b), dtype="float32")[0], audio_bytes, repeats=repeats)
+        y, stages["resample"] = timed(
+            lambda x: librosa.resample(x, orig_sr=sample_rate, target_sr=SAMPLE_RATE), decoded, repeats=repeats
+        )
+        y = np.ascontiguousarray(y, dtype=np.float32)
+    
+    work = y.copy()
+    _, stages["normalize"] = timed(preprocessor._normalize_audio, work)
+    speech, stages["vad"] = timed(preprocessor.speech_intervals, work, repeats=repeats)
+    
+    frame_power, stages["denoise"] = timed(preprocessor._denoise, work)
+    
+    def trim(x):
+        keep = preprocessor._keep_frames(frame_power, speech, -40)
+        starts, ends = preprocessor._runs(keep)
+        if len(starts) == 0:
+            return x
+        hop = preprocessor.hop_length
+        return np.concatenate([x[start * hop:min(end * hop, len(x))] for start, end in zip(starts, ends)])
+    
+    _, stages["trim"] = timed(trim, work, repeats=repeats)
+    _, stages["preprocess_fused"] = timed(preprocessor.preprocess, y, repeats=repeats)
+    
+    return y, stages
+
+def benchmark_model(service, audio, repeats):
+    """
+    Time the encoder and decoder separately over the clip's 30-second windows,
+    then the full transcription path.
+    
+    Returns:
+        dict: Stage timings in seconds plus window count
+    """
+    model = service.model
+    windows = [audio[i:i + 30 * SAMPLE_RATE] for i in range(0, max(len(audio), 1), 30 * SAMPLE_RATE)]
+    mel = torch.stack([
+        whisper.log_mel_spectrogram(whisper.pad_or_trim(window), n_mels=model.dims.n_mels)
+        for window in windows
+    ]).to(model.device)
+    options = service._decoding_options()
+    
+    with torch.no_grad():
+        features, encoder_seconds = timed(model.embed_audio, mel, repeats=repeats)
+        # whisper.decode skips the encoder when handed audio features
+        _, decoder_seconds = timed(whisper.decode, model, features, options, repeats=repeats)
+    
+    # Every repeat gets a fresh copy, so none sees audio an earlier run preprocessed
+    _, total_seconds = timed(lambda: service.transcribe_audio(audio.copy()), repeats=repeats)
+    
+    return {
+        "windows": len(windows),
+        "encoder": encoder_seconds,
+        "decoder": decoder_seconds,
+        "transcribe_total": total_seconds
+    }
+
+def run_benchmarks(models, clips, lengths, repeats):
+    """
+    Benchmark every (model, clip) combination.
+    
+    Args:
+        models (list): Model keys to load
+        clips (list): 'bundled' and/or 'synthetic'
+        lengths (list): Synthetic clip lengths in seconds
+        repeats (int): Timed runs per stage (median reported)
+    
+    Returns:
+        dict: Environment metadata and one result per case
+    """
+    # Every run must decode, not hit the result cache
+    Config.ENABLE_RESULT_CACHE = False
+    preprocessor = AudioPreprocessor(sample_rate=SAMPLE_RATE)
+    
+    cases = [("bundled", None)] if "bundled" in clips else []
+    cases += [("synthetic", seconds) for seconds in lengths] if "synthetic" in clips else []
+    
+    results = []
+    for model_key in models:
+        with WhisperService(model_key) as service:
+            for clip, seconds in cases:
+                audio_bytes, sample_rate = load_clip(clip, seconds)
+                audio, stages = benchmark_preprocessing(preprocessor, audio_bytes, sample_rate, repeats)
+                duration = len(audio) / SAMPLE_RATE
+                
+                model_stages = benchmark_model(service, audio, repeats)
+                stages.update(encoder=model_stages["encoder"], decoder=model_stages["decoder"])
+                total = stages["decode"] + stages["resample"] + model_stages["transcribe_total"]
+                
+                results.append({
+                    "name": f"{model_key}/{clip}/{round(duration)}s",
+                    "model": model_key,
+                    "clip": clip,
+                    "audio_seconds": round(duration, 3),
+                    "windows": model_stages["windows"],
+                    "stages": {stage: round(seconds, 4) for stage, seconds in stages.items()},
+                    "total_seconds": round(total, 4),
+                    "real_time_factor": round(total / duration, 4) if duration else None,
+                    "throughput": round(duration / total, 2) if total else None,
+                    "peak_rss_mb": peak_rss_mb()
+                })
+                print(f"{results[-1]['name']}: RTF {results[-1]['real_time_factor']}, "
+                      f"peak RSS {results[-1]['peak_rss_mb']}MB", file=sys.stderr)
+    
+    return {"environment": environment(repeats), "results": results}
+
+def environment(repeats):
+    """Build metadata needed to tell whether two reports are comparable."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "torch_threads": torch.get_num_threads(),
+        "cuda": torch.cuda.is_available(),
+        "precision": Config.INFERENCE_PRECISION,
+        "beam_size": Config.DECODE_BEAM_SIZE,
+        "repeats": repeats
+    }
+
+def compare_reports(baseline, current, tolerance=DEFAULT_TOLERANCE):
+    """
+    List stages that got slower than baseline by more than tolerance.
+    
+    Returns:
+        list: Regression descriptions, empty if none
+    """
+    baseline_cases = {case["name"]: case for case in baseline["results"]}
+    regressions = []
+    for case in current["results"]:
+        previous = baseline_cases.get(case["name"])
+        if previous is None:
+            continue
+        
+        metrics = dict(case["stages"], total_seconds=case["total_seconds"])
+        previous_metrics = dict(previous["stages"], total_seconds=previous["total_seconds"])
+        for metric, seconds in metrics.items():
+            before = previous_metrics.get(metric)
+            # Ignore sub-millisecond stages, which are all noise
+            if before and before > 0.001 and seconds > before * (1 + tolerance):
+                regressions.append(f"{case['name']} {metric}: {before:.4f}s -> {seconds:.4f}s "
+                                   f"(+{100 * (seconds / before - 1):.0f}%)")
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark preprocessing and transcription speed")
+    parser.add_argument("--models", default="tiny,base", help="Comma-separated model keys")
+    parser.add_argument("--clips", default="bundled,synthetic", help="bundled and/or synthetic")
+    parser.add_argument("--lengths", default="10,30,120", help="Synthetic clip lengths in seconds")
+    parser.add_argument("--repeats", type=int, default=3, help="Timed runs per stage")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    parser.add_argument("--baseline", help="Earlier JSON report to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed relative slowdown per stage")
+    args = parser.parse_args()
+    
+    report = run_benchmarks(
+        args.models.split(","),
+        args.clips.split(","),
+        [float(seconds) for seconds in args.lengths.split(",")],
+        args.repeats
+    )
+    
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+    
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_reports(json.load(f), report, args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}", file=sys.stderr)
+        sys.exit(1 if regressions else 0)
@@ -15,45 +15,114 @@ class Config:
             'description': 'Fastest, lowest accuracy (good for testing)',
             'size': '~75MB',
             'speed': 'Very Fast (32x real-time)',
-            'english_only': True
+            'english_only': True,
+            'memory_mb': 150  # resident fp32 weights
         },
         'base': {
             'name': 'Base',
             'description': 'Good balance of speed and accuracy',
             'size': '~150MB',
             'speed': 'Fast (16x real-time)',
-            'english_only': True
+            'english_only': True,
+            'memory_mb': 300  # resident fp32 weights
         },
         'small': {
             'name': 'Small',
             'description': 'Better accuracy, slower speed',
             'size': '~500MB',
             'speed': 'Medium (6x real-time)',
-            'english_only': True
+            'english_only': True,
+            'memory_mb': 1000  # resident fp32 weights
         },
         'medium': {
             'name': 'Medium',
             'description': 'High accuracy, significantly slower',
             'size': '~1.5GB',
             'speed': 'Slow (2x real-time)',
-            'english_only': True
+            'english_only': True,
+            'memory_mb': 3100  # resident fp32 weights
         },
         'large': {
             'name': 'Large',
             'description': 'Highest accuracy, slowest speed',
             'size': '~3GB',
             'speed': 'Very Slow (1x real-time)',
-            'english_only': False
+            'english_only': False,
+            'memory_mb': 6200  # resident fp32 weights
         }
     }
     
     DEFAULT_WHISPER_MODEL = os.getenv('DEFAULT_WHISPER_MODEL', 'base')
+    MODEL_MEMORY_BUDGET_MB = int(os.getenv('MODEL_MEMORY_BUDGET_MB', '4096'))  # RAM for resident models per process
+    PRELOAD_DEFAULT_MODEL = os.getenv('PRELOAD_DEFAULT_MODEL', 'True') == 'True'  # warm up in the background; /ready waits for it
     WHISPER_ENGLISH_ONLY = os.getenv('WHISPER_ENGLISH_ONLY', 'True') == 'True'
     
+    # CPU inference precision: 'fp32', 'bf16' (autocast) or 'int8' (dynamic quantization of Linear layers).
+    # Ignored on CUDA, where decoding already runs in fp16.
+    INFERENCE_PRECISION = os.getenv('INFERENCE_PRECISION', 'fp32')
+    
+    # Checkpoints are converted once into MODEL_STORE_DIR and memory-mapped read-only,
+    # so every worker process on the host shares one copy of the weights
+    ENABLE_MAPPED_WEIGHTS = os.getenv('ENABLE_MAPPED_WEIGHTS', 'True') == 'True'
+    MODEL_STORE_DIR = os.getenv('MODEL_STORE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'models'))
+    
      # Audio preprocessing settings
     ENABLE_AUDIO_PREPROCESSING = os.getenv('ENABLE_AUDIO_PREPROCESSING', 'True') == 'True'
     ENABLE_VAD = os.getenv('ENABLE_VAD', 'True') == 'True'
     VAD_AGGRESSIVENESS = int(os.getenv('VAD_AGGRESSIVENESS', '3'))  # 0-3, higher is more aggressive
+    VAD_FRAME_MS = int(os.getenv('VAD_FRAME_MS', '30'))  # 10, 20 or 30 ms
+    VAD_PADDING_MS = int(os.getenv('VAD_PADDING_MS', '210'))  # hangover added around speech runs
+    VAD_MIN_SPEECH_MS = int(os.getenv('VAD_MIN_SPEECH_MS', '90'))  # shorter speech runs are ignored
+    VAD_MERGE_GAP = float(os.getenv('VAD_MERGE_GAP', '0.5'))  # seconds of silence bridged between speech regions
+    VAD_MAX_SEGMENT_DURATION = float(os.getenv('VAD_MAX_SEGMENT_DURATION', '30'))  # seconds, one Whisper window
+    
+    # Uploads of at least this size are decoded and preprocessed in fixed-size blocks;
+    # keep it below MAX_CONTENT_LENGTH or no upload takes the block path
+    CHUNKED_PREPROCESSING_MIN_BYTES = int(os.getenv('CHUNKED_PREPROCESSING_MIN_MB', '8')) * 1024 * 1024
+    PREPROCESS_BLOCK_SECONDS = float(os.getenv('PREPROCESS_BLOCK_SECONDS', '30'))
+    
+    # Batched decoding settings
+    ENABLE_BATCHED_DECODING = os.getenv('ENABLE_BATCHED_DECODING', 'True') == 'True'
+    TRANSCRIBE_BATCH_SIZE = int(os.getenv('TRANSCRIBE_BATCH_SIZE', '8'))  # 30s windows per forward pass
+    DECODE_BEAM_SIZE = int(os.getenv('DECODE_BEAM_SIZE', '0'))  # 0 for greedy decoding
+    ENABLE_WORD_TIMESTAMPS = os.getenv('ENABLE_WORD_TIMESTAMPS', 'True') == 'True'  # one extra alignment pass per window
+    
+    # Speculative decoding: a small resident model drafts tokens that the selected model verifies
+    # in one pass. Greedy decoding only; the draft must share the selected model's tokenizer
+    # (e.g. tiny.en for base.en-medium.en, or multilingual tiny for large). Speculation runs one
+    # window at a time, so it only applies when a single window is decoded; batched VAD regions
+    # and micro-batches of several clips keep the batched decoder.
+    SPECULATIVE_DRAFT_MODEL = os.getenv('SPECULATIVE_DRAFT_MODEL', '')  # e.g. 'tiny'; empty disables
+    SPECULATIVE_DRAFT_TOKENS = int(os.getenv('SPECULATIVE_DRAFT_TOKENS', '5'))  # tokens proposed per verification pass
+    
+    # Transcription worker pool settings
+    ENABLE_WORKER_POOL = os.getenv('ENABLE_WORKER_POOL', 'True') == 'True'
+    # Every worker holds its own copy of the models it has used, on top of the web process's,
+    # so the default is a small fixed count; each worker gets a share of the cores for torch
+    MAX_CONCURRENT_JOBS = int(os.getenv('MAX_CONCURRENT_JOBS', str(min(2, os.cpu_count() or 1))))  # worker processes
+    WORKER_TORCH_THREADS = int(os.getenv('WORKER_TORCH_THREADS', str(max(1, (os.cpu_count() or 1) // MAX_CONCURRENT_JOBS))))
+    MAX_QUEUED_JOBS = int(os.getenv('MAX_QUEUED_JOBS', str(2 * MAX_CONCURRENT_JOBS)))  # requests beyond this get 503
+    WORKER_JOB_TIMEOUT = float(os.getenv('WORKER_JOB_TIMEOUT', '900'))  # seconds a request waits for a worker job
+    
+    # Long uploads are cut at pauses into shards transcribed in parallel by the worker pool
+    ENABLE_SHARDED_TRANSCRIPTION = os.getenv('ENABLE_SHARDED_TRANSCRIPTION', 'True') == 'True'
+    SHARD_SECONDS = float(os.getenv('SHARD_SECONDS', '300'))  # target shard length
+    SHARD_OVERLAP_SECONDS = float(os.getenv('SHARD_OVERLAP_SECONDS', '2'))  # context decoded on both sides of a cut
+    SHARD_MIN_SECONDS = float(os.getenv('SHARD_MIN_SECONDS', '600'))  # shorter uploads are one worker job
+    
+    # Transcription result cache settings
+    ENABLE_RESULT_CACHE = os.getenv('ENABLE_RESULT_CACHE', 'True') == 'True'
+    CACHE_DIR = os.getenv('CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache'))
+    CACHE_MEMORY_ENTRIES = int(os.getenv('CACHE_MEMORY_ENTRIES', '256'))
+    CACHE_DISK_MAX_BYTES = int(os.getenv('CACHE_DISK_MAX_MB', '500')) * 1024 * 1024
+    
+    # Asynchronous job settings
+    JOB_STORE_MAX_JOBS = int(os.getenv('JOB_STORE_MAX_JOBS', '1000'))
+    JOB_RESULT_TTL = int(os.getenv('JOB_RESULT_TTL', '3600'))  # seconds finished jobs are kept
+    JOB_PROGRESS_INTERVAL = float(os.getenv('JOB_PROGRESS_INTERVAL', '0.25'))  # seconds between progress events
+    
+    # Prometheus metrics on /metrics
+    ENABLE_METRICS = os.getenv('ENABLE_METRICS', 'True') == 'True'
     
     GPT_MODEL = os.getenv('GPT_MODEL', 'gpt-3.5-turbo')
     
@@ -65,12 +134,31 @@ class Config:
         'URL': 'url'
     }
     
+    # Micro-batching of short clips (microphone snippets and live chunks)
+    ENABLE_MICRO_BATCHING = os.getenv('ENABLE_MICRO_BATCHING', 'True') == 'True'
+    MICRO_BATCH_MAX_SIZE = int(os.getenv('MICRO_BATCH_MAX_SIZE', '8'))
+    MICRO_BATCH_MAX_WAIT_MS = float(os.getenv('MICRO_BATCH_MAX_WAIT_MS', '10'))  # higher favours throughput over latency
+    
+    # Live streaming settings
+    STREAMING_BUFFER_SECONDS = int(os.getenv('STREAMING_BUFFER_SECONDS', '30'))  # rolling PCM window per session
+    STREAMING_MIN_DECODE_SECONDS = float(os.getenv('STREAMING_MIN_DECODE_SECONDS', '1.0'))  # new audio needed before re-decoding
+    STREAMING_MAX_TAIL_SECONDS = float(os.getenv('STREAMING_MAX_TAIL_SECONDS', '15'))  # force-commit once the unconfirmed tail is this long
+    STREAMING_PROMPT_CHARS = int(os.getenv('STREAMING_PROMPT_CHARS', '200'))  # committed text fed back as the prompt; 0 lets sessions share micro-batches
+    
+    # Two-tier live transcription: a small resident model emits provisional text right away and
+    # the session's chosen model re-transcribes each committed stretch in the background,
+    # emitting transcription_revision events keyed by segment_id
+    ENABLE_TWO_TIER_STREAMING = os.getenv('ENABLE_TWO_TIER_STREAMING', 'False') == 'True'
+    STREAMING_FAST_MODEL = os.getenv('STREAMING_FAST_MODEL', 'tiny')
+    STREAMING_FAST_MIN_DECODE_SECONDS = float(os.getenv('STREAMING_FAST_MIN_DECODE_SECONDS', '0.3'))  # new audio needed before a fast decode
+    
     MICROPHONE_SAMPLE_RATE = int(os.getenv('MICROPHONE_SAMPLE_RATE', '16000'))  # Hz
     MICROPHONE_CHANNELS = int(os.getenv('MICROPHONE_CHANNELS', '1'))  # Mono
     
     ALLOWED_URL_DOMAINS = os.getenv('ALLOWED_URL_DOMAINS', 'youtube.com,vimeo.com,drive.google.com').split(',')
     MAX_URL_DOWNLOAD_SIZE = int(os.getenv('MAX_URL_DOWNLOAD_SIZE', '100')) * 1024 * 1024  # 100 MB
-    URL_DOWNLOAD_TIMEOUT = int(os.getenv('URL_DOWNLOAD_TIMEOUT', '300'))  # seconds
+    URL_DOWNLOAD_TIMEOUT = int(os.getenv('URL_DOWNLOAD_TIMEOUT', '300'))  # seconds spent waiting on the network
+    URL_BLOCK_SECONDS = float(os.getenv('URL_BLOCK_SECONDS', '5'))  # decoded audio handed to VAD at a time while downloading
     
     UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
     ALLOWED_EXTENSIONS = {'wav', 'mp3', 'ogg', 'flac', 'webm', 'm4a'}
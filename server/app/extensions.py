@@ -0,0 +1,7 @@
+from flask_socketio import SocketIO
+from app.transcription.batch_scheduler import BatchScheduler
+
+socketio = SocketIO(cors_allowed_origins="*")
+
+# Waiting callers yield to the Socket.IO event loop so other clips can join the batch
+batch_scheduler = BatchScheduler(sleep=socketio.sleep)
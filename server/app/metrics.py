@@ -0,0 +1,99 @@
+from prometheus_client import Counter, Gauge, Histogram, REGISTRY, generate_latest, CONTENT_TYPE_LATEST
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from app.config import Config
+
+# Seconds spent in a stage: from a short clip's VAD pass up to a long file's decode
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+AUDIO_BUCKETS = (1, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+
+LABELS = ('model', 'source')
+
+PREPROCESS_SECONDS = Histogram('whisper_preprocess_seconds', 'Audio preprocessing time', LABELS, buckets=STAGE_BUCKETS)
+VAD_SECONDS = Histogram('whisper_vad_seconds', 'Voice activity detection time', LABELS, buckets=STAGE_BUCKETS)
+MODEL_SECONDS = Histogram('whisper_model_seconds', 'Whisper encode/decode time', LABELS, buckets=STAGE_BUCKETS)
+QUEUE_WAIT_SECONDS = Histogram('whisper_queue_wait_seconds', 'Time a job waited for a worker', LABELS, buckets=STAGE_BUCKETS)
+AUDIO_SECONDS = Histogram('whisper_audio_duration_seconds', 'Duration of transcribed audio', LABELS, buckets=AUDIO_BUCKETS)
+
+CACHE_LOOKUPS = Counter('whisper_cache_lookups_total', 'Result cache lookups', ('result',))
+ERRORS = Counter('whisper_errors_total', 'Failed transcriptions', ('source', 'stage'))
+
+SOCKET_CONNECTIONS = Gauge('whisper_socket_connections', 'Connected Socket.IO clients')
+STREAMING_SESSIONS = Gauge('whisper_streaming_sessions', 'Live recordings being transcribed')
+
+_STAGE_HISTOGRAMS = (
+    ('preprocess', PREPROCESS_SECONDS),
+    ('vad', VAD_SECONDS),
+    ('model', MODEL_SECONDS),
+    ('audio', AUDIO_SECONDS),
+)
+
+def source_label(source_type):
+    """Map a request's source_type onto Config.AUDIO_SOURCES, keeping label cardinality bounded."""
+    return source_type if source_type in Config.AUDIO_SOURCES.values() else 'unknown'
+
+def record_transcription(model_key, source_type, timings, cache_status=None, queue_wait=None):
+    """
+    Record one finished transcription.
+    
+    Args:
+        model_key (str): Model that produced it
+        source_type (str): Value from Config.AUDIO_SOURCES
+        timings (dict): Stage durations from WhisperService.last_timings
+        cache_status (str): 'hit', 'miss' or 'disabled'
+        queue_wait (float): Seconds spent waiting for a worker, if queued
+    """
+    source = source_label(source_type)
+    for stage, histogram in _STAGE_HISTOGRAMS:
+        if stage in timings:
+            histogram.labels(model_key, source).observe(timings[stage])
+    
+    if queue_wait is not None:
+        QUEUE_WAIT_SECONDS.labels(model_key, source).observe(max(queue_wait, 0.0))
+    if cache_status in ('hit', 'miss'):
+        CACHE_LOOKUPS.labels(cache_status).inc()
+
+def record_error(source_type, stage):
+    ERRORS.labels(source_label(source_type), stage).inc()
+
+class ModelRegistryCollector:
+    """
+    Report model loads and resident models for this process and every worker.
+    
+    Registries live in separate processes, so they are read at scrape time:
+    this process's directly, workers' from the last stats they reported.
+    """
+    
+    def describe(self):
+        # Declaring the families up front stops the registry calling collect() on registration
+        return self._families()
+    
+    def _families(self):
+        return (
+            CounterMetricFamily('whisper_model_loads', 'Models loaded from checkpoints', labels=('model', 'process')),
+            GaugeMetricFamily('whisper_loaded_models', 'Models resident in memory', labels=('process',)),
+            GaugeMetricFamily('whisper_loaded_model_bytes', 'Memory held by resident models', labels=('process',))
+        )
+    
+    def collect(self):
+        from app.transcription.whisper_service import model_registry
+        from app.transcription.worker_pool import get_worker_stats
+        
+        loads, loaded, resident = self._families()
+        processes = {'main': model_registry.stats()}
+        processes.update({f"worker-{worker_id}": stats for worker_id, stats in get_worker_stats().items()})
+        
+        for process, stats in processes.items():
+            for model_key, count in stats['loads'].items():
+                loads.add_metric([model_key, process], count)
+            loaded.add_metric([process], len(stats['models']))
+            resident.add_metric([process], stats['resident_mb'] * 2**20)
+        
+        yield loads
+        yield loaded
+        yield resident
+
+REGISTRY.register(ModelRegistryCollector())
+
+def render():
+    """Return (body, content type) for the /metrics endpoint."""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
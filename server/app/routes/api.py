@@ -1,33 +1,71 @@
+import time
 import logging 
-import os 
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from app import metrics
 from app.config import Config
-from flask import Blueprint, request, jsonify, current_app, session
-from werkzeug.utils import secure_filename
-from app.transcription.whisper_service import WhisperService
+from flask import Blueprint, Response, request, jsonify, current_app, session, url_for, g, stream_with_context
+from app.extensions import socketio, batch_scheduler
+from app.transcription.whisper_service import WhisperService, model_registry
+from app.transcription.worker_pool import QueueFullError, get_worker_pool
+from app.transcription.job_store import JobStoreFullError, job_store
+from app.transcription.batch_scheduler import MAX_CLIP_SAMPLES
+from app.audio.audio_preprocessor import get_thread_preprocessor
+from app.audio.url_source import url_error
+from app.transcription.result_formats import OUTPUT_FORMATS, render
+from app.transcription.result_cache import get_result_cache
+from app.transcription.sharding import plan_upload, transcribe_sharded
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 api = Blueprint('api', __name__)
 
-whisper_service = None
+# Decoding and VAD of sharded uploads run here, off the Socket.IO event loop
+shard_planner = ThreadPoolExecutor(max_workers=2, thread_name_prefix='shard-planner')
 
-@api.before_request
-def start_services():
-    global whisper_service
-    
+def get_selected_model():
+    """Model chosen by the current session, falling back to the default."""
     model_key = session.get('selected_model', Config.DEFAULT_WHISPER_MODEL)
+    if model_key not in Config.WHISPER_MODELS:
+        return Config.DEFAULT_WHISPER_MODEL
+    return model_key
+
+def get_audio_settings():
+    """Preprocessing toggles chosen by the current session, falling back to the configured defaults."""
+    return {
+        'enable_preprocessing': session.get('enable_preprocessing', Config.ENABLE_AUDIO_PREPROCESSING),
+        'enable_vad': session.get('enable_vad', Config.ENABLE_VAD)
+    }
+
+def get_whisper_service():
+    """
+    Request-scoped WhisperService for the session's model.
     
-    if whisper_service is None or whisper_service.model_key != model_key:
-        whisper_service = WhisperService(model_key)
+    Handles are cheap: the model comes from the shared registry and the
+    preprocessor is shared per thread. Preprocessing follows the session's
+    settings. The handle is created on first use
+    and released when the request ends, so concurrent sessions on different
+    models never replace each other's service.
+    """
+    if 'whisper_service' not in g:
+        g.whisper_service = WhisperService(get_selected_model(), **get_audio_settings())
+    return g.whisper_service
+
+@api.teardown_request
+def close_services(exc):
+    service = g.pop('whisper_service', None)
+    if service is not None:
+        service.close()
         
 @api.route('/models', methods=['GET'])
 def get_models():
     models = WhisperService.get_available_models()
-    curr_model = session.get('selected_model', Config.DEFAULT_WHISPER_MODEL)
+    curr_model = get_selected_model()
     return jsonify({
         'models': models,
-        'current_model': curr_model
+        'current_model': curr_model,
+        'loaded': model_registry.stats()
     })
 
 @api.route('/test', methods=['GET'])
@@ -47,9 +85,6 @@ def select_model():
     
     session['selected_model'] = model_key
     
-    global whisper_service
-    whisper_service = None
-    
     return jsonify({
         'success': True, 
         'model': model_key,
@@ -58,9 +93,10 @@ def select_model():
 @api.route('/settings', methods=['GET'])
 def get_settings():
 
+    audio_settings = get_audio_settings()
     settings = {
-        'enablePreprocessing': Config.ENABLE_AUDIO_PREPROCESSING,
-        'enableVAD': Config.ENABLE_VAD
+        'enablePreprocessing': audio_settings['enable_preprocessing'],
+        'enableVAD': audio_settings['enable_vad']
     }
     
     return jsonify({
@@ -74,18 +110,19 @@ def update_settings():
     data = request.get_json()
     settings = data.get('settings', {})
     
+    # Kept per session, like the selected model, so one client cannot change another's transcriptions
     if 'enablePreprocessing' in settings:
-        Config.ENABLE_VAD = settings['enabled']
-        
-    global whisper_service
-    whisper_service = None
+        session['enable_preprocessing'] = bool(settings['enablePreprocessing'])
+    if 'enableVAD' in settings:
+        session['enable_vad'] = bool(settings['enableVAD'])
     
+    audio_settings = get_audio_settings()
     return jsonify({
         'success': True,
         'message': 'Settings updated successfully',
         'settings': {
-            'enablePreprocessing': Config.ENABLE_AUDIO_PREPROCESSING,
-            'enableVAD': Config.ENABLE_VAD
+            'enablePreprocessing': audio_settings['enable_preprocessing'],
+            'enableVAD': audio_settings['enable_vad']
         }
     })
     
@@ -97,74 +134,363 @@ def allowed_file(filename):
            filename.rsplit('.', 1)[1].lower() in Config.ALLOWED_EXTENSIONS
 
 
-@api.route('/transcribe', methods=['POST'])
-def transcribe_audio():
-    """
-    Transcribe audio using the selected Whisper model.
-    Handles various audio sources: file upload, URL, or microphone data.
+def parse_transcription_source():
     """
-    start_services()
+    Work out which WhisperService method handles the request's audio source.
     
+    Returns:
+        tuple: (method, args, error) where error is a message for a 400 response, or None
+    """
     # Check source type
     source_type = request.form.get('source_type')
     
-    try:
-        if source_type == Config.AUDIO_SOURCES['FILE_UPLOAD']:
-            # Handle file upload
-            if 'file' not in request.files:
-                return jsonify({'error': 'No file part'}), 400
-                
-            file = request.files['file']
-            if file.filename == '':
-                return jsonify({'error': 'No selected file'}), 400
-                
-            if not allowed_file(file.filename):
-                return jsonify({'error': 'File type not allowed'}), 400
-            
-            # Ensure the upload folder exists
-            os.makedirs(Config.UPLOAD_FOLDER, exist_ok=True)
+    if source_type == Config.AUDIO_SOURCES['FILE_UPLOAD']:
+        # Handle file upload
+        if 'file' not in request.files:
+            return None, None, 'No file part'
             
-            # Save to temporary file and transcribe
-            filename = secure_filename(file.filename)
-            file_path = os.path.join(Config.UPLOAD_FOLDER, filename)
-            file.save(file_path)
+        file = request.files['file']
+        if file.filename == '':
+            return None, None, 'No selected file'
             
-            # Transcribe the file
-            transcription = whisper_service.transcribe_audio_file(file_path)
-            
-            # Remove temporary file
-            os.remove(file_path)
-            
-        elif source_type == Config.AUDIO_SOURCES['URL']:
-            # Handle URL
-            url = request.form.get('url')
-            if not url:
-                return jsonify({'error': 'No URL provided'}), 400
-                
-            transcription = whisper_service.transcribe_from_url(url)
+        if not allowed_file(file.filename):
+            return None, None, 'File type not allowed'
+        
+        # Decode and transcribe the upload in memory
+        return 'transcribe_audio_bytes', (file.read(),), None
+        
+    elif source_type == Config.AUDIO_SOURCES['URL']:
+        # Handle URL
+        url = request.form.get('url')
+        if not url:
+            return None, None, 'No URL provided'
+        
+        error = url_error(url)
+        if error:
+            return None, None, error
             
-        elif source_type == Config.AUDIO_SOURCES['MICROPHONE']:
-            # Handle microphone data
-            if 'audio_data' not in request.files:
-                return jsonify({'error': 'No audio data provided'}), 400
-                
-            audio_data = request.files['audio_data'].read()
-            transcription = whisper_service.transcribe_from_microphone(audio_data)
+        return 'transcribe_from_url', (url,), None
+        
+    elif source_type == Config.AUDIO_SOURCES['MICROPHONE']:
+        # Handle microphone data
+        if 'audio_data' not in request.files:
+            return None, None, 'No audio data provided'
             
-        else:
-            return jsonify({'error': 'Invalid source type'}), 400
+        return 'transcribe_from_microphone', (request.files['audio_data'].read(),), None
+    
+    return None, None, 'Invalid source type'
+
+
+@api.route('/transcribe', methods=['POST'])
+def transcribe_audio():
+    """
+    Transcribe audio using the selected Whisper model.
+    Handles various audio sources: file upload, URL, or microphone data.
+    Pass format=json (default), text, srt or vtt to choose the output; all
+    formats are rendered from the same result, segment by segment.
+    """
+    method, args, error = parse_transcription_source()
+    if error:
+        return jsonify({'error': error}), 400
+    
+    output_format = request.values.get('format', 'json')
+    if output_format not in OUTPUT_FORMATS:
+        return jsonify({'error': f"Unsupported format, use one of: {', '.join(OUTPUT_FORMATS)}"}), 400
+    
+    model_key = get_selected_model()
+    audio_settings = get_audio_settings()
+    source_type = request.form.get('source_type')
+    try:
+        result = None
+        queue_wait = None
+        if method == 'transcribe_from_microphone' and Config.ENABLE_MICRO_BATCHING:
+            # Short clips share a batched decode; longer ones take the normal path
+            audio = decode_clip(*args)
+            if audio is not None and len(audio) <= MAX_CLIP_SAMPLES:
+                result, cache_status, timings = transcribe_clip_batched(model_key, audio, audio_settings)
+            elif audio is not None:
+                # Already decoded, so don't decode it again
+                method, args = 'transcribe_audio', (audio,)
+        elif method == 'transcribe_audio_bytes' and sharding_enabled():
+            # Long uploads are split across the workers; short ones make a single shard
+            result, cache_status, timings = transcribe_upload_sharded(model_key, *args, audio_settings=audio_settings)
+        
+        if result is None and Config.ENABLE_WORKER_POOL:
+            future = get_worker_pool().submit(model_key, method, *args, **audio_settings)
+            job_result = wait_for_job(future)
+            result, cache_status = job_result['result'], job_result['cache']
+            timings, queue_wait = job_result['timings'], job_result['queue_wait']
+        elif result is None:
+            service = get_whisper_service()
+            getattr(service, method)(*args)
+            result = service.last_result
+            cache_status, timings = service.last_cache_status, service.last_timings
+        
+        metrics.record_transcription(model_key, source_type, timings, cache_status, queue_wait)
             
         # Return the transcription
-        return jsonify({
-            'transcription': transcription,
-            'model_used': whisper_service.model_key
-        })
+        return render_response({
+            'transcription': result['text'],
+            'model_used': model_key,
+            'cache': cache_status
+        }, output_format, result)
+    
+    except QueueFullError as e:
+        logger.warning(f"Rejecting transcription request: {str(e)}")
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '5'}
+    
+    except TimeoutError as e:
+        logger.error(f"Error transcribing audio: {str(e)}")
+        metrics.record_error(source_type, 'timeout')
+        return jsonify({'error': str(e)}), 504
         
     except Exception as e:
         logger.error(f"Error transcribing audio: {str(e)}")
+        metrics.record_error(source_type, 'transcribe')
         return jsonify({'error': f'Error transcribing audio: {str(e)}'}), 500
 
 
+@api.route('/jobs', methods=['POST'])
+def create_job():
+    """
+    Start an asynchronous transcription and return its job id immediately.
+    Accepts the same form fields as /transcribe.
+    """
+    method, args, error = parse_transcription_source()
+    if error:
+        return jsonify({'error': error}), 400
+    
+    model_key = get_selected_model()
+    audio_settings = get_audio_settings()
+    try:
+        job = job_store.create(model_key, request.form.get('source_type'))
+    except JobStoreFullError as e:
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '5'}
+    
+    if method == 'transcribe_audio_bytes' and sharding_enabled():
+        socketio.start_background_task(run_job_sharded, job.id, model_key, *args, audio_settings)
+    elif Config.ENABLE_WORKER_POOL:
+        try:
+            future = get_worker_pool().submit(
+                model_key, method, *args,
+                on_progress=lambda segment: job_store.add_segment(job.id, segment),
+                **audio_settings
+            )
+        except QueueFullError as e:
+            job_store.fail(job.id, str(e))
+            return jsonify({'error': str(e), 'job_id': job.id}), 503, {'Retry-After': '5'}
+        future.add_done_callback(lambda f: finish_job(job.id, f))
+    else:
+        socketio.start_background_task(run_job_inline, job.id, model_key, method, args, audio_settings)
+    
+    socketio.start_background_task(watch_job, job.id)
+    
+    return jsonify({
+        'job_id': job.id,
+        'status': job.status,
+        'status_url': url_for('api.get_job', job_id=job.id)
+    }), 202
+
+
+@api.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """
+    Get a job's status and segment-level progress.
+    Pass ?since=N to receive only segments from index N on.
+    """
+    job, result = job_store.describe_with_result(job_id, since=request.args.get('since', 0, type=int))
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    # Captions and text exports of a finished job, e.g. ?format=srt
+    output_format = request.args.get('format')
+    if output_format and output_format != 'json':
+        if output_format not in OUTPUT_FORMATS:
+            return jsonify({'error': f"Unsupported format, use one of: {', '.join(OUTPUT_FORMATS)}"}), 400
+        if job['status'] != 'completed':
+            return jsonify({'error': 'Job has not completed', 'status': job['status']}), 409
+        return render_response(job, output_format, result)
+    
+    return jsonify(job)
+
+
+def render_response(document, output_format, result):
+    """Stream a transcription rendered in output_format."""
+    return Response(
+        stream_with_context(render(document, output_format, result)),
+        content_type=OUTPUT_FORMATS[output_format]
+    )
+
+
+def finish_job(job_id, future):
+    job = job_store.get(job_id)
+    source_type = job.source_type if job is not None else None
+    if future.exception() is not None:
+        logger.error(f"Job {job_id} failed: {str(future.exception())}")
+        metrics.record_error(source_type, 'job')
+        job_store.fail(job_id, str(future.exception()))
+    else:
+        job_result = future.result()
+        if job is not None:
+            metrics.record_transcription(job.model_key, source_type, job_result['timings'], job_result['cache'], job_result['queue_wait'])
+        job_store.complete(job_id, job_result['transcription'], job_result['result'])
+
+
+def run_job_inline(job_id, model_key, method, args, audio_settings):
+    # A dedicated service instance keeps the progress callback private to this job
+    job = job_store.get(job_id)
+    source_type = job.source_type if job is not None else None
+    queue_wait = time.time() - job.created_at if job is not None else None
+    
+    job_store.mark_running(job_id)
+    try:
+        with WhisperService(model_key, **audio_settings) as service:
+            service.progress_callback = lambda segment: job_store.add_segment(job_id, segment)
+            transcription = getattr(service, method)(*args)
+            metrics.record_transcription(model_key, source_type, service.last_timings, service.last_cache_status, queue_wait)
+            job_store.complete(job_id, transcription, service.last_result)
+    except Exception as e:
+        logger.error(f"Job {job_id} failed: {str(e)}")
+        metrics.record_error(source_type, 'job')
+        job_store.fail(job_id, str(e))
+
+
+def run_job_sharded(job_id, model_key, audio_bytes, audio_settings):
+    job = job_store.get(job_id)
+    source_type = job.source_type if job is not None else None
+    
+    job_store.mark_running(job_id)
+    try:
+        result, cache_status, timings = transcribe_upload_sharded(
+            model_key, audio_bytes,
+            on_progress=lambda segment: job_store.add_segment(job_id, segment),
+            audio_settings=audio_settings
+        )
+        metrics.record_transcription(model_key, source_type, timings, cache_status)
+        job_store.complete(job_id, result['text'], result)
+    except Exception as e:
+        logger.error(f"Job {job_id} failed: {str(e)}")
+        metrics.record_error(source_type, 'job')
+        job_store.fail(job_id, str(e))
+
+
+def watch_job(job_id):
+    """Emit Socket.IO progress events to the job's room until it finishes."""
+    sent = 0
+    while True:
+        job = job_store.describe(job_id, since=sent)
+        if job is None:
+            return
+        
+        if job['segments']:
+            sent += len(job['segments'])
+            socketio.emit('job_progress', {
+                'job_id': job_id,
+                'segments': job['segments'],
+                'progress': job['progress']
+            }, to=job_id)
+        
+        if job['status'] in ('completed', 'failed'):
+            job.pop('segments')
+            socketio.emit(f"job_{job['status']}", job, to=job_id)
+            return
+        
+        socketio.sleep(Config.JOB_PROGRESS_INTERVAL)
+
+
+def decode_clip(audio_bytes):
+    """
+    Decode a microphone clip unless its header already shows it is too long to batch.
+    
+    Returns:
+        np.ndarray: The waveform, or None if the clip is known to be longer
+            than one window without decoding it
+    """
+    preprocessor = get_thread_preprocessor()
+    duration = preprocessor.probe_duration(audio_bytes)
+    if duration is not None and duration * preprocessor.sample_rate > MAX_CLIP_SAMPLES:
+        return None
+    return preprocessor.decode_bytes(audio_bytes)
+
+
+def transcribe_clip_batched(model_key, audio, audio_settings):
+    """
+    Transcribe a short clip through the micro-batch scheduler.
+    
+    The clip takes the same cache, preprocessing, VAD and word-timing
+    pipeline as an upload; only its speech regions are decoded in batches
+    shared with other requests' clips.
+    
+    Args:
+        model_key (str): Model to use
+        audio (np.ndarray): Mono float32 waveform of at most MAX_CLIP_SAMPLES
+        audio_settings (dict): Session preprocessing toggles from get_audio_settings()
+    
+    Returns:
+        tuple: (result, cache_status, timings)
+    """
+    with WhisperService(model_key, **audio_settings) as service:
+        service.enable_batching = True
+        service.window_decoder = functools.partial(batch_scheduler.decode_windows, model_key)
+        service.transcribe_audio(audio)
+        return service.last_result, service.last_cache_status, service.last_timings
+
+
+def sharding_enabled():
+    return Config.ENABLE_SHARDED_TRANSCRIPTION and Config.ENABLE_WORKER_POOL
+
+
+def transcribe_upload_sharded(model_key, audio_bytes, on_progress=None, audio_settings=None):
+    """
+    Transcribe an upload as parallel shards on the worker pool.
+    
+    The cache lookup, decoding and shard planning run on a planner thread
+    while this green thread yields to the event loop. A cached whole-file
+    result skips them all.
+    
+    Returns:
+        tuple: (result, cache_status, timings)
+    """
+    audio_settings = audio_settings or {}
+    cache_key, cached, audio, shards, timings = wait_for_job(
+        shard_planner.submit(plan_upload, audio_bytes, model_key, **audio_settings)
+    )
+    if cached is not None:
+        if on_progress is not None:
+            for segment in cached['segments']:
+                on_progress(segment)
+        return cached, 'hit', timings
+    
+    result, cache_status, shard_timings = transcribe_sharded(
+        get_worker_pool(), model_key, audio, shards, wait_for_job, on_progress, **audio_settings
+    )
+    timings.update(shard_timings)
+    if cache_key is not None:
+        shard_planner.submit(get_result_cache().put, cache_key, result)
+    return result, cache_status, timings
+
+
+def wait_for_job(future, poll_interval=0.05, timeout=None):
+    """
+    Wait for a worker job without blocking the Socket.IO event loop.
+    
+    Args:
+        future (Future): Future returned by TranscriptionWorkerPool.submit
+        poll_interval (float): Seconds between checks
+        timeout (float): Seconds to wait, defaults to Config.WORKER_JOB_TIMEOUT
+    
+    Raises:
+        TimeoutError: If the job has not finished in time; the worker keeps running it
+    """
+    timeout = Config.WORKER_JOB_TIMEOUT if timeout is None else timeout
+    deadline = time.time() + timeout
+    while not future.done():
+        if time.time() >= deadline:
+            raise TimeoutError(f"Transcription did not finish within {timeout:.0f}s")
+        socketio.sleep(poll_interval)
+    return future.result()
+
+
 @api.route('/analyze', methods=['POST'])
 def analyze_transcript():
     """
@@ -0,0 +1,153 @@
+import time
+import queue
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from app.config import Config
+from app.transcription.whisper_service import WhisperService
+
+logger = logging.getLogger(__name__)
+
+# Longest clip accepted, in samples: one Whisper window at 16kHz
+MAX_CLIP_SAMPLES = 30 * 16000
+
+class _ClipRequest:
+    __slots__ = ('model_key', 'audio', 'prompt', 'with_timestamps', 'word_timestamps', 'future', 'submitted_at')
+    
+    def __init__(self, model_key, audio, prompt, with_timestamps, word_timestamps):
+        self.model_key = model_key
+        self.audio = audio
+        self.prompt = prompt
+        self.with_timestamps = with_timestamps
+        self.word_timestamps = word_timestamps
+        self.future = Future()
+        self.submitted_at = time.monotonic()
+
+class BatchScheduler:
+    """
+    Micro-batching front end for short clips.
+    
+    Requests are collected for up to ``max_wait_ms`` after the first one
+    arrives, or until ``max_batch_size`` are waiting, and then decoded with
+    one batched encoder/decoder pass per group of clips that share a model,
+    prompt and timestamp options. Raising the wait trades per-request
+    latency for aggregate throughput under many concurrent live sessions.
+    """
+    
+    def __init__(self, max_batch_size=None, max_wait_ms=None, sleep=time.sleep):
+        """
+        Args:
+            max_batch_size (int): Clips per batch, defaults to Config.MICRO_BATCH_MAX_SIZE
+            max_wait_ms (float): Collection window, defaults to Config.MICRO_BATCH_MAX_WAIT_MS
+            sleep (callable): Sleep used by wait(); pass the event loop's sleep
+                so waiting callers don't block other green threads
+        """
+        self.max_batch_size = max_batch_size or Config.MICRO_BATCH_MAX_SIZE
+        self.max_wait = (max_wait_ms if max_wait_ms is not None else Config.MICRO_BATCH_MAX_WAIT_MS) / 1000.0
+        self.sleep = sleep
+        
+        self._queue = queue.Queue()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+    
+    def submit(self, model_key, audio, prompt=None, with_timestamps=False, word_timestamps=False):
+        """
+        Queue a clip for batched decoding.
+        
+        Args:
+            model_key (str): Model to decode with
+            audio (np.ndarray): Mono float32 waveform of at most 30 seconds
+            prompt (str): Optional text prompt; only clips with the same prompt share a batch
+            with_timestamps (bool): Return timestamped segments instead of one segment per clip
+            word_timestamps (bool): Also align words (needs with_timestamps)
+        
+        Returns:
+            Future: Resolves to a list of segment dicts relative to the clip
+        """
+        if len(audio) > MAX_CLIP_SAMPLES:
+            raise ValueError("Clips longer than 30 seconds cannot be micro-batched")
+        
+        self._ensure_started()
+        request = _ClipRequest(model_key, audio, prompt, with_timestamps, word_timestamps)
+        self._queue.put(request)
+        return request.future
+    
+    def transcribe(self, model_key, audio, prompt=None, with_timestamps=False, poll_interval=0.005):
+        """Submit a clip and wait for its segments."""
+        return self.wait(self.submit(model_key, audio, prompt, with_timestamps), poll_interval)
+    
+    def decode_windows(self, model_key, windows, with_timestamps=False, word_timestamps=False):
+        """
+        Submit several clips at once and wait for all of them.
+        
+        Takes the place of WhisperService.decode_windows, so the speech
+        regions of one recording share batches with other requests' clips.
+        
+        Returns:
+            list: One list of segment dicts per window
+        """
+        futures = [
+            self.submit(model_key, window, with_timestamps=with_timestamps, word_timestamps=word_timestamps)
+            for window in windows
+        ]
+        return [self.wait(future) for future in futures]
+    
+    def wait(self, future, poll_interval=0.005):
+        while not future.done():
+            self.sleep(poll_interval)
+        return future.result()
+    
+    def _ensure_started(self):
+        with self._thread_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+    
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+    
+    def _run(self):
+        while True:
+            batch = self._collect()
+            
+            groups = OrderedDict()
+            for request in batch:
+                key = (request.model_key, request.prompt, request.with_timestamps, request.word_timestamps)
+                groups.setdefault(key, []).append(request)
+            
+            for (model_key, prompt, with_timestamps, word_timestamps), requests in groups.items():
+                self._decode_group(model_key, prompt, with_timestamps, word_timestamps, requests)
+    
+    def _decode_group(self, model_key, prompt, with_timestamps, word_timestamps, requests):
+        started = time.monotonic()
+        try:
+            with WhisperService(model_key) as service:
+                results = service.decode_windows(
+                    [request.audio for request in requests],
+                    prompt=prompt,
+                    with_timestamps=with_timestamps,
+                    word_timestamps=word_timestamps
+                )
+        except Exception as e:
+            logger.error(f"Micro-batch of {len(requests)} clips failed: {str(e)}")
+            for request in requests:
+                request.future.set_exception(e)
+            return
+        
+        for request, segments in zip(requests, results):
+            request.future.set_result(segments)
+        
+        oldest_wait = started - min(request.submitted_at for request in requests)
+        logger.debug(f"Decoded micro-batch of {len(requests)} clips on {model_key} "
+                     f"in {time.monotonic() - started:.3f}s (queued up to {oldest_wait * 1000:.0f}ms)")
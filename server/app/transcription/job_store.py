@@ -0,0 +1,162 @@
+import time
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+class JobStoreFullError(Exception):
+    """Raised when every slot in the job store is held by an unfinished job."""
+    pass
+
+class TranscriptionJob:
+    """State and incremental results of one asynchronous transcription."""
+    
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    COMPLETED = 'completed'
+    FAILED = 'failed'
+    
+    def __init__(self, model_key, source_type):
+        self.id = uuid.uuid4().hex
+        self.model_key = model_key
+        self.source_type = source_type
+        self.status = self.QUEUED
+        self.segments = []
+        self.transcription = None
+        self.result = None         # structured result, rendered on request
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+    
+    @property
+    def finished(self):
+        return self.status in (self.COMPLETED, self.FAILED)
+    
+    def to_dict(self, since=0):
+        """
+        Serialize the job for the API.
+        
+        Args:
+            since (int): Only include segments from this index on
+        
+        Returns:
+            dict: Status, progress, new segments and, once finished, the result
+        """
+        data = {
+            'job_id': self.id,
+            'status': self.status,
+            'model': self.model_key,
+            'source_type': self.source_type,
+            'progress': {
+                'segments_completed': len(self.segments),
+                'processed_seconds': self.segments[-1]['end'] if self.segments else 0.0
+            },
+            'segments': self.segments[since:],
+            'created_at': self.created_at,
+            'finished_at': self.finished_at
+        }
+        if self.status == self.COMPLETED:
+            data['transcription'] = self.transcription
+        if self.status == self.FAILED:
+            data['error'] = self.error
+        return data
+
+class JobStore:
+    """
+    Thread-safe, bounded store of transcription jobs.
+    
+    Finished jobs are kept for ``ttl`` seconds so clients can fetch results
+    later. When the store is full the oldest finished job is evicted first;
+    unfinished jobs are never evicted.
+    """
+    
+    def __init__(self, max_jobs=None, ttl=None):
+        self.max_jobs = max_jobs or Config.JOB_STORE_MAX_JOBS
+        self.ttl = ttl if ttl is not None else Config.JOB_RESULT_TTL
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def create(self, model_key, source_type):
+        """
+        Register a new queued job.
+        
+        Raises:
+            JobStoreFullError: If the store is full of unfinished jobs
+        """
+        job = TranscriptionJob(model_key, source_type)
+        with self._lock:
+            self._evict_expired()
+            if len(self._jobs) >= self.max_jobs and not self._evict_oldest_finished():
+                raise JobStoreFullError("Too many transcription jobs in progress, try again later")
+            self._jobs[job.id] = job
+        return job
+    
+    def get(self, job_id):
+        with self._lock:
+            self._evict_expired()
+            return self._jobs.get(job_id)
+    
+    def describe(self, job_id, since=0):
+        """Return a consistent snapshot of a job as a dict, or None if unknown."""
+        with self._lock:
+            self._evict_expired()
+            job = self._jobs.get(job_id)
+            return job.to_dict(since) if job is not None else None
+    
+    def describe_with_result(self, job_id, since=0):
+        """Like describe(), plus the job's structured result from the same snapshot; (None, None) if unknown."""
+        with self._lock:
+            self._evict_expired()
+            job = self._jobs.get(job_id)
+            return (job.to_dict(since), job.result) if job is not None else (None, None)
+    
+    def mark_running(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and job.status == TranscriptionJob.QUEUED:
+                job.status = TranscriptionJob.RUNNING
+    
+    def add_segment(self, job_id, segment):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.status = TranscriptionJob.RUNNING
+                job.segments.append(segment)
+    
+    def complete(self, job_id, transcription, result=None):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.status = TranscriptionJob.COMPLETED
+                job.transcription = transcription
+                job.result = result
+                job.finished_at = time.time()
+    
+    def fail(self, job_id, error):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.status = TranscriptionJob.FAILED
+                job.error = error
+                job.finished_at = time.time()
+    
+    def _evict_expired(self):
+        cutoff = time.time() - self.ttl
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished and job.finished_at < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+        if expired:
+            logger.info(f"Evicted {len(expired)} expired transcription jobs")
+    
+    def _evict_oldest_finished(self):
+        for job_id, job in self._jobs.items():
+            if job.finished:
+                del self._jobs[job_id]
+                return True
+        return False
+
+job_store = JobStore()
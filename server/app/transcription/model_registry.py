@@ -0,0 +1,159 @@
+import gc
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+class ModelRegistry:
+    """
+    Process-wide registry of loaded Whisper models under a memory budget.
+    
+    Models are reference counted: acquire() pins a model and release()
+    unpins it. When loading a model would exceed the budget, unpinned
+    models are evicted least-recently-used first. A model that is in use is
+    never evicted, so the budget can be exceeded temporarily if every
+    resident model is pinned.
+    """
+    
+    def __init__(self, loader, budget_mb=None):
+        """
+        Args:
+            loader (callable): Loads a model given its key
+            budget_mb (int): Memory budget, defaults to Config.MODEL_MEMORY_BUDGET_MB
+        """
+        self.loader = loader
+        self.budget_bytes = (budget_mb or Config.MODEL_MEMORY_BUDGET_MB) * 1024 * 1024
+        
+        self._models = OrderedDict()   # model_key -> model, least recently used first
+        self._sizes = {}
+        self._refcounts = {}
+        self._load_counts = {}   # model_key -> times loaded from its checkpoint
+        self._loading = {}   # model_key -> Future resolved when its in-flight load finishes
+        self._reserved = {}   # model_key -> expected bytes of an in-flight load
+        self._lock = threading.RLock()
+    
+    def acquire(self, model_key):
+        """
+        Get a model, loading it if needed, and pin it until release().
+        
+        The checkpoint is loaded without holding the registry lock, so
+        stats() and acquires of resident models never wait for a load.
+        Concurrent acquires of a model that is being loaded wait for that
+        one load instead of starting their own.
+        
+        Args:
+            model_key (str): Key of the model in Config.WHISPER_MODELS
+        
+        Returns:
+            whisper.Whisper: Loaded model
+        """
+        while True:
+            with self._lock:
+                if model_key in self._models:
+                    logger.info(f"Using cached model: {model_key}")
+                    return self._pin(model_key)
+                
+                loading = self._loading.get(model_key)
+                if loading is None:
+                    needed_bytes = Config.WHISPER_MODELS[model_key]['memory_mb'] * 1024 * 1024
+                    self._make_room(needed_bytes)
+                    loading = self._loading[model_key] = Future()
+                    self._reserved[model_key] = needed_bytes
+                    break
+            
+            # Another caller is loading it; it may be evicted again before we pin it, so re-check
+            loading.result()
+        
+        try:
+            model = self.loader(model_key)
+        except BaseException as e:
+            with self._lock:
+                del self._loading[model_key]
+                del self._reserved[model_key]
+            loading.set_exception(e)
+            raise
+        
+        with self._lock:
+            del self._loading[model_key]
+            del self._reserved[model_key]
+            self._load_counts[model_key] = self._load_counts.get(model_key, 0) + 1
+            self._models[model_key] = model
+            self._sizes[model_key] = self._model_bytes(model)
+            logger.info(f"Registry holds {len(self._models)} models, "
+                        f"{self.resident_bytes / 2**20:.0f}MB of {self.budget_bytes / 2**20:.0f}MB budget")
+            model = self._pin(model_key)
+        loading.set_result(None)
+        return model
+    
+    def release(self, model_key):
+        """Unpin a model previously returned by acquire()."""
+        with self._lock:
+            count = self._refcounts.get(model_key, 0)
+            if count <= 1:
+                self._refcounts.pop(model_key, None)
+            else:
+                self._refcounts[model_key] = count - 1
+    
+    @property
+    def resident_bytes(self):
+        with self._lock:
+            return sum(self._sizes.values())
+    
+    def stats(self):
+        """Describe resident models for the API and metrics."""
+        with self._lock:
+            return {
+                'budget_mb': round(self.budget_bytes / 2**20),
+                'resident_mb': round(self.resident_bytes / 2**20),
+                'models': [
+                    {
+                        'model': model_key,
+                        'size_mb': round(self._sizes[model_key] / 2**20),
+                        'in_use': self._refcounts.get(model_key, 0)
+                    }
+                    for model_key in self._models
+                ],
+                'loads': dict(self._load_counts)
+            }
+    
+    def _pin(self, model_key):
+        self._models.move_to_end(model_key)
+        self._refcounts[model_key] = self._refcounts.get(model_key, 0) + 1
+        return self._models[model_key]
+    
+    def _make_room(self, needed_bytes):
+        # Models still loading count against the budget at their expected size
+        needed_bytes += sum(self._reserved.values())
+        for model_key in list(self._models):
+            if self.resident_bytes + needed_bytes <= self.budget_bytes:
+                break
+            if self._refcounts.get(model_key):
+                continue
+            self._evict(model_key)
+        
+        if self.resident_bytes + needed_bytes > self.budget_bytes:
+            logger.warning(f"Loading a {needed_bytes / 2**20:.0f}MB model exceeds the "
+                           f"{self.budget_bytes / 2**20:.0f}MB model budget even after evicting idle models")
+    
+    def _evict(self, model_key):
+        logger.info(f"Evicting model {model_key} ({self._sizes[model_key] / 2**20:.0f}MB)")
+        del self._models[model_key]
+        del self._sizes[model_key]
+        gc.collect()
+        
+        import torch
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+    
+    @staticmethod
+    def _model_bytes(model):
+        # The state dict also covers packed int8 weights, which are not parameters
+        total = 0
+        for value in model.state_dict().values():
+            for t in (value if isinstance(value, tuple) else (value,)):
+                if hasattr(t, 'element_size'):
+                    total += t.numel() * t.element_size()
+        return total
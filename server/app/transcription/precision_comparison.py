@@ -0,0 +1,138 @@
+import os
+import gc
+import re
+import time
+import logging
+import argparse
+from app.config import Config
+from app.audio.audio_preprocessor import get_thread_preprocessor
+from app.transcription.whisper_service import WhisperService, PRECISION_MODES
+from app.transcription.model_registry import ModelRegistry
+
+logger = logging.getLogger(__name__)
+
+# Reference clip shipped with the server
+DEFAULT_CLIP = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'message.mp3')
+
+# (model, precision) pairs compared by default; the first is the accuracy reference
+DEFAULT_CONFIGURATIONS = [
+    ('small', 'fp32'),
+    ('base', 'fp32'),
+    ('small', 'bf16'),
+    ('small', 'int8'),
+    ('base', 'int8'),
+]
+
+def normalize_words(text):
+    """Lowercase and strip punctuation so only wording is compared."""
+    return re.sub(r"[^\w\s']", " ", text.lower()).split()
+
+def word_error_rate(reference, hypothesis):
+    """
+    Word error rate of a hypothesis against a reference transcript.
+    
+    Args:
+        reference (str): Reference transcript
+        hypothesis (str): Transcript to score
+        
+    Returns:
+        float: (substitutions + insertions + deletions) / reference words
+    """
+    ref = normalize_words(reference)
+    hyp = normalize_words(hypothesis)
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    
+    # Levenshtein distance over words, one row at a time
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i]
+        for j, hyp_word in enumerate(hyp, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ref_word != hyp_word)
+            ))
+        previous = current
+    return previous[-1] / len(ref)
+
+def compare_precisions(clip_path=None, reference_text=None, configurations=None, repeats=3):
+    """
+    Transcribe a reference clip with several model/precision pairs.
+    
+    Models are loaded outside the shared registry and freed after each
+    run, so only one is resident at a time. Latency is the best of
+    ``repeats`` runs after a warm-up. Without a reference transcript,
+    accuracy is measured against the first configuration's output.
+    
+    Args:
+        clip_path (str): Audio file, defaults to the bundled message.mp3
+        reference_text (str): Ground-truth transcript, if known
+        configurations (list): (model_key, precision) pairs
+        repeats (int): Timed runs per configuration
+        
+    Returns:
+        list: One dict per configuration with latency, real-time factor,
+            word error rate, resident weight size and the transcription
+    """
+    clip_path = clip_path or DEFAULT_CLIP
+    configurations = configurations or DEFAULT_CONFIGURATIONS
+    
+    audio = get_thread_preprocessor().load_audio(clip_path)
+    duration = len(audio) / 16000
+    options = {
+        "language": "en" if Config.WHISPER_ENGLISH_ONLY else None,
+        "task": "transcribe",
+        "fp16": False
+    }
+    
+    results = []
+    for model_key, precision in configurations:
+        if precision not in PRECISION_MODES:
+            raise ValueError(f"Unknown inference precision: {precision}")
+        
+        model = WhisperService._load_model(model_key, precision)
+        model.transcribe(audio[:16000 * 5], **options)  # warm-up
+        
+        timings = []
+        for _ in range(repeats):
+            start_time = time.perf_counter()
+            text = model.transcribe(audio, **options)["text"].strip()
+            timings.append(time.perf_counter() - start_time)
+        
+        if reference_text is None:
+            reference_text = text
+        latency = min(timings)
+        results.append({
+            'model': model_key,
+            'precision': precision,
+            'latency': round(latency, 3),
+            'real_time_factor': round(latency / duration, 4) if duration else None,
+            'wer': round(word_error_rate(reference_text, text), 4),
+            'weights_mb': round(ModelRegistry._model_bytes(model) / 2**20),
+            'transcription': text
+        })
+        logger.info(f"{model_key}/{precision}: {latency:.2f}s, WER {results[-1]['wer']:.3f}")
+        
+        del model
+        gc.collect()
+    
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare Whisper accuracy and speed across inference precisions")
+    parser.add_argument("clip", nargs="?", default=DEFAULT_CLIP, help="Reference audio clip")
+    parser.add_argument("--reference", help="Ground-truth transcript of the clip")
+    parser.add_argument("--repeats", type=int, default=3, help="Timed runs per configuration")
+    parser.add_argument("--config", action="append", metavar="MODEL:PRECISION",
+                        help="Configuration to compare, e.g. small:int8 (repeatable)")
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO)
+    configurations = [tuple(c.split(":", 1)) for c in args.config] if args.config else None
+    
+    results = compare_precisions(args.clip, args.reference, configurations, args.repeats)
+    print(f"{'model':<8} {'precision':<9} {'latency':>8} {'RTF':>7} {'WER':>6} {'weights':>8}")
+    for r in results:
+        print(f"{r['model']:<8} {r['precision']:<9} {r['latency']:>7.2f}s {r['real_time_factor']:>7.3f} "
+              f"{r['wer']:>6.3f} {r['weights_mb']:>6}MB")
@@ -0,0 +1,166 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+import numpy as np
+from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+class TranscriptionCache:
+    """
+    Two-tier cache of transcription results keyed by audio content.
+    
+    Keys combine a hash of the decoded waveform with the model and every
+    setting that changes the output, so the same recording hits the same
+    entry whatever its container or file name. URL downloads, which are
+    transcribed while they stream in, are keyed by the URL and the server's
+    validator for that version of the body instead. Lookups go to a per-process LRU
+    first, then to a SQLite file shared by every process on the host, which
+    is trimmed back under ``max_disk_bytes`` by least-recent access.
+    """
+    
+    def __init__(self, cache_dir=None, memory_entries=None, max_disk_bytes=None):
+        self.cache_dir = cache_dir or Config.CACHE_DIR
+        self.memory_entries = memory_entries or Config.CACHE_MEMORY_ENTRIES
+        self.max_disk_bytes = max_disk_bytes or Config.CACHE_DISK_MAX_BYTES
+        
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.db_path = os.path.join(self.cache_dir, 'transcriptions.sqlite3')
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, accessed REAL NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)")
+    
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.db_path, timeout=10)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+    
+    @staticmethod
+    def make_key(audio, model_key, settings):
+        """
+        Build a cache key for a decoded waveform or an encoded file.
+        
+        Large uploads are transcribed block by block as they decode, so they
+        are keyed by their encoded bytes rather than the waveform.
+        
+        Args:
+            audio (np.ndarray or bytes): Decoded float32 waveform, or encoded audio
+            model_key (str): Model used for the transcription
+            settings (dict): Settings that affect the output
+        
+        Returns:
+            str: Hex digest identifying the audio, model and settings
+        """
+        digest = hashlib.blake2b(digest_size=20)
+        if isinstance(audio, (bytes, bytearray)):
+            digest.update(b'encoded')
+            digest.update(audio)
+        else:
+            digest.update(memoryview(np.ascontiguousarray(audio, dtype=np.float32)).cast('B'))
+        digest.update(model_key.encode())
+        digest.update(json.dumps(settings, sort_keys=True).encode())
+        return digest.hexdigest()
+    
+    @staticmethod
+    def make_url_key(url, validator, model_key, settings):
+        """
+        Build a cache key for a remote file.
+        
+        Args:
+            url (str): URL the file was downloaded from
+            validator (str): ETag or Last-Modified value of the response
+            model_key (str): Model used for the transcription
+            settings (dict): Settings that affect the output
+        
+        Returns:
+            str: Hex digest identifying the file version, model and settings
+        """
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(json.dumps(['url', url, validator, model_key, settings], sort_keys=True).encode())
+        return digest.hexdigest()
+    
+    def get(self, key):
+        """Return the cached value for key, or None."""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+        
+        try:
+            with self._connect() as db:
+                row = db.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    return None
+                db.execute("UPDATE results SET accessed = ? WHERE key = ?", (time.time(), key))
+        except sqlite3.Error as e:
+            logger.warning(f"Result cache read failed: {str(e)}")
+            return None
+        
+        value = json.loads(row[0])
+        self._remember(key, value)
+        return value
+    
+    def put(self, key, value):
+        """Store a JSON-serializable value in both tiers."""
+        self._remember(key, value)
+        
+        payload = json.dumps(value)
+        try:
+            with self._connect() as db:
+                db.execute(
+                    "INSERT OR REPLACE INTO results (key, value, size, accessed) VALUES (?, ?, ?, ?)",
+                    (key, payload, len(payload), time.time())
+                )
+                self._evict(db)
+        except sqlite3.Error as e:
+            logger.warning(f"Result cache write failed: {str(e)}")
+    
+    def _remember(self, key, value):
+        with self._lock:
+            self._memory[key] = value
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+    
+    def _evict(self, db):
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= self.max_disk_bytes:
+            return
+        
+        evicted = 0
+        for key, size in db.execute("SELECT key, size FROM results ORDER BY accessed").fetchall():
+            if total <= self.max_disk_bytes:
+                break
+            db.execute("DELETE FROM results WHERE key = ?", (key,))
+            total -= size
+            evicted += 1
+        logger.info(f"Evicted {evicted} entries from the result cache")
+
+_result_cache = None
+_result_cache_lock = threading.Lock()
+
+def get_result_cache():
+    """Return the process-wide result cache, creating it on first use."""
+    global _result_cache
+    
+    with _result_cache_lock:
+        if _result_cache is None:
+            _result_cache = TranscriptionCache()
+    return _result_cache
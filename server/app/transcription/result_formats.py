@@ -0,0 +1,82 @@
+import json
+
+# Output formats accepted by the API and their content types
+OUTPUT_FORMATS = {
+    'json': 'application/json',
+    'text': 'text/plain; charset=utf-8',
+    'srt': 'application/x-subrip; charset=utf-8',
+    'vtt': 'text/vtt; charset=utf-8',
+}
+
+def build_result(segments, duration=None, model_key=None):
+    """
+    Assemble the structured result of one transcription.
+    
+    Args:
+        segments (list): Segment dicts with 'start', 'end' and 'text', and
+            optionally 'avg_logprob', 'no_speech_prob' and 'words'
+        duration (float): Length of the source audio in seconds
+        model_key (str): Model that produced the segments
+    
+    Returns:
+        dict: 'text', 'segments', 'duration' and 'model'; JSON-serializable
+            so it can be cached and passed between processes
+    """
+    return {
+        'text': " ".join(seg['text'] for seg in segments),
+        'segments': segments,
+        'duration': round(duration, 3) if duration is not None else None,
+        'model': model_key
+    }
+
+def render(document, output_format, result=None):
+    """
+    Render a transcription incrementally in one of OUTPUT_FORMATS.
+    
+    Args:
+        document (dict): Top-level fields for the json format
+        output_format (str): Key of OUTPUT_FORMATS
+        result (dict): Structured result from build_result; captions and
+            text are rendered from its segments
+    
+    Returns:
+        iterator: Pieces of the rendered output as str, one segment at a time
+    """
+    if output_format == 'json':
+        return _render_json(document, result)
+    if output_format == 'text':
+        return (seg['text'] + "\n" for seg in result['segments'])
+    if output_format == 'srt':
+        return _render_srt(result['segments'])
+    if output_format == 'vtt':
+        return _render_vtt(result['segments'])
+    raise ValueError(f"Unsupported output format: {output_format}")
+
+def _render_json(document, result):
+    # Segments are written one by one so long transcripts never exist as a single string
+    fields = {key: value for key, value in document.items() if key != 'segments'}
+    if result is None:
+        yield json.dumps(fields)
+        return
+    
+    fields['duration'] = result['duration']
+    yield json.dumps(fields)[:-1] + ', "segments": ['
+    for i, seg in enumerate(result['segments']):
+        yield ("," if i else "") + json.dumps(seg)
+    yield "]}"
+
+def _timestamp(seconds, separator):
+    milliseconds = int(round(max(seconds, 0.0) * 1000))
+    hours, milliseconds = divmod(milliseconds, 3600000)
+    minutes, milliseconds = divmod(milliseconds, 60000)
+    seconds, milliseconds = divmod(milliseconds, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}{separator}{milliseconds:03d}"
+
+def _render_srt(segments):
+    for i, seg in enumerate(segments, 1):
+        yield f"{i}\n{_timestamp(seg['start'], ',')} --> {_timestamp(seg['end'], ',')}\n{seg['text']}\n\n"
+
+def _render_vtt(segments):
+    yield "WEBVTT\n\n"
+    for seg in segments:
+        yield f"{_timestamp(seg['start'], '.')} --> {_timestamp(seg['end'], '.')}\n{seg['text']}\n\n"
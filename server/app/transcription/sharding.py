@@ -0,0 +1,210 @@
+import time
+import logging
+from collections import deque
+from app.config import Config
+from app.audio.audio_preprocessor import get_thread_preprocessor
+from app.transcription.result_cache import get_result_cache
+from app.transcription.result_formats import build_result
+from app.transcription.whisper_service import cache_settings
+
+logger = logging.getLogger(__name__)
+
+def plan_shards(duration, speech_segments, shard_seconds=None, overlap_seconds=None):
+    """
+    Split a recording into shards cut in the silences between speech.
+    
+    Each cut goes in the longest pause that lies between half and one and
+    a half target lengths after the previous cut, or at the target length
+    if there is no pause there. Shards are then widened by the overlap on
+    both sides so speech next to a cut is decoded with context.
+    
+    Args:
+        duration (float): Length of the recording in seconds
+        speech_segments (list): (start, end) speech regions in seconds, from VAD
+        shard_seconds (float): Target shard length, defaults to Config.SHARD_SECONDS
+        overlap_seconds (float): Context added at each cut, defaults to Config.SHARD_OVERLAP_SECONDS
+    
+    Returns:
+        list: (start, end, core_start, core_end) tuples in seconds; the
+            cores tile the recording and the (start, end) spans overlap
+    """
+    shard_seconds = shard_seconds or Config.SHARD_SECONDS
+    overlap_seconds = Config.SHARD_OVERLAP_SECONDS if overlap_seconds is None else overlap_seconds
+    
+    # (midpoint, length) of every pause between speech regions
+    pauses = [
+        ((prev_end + start) / 2, start - prev_end)
+        for (_, prev_end), (start, _) in zip(speech_segments, speech_segments[1:])
+        if start > prev_end
+    ]
+    
+    cuts = [0.0]
+    while duration - cuts[-1] > shard_seconds * 1.5:
+        low, high = cuts[-1] + shard_seconds * 0.5, cuts[-1] + shard_seconds * 1.5
+        candidates = [pause for pause in pauses if low <= pause[0] <= high]
+        if candidates:
+            cuts.append(max(candidates, key=lambda pause: pause[1])[0])
+        else:
+            cuts.append(cuts[-1] + shard_seconds)
+    cuts.append(duration)
+    
+    return [
+        (max(0.0, core_start - overlap_seconds), min(duration, core_end + overlap_seconds), core_start, core_end)
+        for core_start, core_end in zip(cuts, cuts[1:])
+    ]
+
+def stitch(shards):
+    """
+    Merge the segments of overlapping shards into one transcript.
+    
+    A segment decoded by two shards is kept only by the shard whose core
+    contains its midpoint; a repeat of the previous segment's text that
+    overlaps it in time is dropped as well.
+    
+    Args:
+        shards (list): (core_start, core_end, segments) in shard order, with
+            segments in recording time
+    
+    Returns:
+        list: Segment dicts in recording time
+    """
+    stitched = []
+    for i, (core_start, core_end, segments) in enumerate(shards):
+        _stitch_shard(stitched, core_start, core_end, segments, last=i == len(shards) - 1)
+    return stitched
+
+def _stitch_shard(stitched, core_start, core_end, segments, last=False):
+    """Append one shard's segments to ``stitched`` and return those that were kept."""
+    kept = []
+    for seg in segments:
+        midpoint = (seg["start"] + seg["end"]) / 2
+        if midpoint < core_start or (midpoint >= core_end and not last):
+            continue
+        if stitched and seg["text"] == stitched[-1]["text"] and seg["start"] < stitched[-1]["end"]:
+            continue
+        stitched.append(seg)
+        kept.append(seg)
+    return kept
+
+def sharded_cache_key(audio_bytes, model_key, preprocessor, enable_preprocessing=None, enable_vad=None):
+    """Cache key of the stitched result of a whole upload under the given (or configured) settings."""
+    settings = cache_settings(
+        preprocessor,
+        Config.ENABLE_AUDIO_PREPROCESSING if enable_preprocessing is None else enable_preprocessing,
+        Config.ENABLE_VAD if enable_vad is None else enable_vad,
+        Config.ENABLE_BATCHED_DECODING, Config.ENABLE_WORD_TIMESTAMPS
+    )
+    settings.update(sharded=True, shard_seconds=Config.SHARD_SECONDS,
+                    shard_overlap_seconds=Config.SHARD_OVERLAP_SECONDS, shard_min_seconds=Config.SHARD_MIN_SECONDS)
+    return get_result_cache().make_key(audio_bytes, model_key, settings)
+
+def plan_upload(audio_bytes, model_key, enable_preprocessing=None, enable_vad=None):
+    """
+    Prepare an upload for sharded transcription.
+    
+    Looks the whole upload up in the result cache, and on a miss decodes
+    it and plans its shards. Recordings shorter than Config.SHARD_MIN_SECONDS
+    become a single shard without running VAD. This blocks for seconds on
+    long files, so callers run it off the event loop.
+    
+    Args:
+        audio_bytes (bytes): Encoded upload
+        model_key (str): Model the shards will use
+        enable_preprocessing (bool): Client setting the shards will use, defaults to config
+        enable_vad (bool): Client setting the shards will use, defaults to config
+    
+    Returns:
+        tuple: (cache_key, cached, audio, shards, timings) where cached is the
+            cached result (and audio and shards are None) on a hit, cache_key
+            is None when caching is disabled, and shards come from plan_shards()
+    """
+    preprocessor = get_thread_preprocessor()
+    cache_key = None
+    if Config.ENABLE_RESULT_CACHE:
+        cache_key = sharded_cache_key(audio_bytes, model_key, preprocessor, enable_preprocessing, enable_vad)
+        cached = get_result_cache().get(cache_key)
+        if cached is not None:
+            return cache_key, cached, None, None, {'audio': cached['duration']}
+    
+    stage_start = time.time()
+    audio = preprocessor.decode_bytes(audio_bytes)
+    duration = len(audio) / preprocessor.sample_rate
+    timings = {'audio': duration, 'preprocess': time.time() - stage_start}
+    
+    if duration < Config.SHARD_MIN_SECONDS:
+        return cache_key, None, audio, [(0.0, duration, 0.0, duration)], timings
+    
+    stage_start = time.time()
+    shards = plan_shards(duration, preprocessor.detect_speech_segments(audio))
+    timings['vad'] = time.time() - stage_start
+    return cache_key, None, audio, shards, timings
+
+def transcribe_sharded(pool, model_key, audio, shards, wait, on_progress=None, sample_rate=16000,
+                       enable_preprocessing=None, enable_vad=None):
+    """
+    Transcribe a long recording as parallel shards on the worker pool.
+    
+    At most one shard per worker is queued at a time, so a long recording
+    neither overflows the job queue nor starves other requests of it.
+    Results are collected in shard order, and ``on_progress`` receives each
+    stitched segment once every earlier shard has finished.
+    
+    Args:
+        pool (TranscriptionWorkerPool): Pool that transcribes the shards
+        model_key (str): Model to use
+        audio (np.ndarray): Mono float32 waveform at sample_rate
+        shards (list): Shards from plan_shards()
+        wait (callable): Waits for a worker Future and returns its result
+        on_progress (callable): Called with each segment as it is stitched
+        sample_rate (int): Rate of audio
+        enable_preprocessing (bool): Passed to every shard's job, defaults to config
+        enable_vad (bool): Passed to every shard's job, defaults to config
+    
+    Returns:
+        tuple: (result, cache_status, timings) where result is the
+            structured result of the whole recording
+    
+    Raises:
+        QueueFullError: If the job queue fills up with other work
+    """
+    start_time = time.time()
+    duration = len(audio) / sample_rate
+    logger.info(f"Transcribing {duration:.1f}s of audio as {len(shards)} shards")
+    
+    pending = deque(shards)
+    in_flight = deque()
+    statuses = []
+    segments = []
+    
+    def submit_next():
+        start, end, core_start, core_end = pending.popleft()
+        shard_audio = audio[int(start * sample_rate):int(end * sample_rate)]
+        future = pool.submit(model_key, 'transcribe_shard', shard_audio, start,
+                             enable_preprocessing=enable_preprocessing, enable_vad=enable_vad)
+        in_flight.append((core_start, core_end, future))
+    
+    while pending and len(in_flight) < pool.num_workers:
+        submit_next()
+    
+    while in_flight:
+        core_start, core_end, future = in_flight.popleft()
+        shard_result = wait(future)
+        if pending:
+            submit_next()
+        
+        statuses.append(shard_result['cache'])
+        last = not in_flight and not pending
+        for seg in _stitch_shard(segments, core_start, core_end, shard_result['result']['segments'], last):
+            if on_progress is not None:
+                on_progress(seg)
+    
+    if all(status == 'hit' for status in statuses):
+        cache_status = 'hit'
+    else:
+        cache_status = 'disabled' if 'disabled' in statuses else 'miss'
+    
+    # Shards preprocess and decode concurrently, so only the wall time is meaningful
+    timings = {'audio': duration, 'model': time.time() - start_time}
+    logger.info(f"Sharded transcription of {duration:.1f}s completed in {time.time() - start_time:.2f}s "
+                f"({duration / max(time.time() - start_time, 1e-6):.1f}x real-time)")
+    return build_result(segments, duration, model_key), cache_status, timings
@@ -0,0 +1,236 @@
+import logging
+import torch
+import torch.nn.functional as F
+from whisper.decoding import DecodingResult, DecodingTask
+from whisper.utils import compression_ratio
+
+logger = logging.getLogger(__name__)
+
+def compatible(target, draft):
+    """Whether draft can propose tokens for target: same vocabulary, languages and mel bins."""
+    return (
+        target.dims.n_vocab == draft.dims.n_vocab
+        and target.dims.n_mels == draft.dims.n_mels
+        and target.is_multilingual == draft.is_multilingual
+        and target.num_languages == draft.num_languages
+    )
+
+def _split_heads(t, n_head):
+    # (1, n_ctx, n_state) -> (1, n_head, n_ctx, n_state / n_head)
+    return t.view(1, t.shape[1], n_head, -1).transpose(1, 2)
+
+class _DecoderState:
+    """Self-attention keys/values of one decoder for the tokens fed so far."""
+    
+    def __init__(self, model, audio_features):
+        self.model = model
+        self.length = 0
+        self.keys = [None] * len(model.decoder.blocks)
+        self.values = [None] * len(model.decoder.blocks)
+        
+        # Cross-attention keys/values depend only on the audio; whisper reuses
+        # them from a kv_cache dict keyed by the projection modules
+        self.cross_cache = {}
+        for block in model.decoder.blocks:
+            attn = block.cross_attn
+            self.cross_cache[attn.key] = attn.key(audio_features)
+            self.cross_cache[attn.value] = attn.value(audio_features)
+        self.audio_features = audio_features
+    
+    def truncate(self, length):
+        self.length = min(self.length, length)
+    
+    def forward(self, tokens):
+        """
+        Run the decoder over tokens that follow the cached ones.
+        
+        Unlike whisper's own kv-cache path this accepts several new tokens
+        at once with the correct causal mask, which is what verifying a
+        draft in one pass needs.
+        
+        Args:
+            tokens (list): Token ids appended after the first self.length tokens
+        
+        Returns:
+            torch.Tensor: (len(tokens), n_vocab) logits, one row per new token
+        """
+        decoder = self.model.decoder
+        offset, n = self.length, len(tokens)
+        xa = self.audio_features
+        
+        x = torch.tensor([tokens], device=xa.device)
+        x = decoder.token_embedding(x) + decoder.positional_embedding[offset:offset + n]
+        x = x.to(xa.dtype)
+        
+        # Query j sees every cached position and the new positions up to j
+        mask = torch.ones(n, offset + n, dtype=torch.bool, device=xa.device).tril(diagonal=offset)
+        
+        for i, block in enumerate(decoder.blocks):
+            attn = block.attn
+            h = block.attn_ln(x)
+            q, k, v = attn.query(h), attn.key(h), attn.value(h)
+            if offset:
+                k = torch.cat([self.keys[i][:, :offset], k], dim=1)
+                v = torch.cat([self.values[i][:, :offset], v], dim=1)
+            self.keys[i], self.values[i] = k, v
+            
+            a = F.scaled_dot_product_attention(
+                _split_heads(q, attn.n_head), _split_heads(k, attn.n_head), _split_heads(v, attn.n_head),
+                attn_mask=mask
+            )
+            x = x + attn.out(a.transpose(1, 2).reshape(1, n, -1))
+            
+            x = x + block.cross_attn(block.cross_attn_ln(x), xa, kv_cache=self.cross_cache)[0]
+            x = x + block.mlp(block.mlp_ln(x))
+        
+        x = decoder.ln(x)
+        self.length = offset + n
+        return (x @ decoder.token_embedding.weight.to(x.dtype).T).float()[0]
+
+class SpeculativeDecoder:
+    """
+    Greedy Whisper decoding accelerated by a small draft model.
+    
+    The draft proposes a run of tokens one step at a time, which is cheap
+    for a tiny decoder; the target model then scores the whole run in one
+    forward pass and keeps the longest prefix that matches its own greedy
+    choices, plus its own token at the first mismatch. Both models apply
+    whisper's logit filters, and every kept token is the target's argmax
+    given the same prefix, so the output equals plain greedy decoding with
+    the target model up to floating-point rounding. Most of the target's
+    per-token passes, which on CPU cost a full read of the decoder weights
+    each, are replaced by one pass per accepted run.
+    
+    Windows are decoded one at a time, so this pays off for single windows
+    rather than batches, which the batched decoder already keeps busy.
+    """
+    
+    def __init__(self, model, draft_model, draft_tokens=5):
+        """
+        Args:
+            model (whisper.Whisper): Target model whose output is reproduced
+            draft_model (whisper.Whisper): Small model sharing the target's tokenizer
+            draft_tokens (int): Tokens proposed per verification pass
+        """
+        self.model = model
+        self.draft_model = draft_model
+        self.draft_tokens = max(1, draft_tokens)
+    
+    @torch.no_grad()
+    def decode(self, mel, options):
+        """
+        Decode a batch of mel windows, one window at a time.
+        
+        Args:
+            mel (torch.Tensor): (n_windows, n_mels, 3000) log-mel spectrograms
+            options (whisper.DecodingOptions): Greedy options (no beam search, temperature 0)
+        
+        Returns:
+            list: whisper.decoding.DecodingResult per window
+        """
+        if options.beam_size or options.temperature:
+            raise ValueError("Speculative decoding reproduces greedy decoding only")
+        
+        task = DecodingTask(self.model, options)
+        audio_features = task._get_audio_features(mel)
+        draft_features = self.draft_model.encoder(mel.to(self.draft_model.device))
+        
+        tokens = torch.tensor([task.initial_tokens]).repeat(len(mel), 1).to(audio_features.device)
+        languages, _ = task._detect_language(audio_features, tokens)
+        
+        results = []
+        accepted = proposed = 0
+        for i in range(len(mel)):
+            sampled, sum_logprob, no_speech_prob, stats = self._decode_one(
+                task, audio_features[i:i + 1], draft_features[i:i + 1], tokens[i].tolist()
+            )
+            accepted, proposed = accepted + stats[0], proposed + stats[1]
+            text = task.tokenizer.decode(sampled).strip()
+            results.append(DecodingResult(
+                audio_features=audio_features[i],
+                language=languages[i],
+                tokens=sampled,
+                text=text,
+                avg_logprob=sum_logprob / (len(sampled) + 1),
+                no_speech_prob=no_speech_prob,
+                temperature=0.0,
+                compression_ratio=compression_ratio(text)
+            ))
+        
+        if proposed:
+            logger.debug(f"Speculative decoding accepted {accepted}/{proposed} draft tokens")
+        return results
+    
+    def _decode_one(self, task, audio_features, draft_features, tokens):
+        eot = task.tokenizer.eot
+        sample_end = task.sample_begin + task.sample_len
+        target = _DecoderState(self.model, audio_features)
+        draft = _DecoderState(self.draft_model, draft_features)
+        
+        # Prefill: the target's row at the start-of-transcript token gives no_speech_prob
+        logits = target.forward(tokens)
+        no_speech_prob = logits[task.sot_index].softmax(-1)[task.tokenizer.no_speech].item()
+        next_logits = logits[-1]
+        
+        sum_logprob = 0.0
+        accepted_total = proposed_total = 0
+        while len(tokens) < sample_end:
+            # Draft a run greedily, feeding it whatever it has not seen yet
+            proposals = []
+            budget = min(self.draft_tokens, sample_end - len(tokens))
+            feed = tokens[draft.length:]
+            while len(proposals) < budget:
+                draft_logits = draft.forward(feed)[-1]
+                token = self._choose(task, draft_logits, tokens + proposals)[0]
+                proposals.append(token)
+                if token == eot:
+                    break
+                feed = [token]
+            
+            # One target pass scores every proposal
+            rows = [next_logits] + list(target.forward(proposals))
+            kept, matched = [], 0
+            for i, proposal in enumerate(proposals):
+                token, logprob = self._choose(task, rows[i], tokens + kept)
+                kept.append(token)
+                sum_logprob += logprob
+                if token != proposal or token == eot:
+                    break
+                matched += 1
+            else:
+                # Every proposal matched, so the target's next token comes free
+                if len(tokens) + len(kept) < sample_end:
+                    token, logprob = self._choose(task, rows[-1], tokens + kept)
+                    kept.append(token)
+                    sum_logprob += logprob
+            
+            start = len(tokens)
+            tokens = tokens + kept
+            accepted_total += matched
+            proposed_total += len(proposals)
+            
+            # Drop cached positions that hold rejected proposals
+            target.truncate(start + matched)
+            draft.truncate(start + matched)
+            if tokens[-1] == eot or len(tokens) >= sample_end:
+                break
+            
+            # The target has not seen the token it chose at the mismatch
+            next_logits = target.forward(tokens[target.length:])[-1]
+        
+        # Like whisper, the end-of-text log-probability counts but the token does not
+        sampled = tokens[task.sample_begin:]
+        if sampled and sampled[-1] == eot:
+            sampled = sampled[:-1]
+        return sampled, sum_logprob, no_speech_prob, (accepted_total, proposed_total)
+    
+    @staticmethod
+    def _choose(task, logits, prefix):
+        """Apply the task's logit filters and return (greedy token, its log-probability)."""
+        logits = logits.clone().unsqueeze(0)
+        prefix = torch.tensor([prefix], device=logits.device)
+        for logit_filter in task.logit_filters:
+            logit_filter.apply(logits, prefix)
+        logprobs = F.log_softmax(logits.float(), dim=-1)[0]
+        token = int(logprobs.argmax())
+        return token, logprobs[token].item()
@@ -0,0 +1,246 @@
+import time
+import logging
+from collections import deque
+import numpy as np
+from app import metrics
+from app.config import Config
+from app.transcription.batch_scheduler import MAX_CLIP_SAMPLES
+
+logger = logging.getLogger(__name__)
+
+class StreamingSession:
+    """
+    Incremental transcription state for a single live recording.
+    
+    Incoming PCM is appended to a preallocated rolling buffer. Each update
+    re-decodes only the unconfirmed tail (the audio after the last committed
+    segment), prompted with the committed text so context carries across
+    chunk boundaries. A segment is committed once two consecutive decodes
+    agree on it, after which its audio is dropped from the buffer.
+    
+    With a refine model the session runs in two tiers: the service's small
+    model produces the live results, and each committed stretch keeps its
+    audio so refine_pending() can re-transcribe it with the larger model.
+    """
+    
+    def __init__(self, recording_id, service, buffer_seconds=None, scheduler=None,
+                 refine_model=None, refine_scheduler=None, min_decode_seconds=None):
+        """
+        Initialize a session bound to a WhisperService.
+        
+        Args:
+            recording_id (str): Client-supplied recording identifier
+            service (WhisperService): Service whose model decodes the audio
+            buffer_seconds (int): Rolling buffer length, defaults to Config.STREAMING_BUFFER_SECONDS
+            scheduler (BatchScheduler): Decode tails through this micro-batcher instead of directly
+            refine_model (str): Model that re-transcribes committed stretches, None for one tier
+            refine_scheduler (BatchScheduler): Decodes the refinements
+            min_decode_seconds (float): New audio needed before re-decoding,
+                defaults to Config.STREAMING_MIN_DECODE_SECONDS
+        """
+        self.recording_id = recording_id
+        self.service = service
+        self.scheduler = scheduler
+        self.sample_rate = service.preprocessor.sample_rate
+        self.min_decode_seconds = Config.STREAMING_MIN_DECODE_SECONDS if min_decode_seconds is None else min_decode_seconds
+        
+        self.refine_model = refine_model
+        self.refine_scheduler = refine_scheduler
+        self.refinements = deque()  # committed stretches waiting for the refine model
+        self.refined = []           # refined text of each stretch, used as the next prompt
+        
+        buffer_seconds = buffer_seconds or Config.STREAMING_BUFFER_SECONDS
+        self.buffer = np.zeros(int(buffer_seconds * self.sample_rate), dtype=np.float32)
+        self.length = 0            # valid samples in the buffer
+        self.offset = 0            # absolute sample index of buffer[0]
+        self.pending = 0           # samples received since the last decode
+        
+        self.last_sequence = None  # sequence number of the last binary frame
+        self.decoder = None        # StreamingDecoder for WebM/Opus fragments, started on demand
+        
+        self.committed = []        # committed segment dicts
+        self.previous_hypothesis = []
+        self.next_segment_id = 0   # id of the next committed stretch
+        self.closed = False
+        self.started_at = time.time()
+    
+    @property
+    def committed_text(self):
+        return " ".join(seg["text"] for seg in self.committed)
+    
+    def push(self, audio):
+        """
+        Append audio and re-decode the unconfirmed tail when enough has arrived.
+        
+        Args:
+            audio (np.ndarray): Mono float32 samples at the service sample rate,
+                or int16 PCM, which is scaled while it is copied into the buffer
+        
+        Returns:
+            list: transcription_result payloads to emit (possibly empty)
+        """
+        events = []
+        
+        while len(audio):
+            free = len(self.buffer) - self.length
+            if free == 0:
+                # The tail filled the whole window without agreement: commit all of it
+                events.extend(self._decode(commit_all=True))
+                free = len(self.buffer)
+            
+            n = min(free, len(audio))
+            if audio.dtype == np.int16:
+                np.multiply(audio[:n], np.float32(1 / 32768.0), out=self.buffer[self.length:self.length + n], dtype=np.float32)
+            else:
+                self.buffer[self.length:self.length + n] = audio[:n]
+            self.length += n
+            self.pending += n
+            audio = audio[n:]
+        
+        if self.pending >= self.min_decode_seconds * self.sample_rate:
+            tail_seconds = self.length / self.sample_rate
+            events.extend(self._decode(force=tail_seconds >= Config.STREAMING_MAX_TAIL_SECONDS))
+        
+        return events
+    
+    def finish(self):
+        """
+        Decode whatever is left and commit it.
+        
+        Returns:
+            list: Final transcription_result payloads
+        """
+        events = self._decode(commit_all=True) if self.length else []
+        logger.info(f"Streaming session {self.recording_id} finished after "
+                    f"{time.time() - self.started_at:.1f}s with {len(self.committed)} segments")
+        return events
+    
+    def _decode(self, force=False, commit_all=False):
+        self.pending = 0
+        tail = self.buffer[:self.length]
+        prompt = self.committed_text[-Config.STREAMING_PROMPT_CHARS:] or None
+        
+        decode_start = time.time()
+        # Tails that fit one window can share a batched decode with other sessions
+        if self.scheduler is not None and len(tail) <= MAX_CLIP_SAMPLES:
+            hypothesis = self.scheduler.transcribe(self.service.model_key, tail.copy(), prompt, with_timestamps=True)
+        else:
+            result = self.service.model.transcribe(
+                tail,
+                initial_prompt=prompt,
+                condition_on_previous_text=False,
+                **self.service._transcribe_options()
+            )
+            hypothesis = [
+                {"start": seg["start"], "end": seg["end"], "text": seg["text"].strip()}
+                for seg in result["segments"] if seg["text"].strip()
+            ]
+        
+        metrics.MODEL_SECONDS.labels(self.service.model_key, Config.AUDIO_SOURCES['MICROPHONE']).observe(time.time() - decode_start)
+        
+        # Commit the prefix both decodes agree on; the last segment may still grow
+        if commit_all:
+            n_commit = len(hypothesis)
+        else:
+            n_commit = 0
+            for current, previous in zip(hypothesis[:-1], self.previous_hypothesis):
+                if current["text"] != previous["text"]:
+                    break
+                n_commit += 1
+            if force:
+                n_commit = max(n_commit, len(hypothesis) - 1)
+        
+        committed = [self._to_absolute(seg) for seg in hypothesis[:n_commit]]
+        partial = [self._to_absolute(seg) for seg in hypothesis[n_commit:]]
+        self.committed.extend(committed)
+        self.previous_hypothesis = hypothesis[n_commit:]
+        
+        events = []
+        if committed:
+            event = self._event(committed, is_final=True)
+            event["segment_id"] = self.next_segment_id
+            self.next_segment_id += 1
+            events.append(event)
+        
+        if commit_all:
+            n_drop = self.length
+        elif n_commit:
+            n_drop = int(hypothesis[n_commit - 1]["end"] * self.sample_rate)
+        else:
+            n_drop = 0
+        
+        if committed and self.refine_model is not None:
+            # The committed stretch runs from the start of the buffer to the drop point
+            event["provisional"] = True
+            self.refinements.append({
+                "segment_id": event["segment_id"],
+                "start": round(self.offset / self.sample_rate, 3),
+                "end": round((self.offset + min(n_drop, self.length)) / self.sample_rate, 3),
+                "audio": self.buffer[:n_drop].copy()
+            })
+        if n_drop:
+            self._drop(n_drop)
+        
+        if partial:
+            events.append(self._event(partial, is_final=False))
+        return events
+    
+    def refine_pending(self):
+        """
+        Re-transcribe the committed stretches queued so far with the refine model.
+        
+        Each stretch is decoded as a whole, prompted with the refined text
+        before it, so the larger model sees more context than the live
+        decodes did.
+        
+        Returns:
+            list: transcription_revision payloads, one per stretch
+        """
+        revisions = []
+        while self.refinements:
+            stretch = self.refinements.popleft()
+            prompt = " ".join(self.refined)[-Config.STREAMING_PROMPT_CHARS:] or None
+            
+            decode_start = time.time()
+            segments = []
+            for start in range(0, len(stretch["audio"]), MAX_CLIP_SAMPLES):
+                clip = stretch["audio"][start:start + MAX_CLIP_SAMPLES]
+                segments.extend(self.refine_scheduler.transcribe(self.refine_model, clip, prompt))
+            metrics.MODEL_SECONDS.labels(self.refine_model, Config.AUDIO_SOURCES['MICROPHONE']).observe(time.time() - decode_start)
+            
+            text = " ".join(seg["text"] for seg in segments)
+            self.refined.append(text)
+            revisions.append({
+                "recording_id": self.recording_id,
+                "segment_id": stretch["segment_id"],
+                "text": text,
+                "start": stretch["start"],
+                "end": stretch["end"],
+                "model": self.refine_model,
+                "is_final": True
+            })
+        return revisions
+    
+    def _drop(self, n_samples):
+        n_samples = min(n_samples, self.length)
+        remaining = self.length - n_samples
+        self.buffer[:remaining] = self.buffer[n_samples:self.length]
+        self.length = remaining
+        self.offset += n_samples
+    
+    def _to_absolute(self, seg):
+        base = self.offset / self.sample_rate
+        return {
+            "start": round(base + seg["start"], 3),
+            "end": round(base + seg["end"], 3),
+            "text": seg["text"]
+        }
+    
+    def _event(self, segments, is_final):
+        return {
+            "recording_id": self.recording_id,
+            "text": " ".join(seg["text"] for seg in segments),
+            "start": segments[0]["start"],
+            "end": segments[-1]["end"],
+            "is_final": is_final
+        }
@@ -0,0 +1,94 @@
+import time
+import logging
+import threading
+import multiprocessing
+import numpy as np
+from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+_state = {'status': 'pending', 'model': None, 'seconds': None, 'error': None}
+_state_lock = threading.Lock()
+
+def warm_up(model_key=None):
+    """
+    Load a model and run one dummy inference through the whole pipeline.
+    
+    The first real request would otherwise pay for importing torch, whisper
+    and librosa, loading the checkpoint, and the allocator and kernel
+    warm-up of the first forward pass.
+    
+    Args:
+        model_key (str): Model to warm up, defaults to Config.DEFAULT_WHISPER_MODEL
+    
+    Returns:
+        float: Seconds the warm-up took
+    """
+    from app.transcription.whisper_service import WhisperService
+    
+    start_time = time.time()
+    with WhisperService(model_key) as service:
+        preprocessor = service.preprocessor
+        # Quiet noise rather than zeros, so preprocessing and VAD take their usual paths
+        audio = (np.random.default_rng(0).standard_normal(preprocessor.sample_rate) * 0.01).astype(np.float32)
+        if service.enable_preprocessing:
+            preprocessor.preprocess(audio)
+        preprocessor.detect_speech_segments(audio)
+        service.decode_windows([audio])
+    
+    seconds = time.time() - start_time
+    logger.info(f"Warmed up model {service.model_key} in {seconds:.2f}s")
+    return seconds
+
+def start_warm_up(model_key=None):
+    """Warm up the default model (and start the worker pool) on a background thread."""
+    # Spawned workers re-import the parent's main module; only the parent may start a pool
+    if multiprocessing.parent_process() is not None:
+        return
+    
+    model_key = model_key or Config.DEFAULT_WHISPER_MODEL
+    with _state_lock:
+        if _state['status'] != 'pending':
+            return
+        _state.update(status='warming', model=model_key)
+    
+    threading.Thread(target=_run, args=(model_key,), daemon=True).start()
+
+def _run(model_key):
+    try:
+        if Config.ENABLE_WORKER_POOL:
+            # Workers warm up in their own processes while this one does
+            from app.transcription.worker_pool import get_worker_pool
+            get_worker_pool()
+        seconds = warm_up(model_key)
+        with _state_lock:
+            _state.update(status='ready', seconds=round(seconds, 2))
+    except Exception as e:
+        logger.error(f"Warm-up of model {model_key} failed: {str(e)}")
+        with _state_lock:
+            _state.update(status='failed', error=str(e))
+
+def readiness():
+    """
+    Report whether this server is warm enough to take traffic.
+    
+    Ready once the default model has been warmed up in this process and, if
+    the worker pool is enabled, every worker has warmed up too. When
+    PRELOAD_DEFAULT_MODEL is off the server is always ready.
+    
+    Returns:
+        tuple: (ready, details) where details is a JSON-serializable dict
+    """
+    with _state_lock:
+        details = dict(_state)
+    if not Config.PRELOAD_DEFAULT_MODEL:
+        details['status'] = 'ready'
+    
+    ready = details['status'] == 'ready'
+    if Config.PRELOAD_DEFAULT_MODEL and Config.ENABLE_WORKER_POOL:
+        from app.transcription.worker_pool import get_worker_stats
+        workers_ready = len(get_worker_stats())
+        details['workers'] = {'ready': workers_ready, 'total': Config.MAX_CONCURRENT_JOBS}
+        ready = ready and workers_ready >= Config.MAX_CONCURRENT_JOBS
+    
+    return ready, details
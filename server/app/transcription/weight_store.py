@@ -0,0 +1,121 @@
+import os
+import time
+import fcntl
+import logging
+import dataclasses
+from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+class WeightStore:
+    """
+    Local store of Whisper checkpoints converted for memory-mapped loading.
+    
+    Whisper's checkpoints hold fp16 weights that are unpickled and copied
+    into a freshly initialised fp32 model on every load. The store converts
+    each checkpoint once into a torch zip file holding the fp32 state dict
+    and the model dimensions. Loads then map that file read-only and assign
+    its tensors straight into a model built without allocating weights.
+    Pages come from the OS page cache, so every process on the host that
+    loads the same model shares one physical copy, and a cold load costs
+    page faults rather than a full deserialization.
+    
+    Only weights that are used as loaded stay shared: int8 quantization
+    packs new copies, and moving a model to CUDA copies it to the GPU.
+    """
+    
+    def __init__(self, store_dir=None):
+        """
+        Args:
+            store_dir (str): Directory for converted checkpoints, defaults to Config.MODEL_STORE_DIR
+        """
+        self.store_dir = store_dir or Config.MODEL_STORE_DIR
+        os.makedirs(self.store_dir, exist_ok=True)
+    
+    def path(self, load_name):
+        return os.path.join(self.store_dir, f"{load_name}.pt")
+    
+    def load(self, load_name, device="cpu"):
+        """
+        Load a model from the store, converting its checkpoint first if needed.
+        
+        Args:
+            load_name (str): Whisper model name, e.g. 'base.en'
+            device (str): Device to place the model on
+        
+        Returns:
+            whisper.Whisper: Model whose CPU weights are backed by the mapped file
+        """
+        import torch
+        import whisper
+        from whisper.model import ModelDimensions, Whisper
+        
+        path = self.path(load_name)
+        if not os.path.exists(path):
+            # Workers starting together convert once; the others wait and then map the result
+            with open(f"{path}.lock", "w") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                if not os.path.exists(path):
+                    self.convert(load_name)
+        
+        start_time = time.time()
+        checkpoint = torch.load(path, map_location="cpu", mmap=True, weights_only=True)
+        
+        # Build the module tree without allocating or initialising weights
+        with torch.device("meta"):
+            model = Whisper(ModelDimensions(**checkpoint["dims"]))
+        model.load_state_dict(checkpoint["model_state_dict"], assign=True)
+        
+        # Non-persistent buffers are not in the state dict and must be rebuilt
+        n_ctx = model.dims.n_text_ctx
+        model.decoder.mask = torch.empty(n_ctx, n_ctx).fill_(-float("inf")).triu_(1)
+        if load_name in whisper._ALIGNMENT_HEADS:
+            model.set_alignment_heads(whisper._ALIGNMENT_HEADS[load_name])
+        else:
+            # Whisper's default: every head in the second half of the decoder
+            heads = torch.zeros(model.dims.n_text_layer, model.dims.n_text_head, dtype=torch.bool)
+            heads[model.dims.n_text_layer // 2:] = True
+            model.register_buffer("alignment_heads", heads.to_sparse(), persistent=False)
+        
+        logger.info(f"Mapped {load_name} weights from {path} in {time.time() - start_time:.2f}s")
+        return model.to(device)
+    
+    def convert(self, load_name):
+        """
+        Convert a Whisper checkpoint into the store's mappable format.
+        
+        The file is written under a temporary name and renamed into place,
+        so a partly written conversion is never mapped.
+        
+        Args:
+            load_name (str): Whisper model name, e.g. 'base.en'
+        """
+        import torch
+        import whisper
+        
+        start_time = time.time()
+        model = whisper.load_model(load_name, device="cpu")
+        
+        path = self.path(load_name)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            torch.save({
+                "dims": dataclasses.asdict(model.dims),
+                "model_state_dict": model.state_dict()
+            }, tmp_path)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        
+        logger.info(f"Converted {load_name} checkpoint to {path} in {time.time() - start_time:.2f}s")
+
+_weight_store = None
+
+def get_weight_store():
+    """Return the process-wide weight store."""
+    global _weight_store
+    
+    if _weight_store is None:
+        _weight_store = WeightStore()
+    return _weight_store
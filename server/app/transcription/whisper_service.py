@@ -1,25 +1,70 @@
 import os
-import tempfile
 import time
 import logging
-import whisper
-import torch
-from app.audio.audio_preprocessor import AudioPreprocessor
+import functools
+from app.audio.audio_preprocessor import get_thread_preprocessor
+from app.audio.url_source import open_url, read_url, cache_validator
+from app.transcription.result_cache import get_result_cache
+from app.transcription.result_formats import build_result
+from app.transcription.model_registry import ModelRegistry
+from app.transcription.weight_store import get_weight_store
 from app.config import Config
 
 logger = logging.getLogger(__name__)
 
+# torch and whisper are imported inside the methods that use them: they take
+# seconds to import, and the app should answer health checks before that
+
+PRECISION_MODES = ('fp32', 'bf16', 'int8')
+
+def _bf16_autocast(forward):
+    """Wrap a module's forward to compute in bfloat16 and return fp32."""
+    import torch
+    
+    @functools.wraps(forward)
+    def wrapped(*args, **kwargs):
+        with torch.autocast('cpu', dtype=torch.bfloat16):
+            return forward(*args, **kwargs).float()
+    return wrapped
+
+def cache_settings(preprocessor, enable_preprocessing, enable_vad, enable_batching, word_timestamps):
+    """Settings that change the transcription of a given waveform, for result cache keys."""
+    return {
+        'preprocessing': enable_preprocessing,
+        'sample_rate': preprocessor.sample_rate,
+        'n_fft': preprocessor.n_fft,
+        'hop_length': preprocessor.hop_length,
+        'block_seconds': Config.PREPROCESS_BLOCK_SECONDS,
+        'url_block_seconds': Config.URL_BLOCK_SECONDS,
+        'vad': enable_vad,
+        'vad_aggressiveness': Config.VAD_AGGRESSIVENESS,
+        'vad_frame_ms': Config.VAD_FRAME_MS,
+        'vad_padding_ms': Config.VAD_PADDING_MS,
+        'vad_min_speech_ms': Config.VAD_MIN_SPEECH_MS,
+        'vad_merge_gap': Config.VAD_MERGE_GAP,
+        'vad_max_segment_duration': Config.VAD_MAX_SEGMENT_DURATION,
+        'batching': enable_batching,
+        'beam_size': Config.DECODE_BEAM_SIZE,
+        'english_only': Config.WHISPER_ENGLISH_ONLY,
+        'precision': Config.INFERENCE_PRECISION,
+        'word_timestamps': word_timestamps
+    }
+
 class WhisperService:
     """
     Service for transcribing audio using the open-source Whisper model.
-    Includes audio preprocessing but no caching for simplicity.
+    Includes audio preprocessing and a content-addressed result cache.
     """
     
-    # Class variable to store loaded models
-    _loaded_models = {}
-    
-    def __init__(self, model_key=None):
-        """Initialize the WhisperService with a specified model."""
+    def __init__(self, model_key=None, enable_preprocessing=None, enable_vad=None):
+        """
+        Initialize the WhisperService with a specified model.
+        
+        Args:
+            model_key (str): Model to use, defaults to Config.DEFAULT_WHISPER_MODEL
+            enable_preprocessing (bool): Defaults to Config.ENABLE_AUDIO_PREPROCESSING
+            enable_vad (bool): Defaults to Config.ENABLE_VAD
+        """
         # Use default model if none specified
         self.model_key = model_key or Config.DEFAULT_WHISPER_MODEL
         
@@ -27,7 +72,7 @@ class WhisperService:
         if self.model_key not in Config.WHISPER_MODELS:
             logger.warning(f"Invalid model key: {self.model_key}. Using default model instead.")
             self.model_key = Config.DEFAULT_WHISPER_MODEL
-            
+        
         # Get model info
         self.model_info = Config.WHISPER_MODELS[self.model_key]
         logger.info(f"Using Whisper model: {self.model_info['name']}")
@@ -35,31 +80,65 @@ class WhisperService:
         # Load the model
         self.model = self._get_model(self.model_key)
         
-        # Initialize audio preprocessor
-        self.preprocessor = AudioPreprocessor(sample_rate=16000)
+        # Small model that drafts tokens for speculative decoding, acquired on first use
+        self.draft_key = Config.SPECULATIVE_DRAFT_MODEL if Config.SPECULATIVE_DRAFT_MODEL in Config.WHISPER_MODELS else None
+        self.draft_model = None
+        
+        # Audio preprocessor shared with other services on this thread
+        self.preprocessor = get_thread_preprocessor(sample_rate=16000)
+        
+        # Preprocessing settings can be chosen per client; the rest come from config
+        self.enable_preprocessing = Config.ENABLE_AUDIO_PREPROCESSING if enable_preprocessing is None else enable_preprocessing
+        self.enable_vad = Config.ENABLE_VAD if enable_vad is None else enable_vad
+        self.enable_batching = Config.ENABLE_BATCHED_DECODING
+        self.word_timestamps = Config.ENABLE_WORD_TIMESTAMPS
+        
+        # Optional callable invoked with each segment as soon as it is decoded
+        self.progress_callback = None
         
-        # Load preprocessing settings from config
-        self.enable_preprocessing = Config.ENABLE_AUDIO_PREPROCESSING
-        self.enable_vad = Config.ENABLE_VAD
+        # Optional stand-in for decode_windows, e.g. a micro-batch scheduler's
+        self.window_decoder = None
+        self._kept = None   # intervals kept by silence trimming during transcribe_audio
         
-        logger.info(f"Audio preprocessing: {'Enabled' if self.enable_preprocessing else 'Disabled'}")
-        logger.info(f"Voice activity detection: {'Enabled' if self.enable_vad else 'Disabled'}")
+        # 'hit', 'miss' or 'disabled' for the most recent transcription
+        self.last_cache_status = 'disabled'
+        
+        # Seconds of audio and per-stage wall time of the most recent transcription
+        self.last_timings = {}
+        
+        # Structured result (segments, word timings, confidence) of the most recent transcription
+        self.last_result = None
+        
+        logger.debug(f"Audio preprocessing: {'Enabled' if self.enable_preprocessing else 'Disabled'}")
+        logger.debug(f"Voice activity detection: {'Enabled' if self.enable_vad else 'Disabled'}")
     
     @classmethod
     def _get_model(cls, model_key):
         """
-        Get or load a model. Caches models to avoid reloading.
+        Get a model from the shared registry, pinning it until close().
         
         Args:
             model_key (str): Key of the model to load
-            
+        
+        Returns:
+            whisper.Whisper: Loaded model
+        """
+        return model_registry.acquire(model_key)
+    
+    @staticmethod
+    def _load_model(model_key, precision=None):
+        """
+        Load a model from its checkpoint.
+        
+        Args:
+            model_key (str): Key of the model to load
+            precision (str): 'fp32', 'bf16' or 'int8', defaults to Config.INFERENCE_PRECISION
+        
         Returns:
             whisper.Whisper: Loaded model
         """
-        # Check if we've already loaded this model
-        if model_key in cls._loaded_models:
-            logger.info(f"Using cached model: {model_key}")
-            return cls._loaded_models[model_key]
+        import torch
+        import whisper
         
         # Check for CUDA availability
         device = "cuda" if torch.cuda.is_available() else "cpu"
@@ -72,171 +151,718 @@ class WhisperService:
         load_name = model_key
         if model_info['english_only'] and Config.WHISPER_ENGLISH_ONLY:
             load_name = f"{model_key}.en"
-            
+        
         # Load the model
         logger.info(f"Loading Whisper model: {load_name}")
         start_time = time.time()
-        model = whisper.load_model(load_name, device=device)
+        if Config.ENABLE_MAPPED_WEIGHTS:
+            model = get_weight_store().load(load_name, device=device)
+        else:
+            model = whisper.load_model(load_name, device=device)
+        model = WhisperService._apply_precision(model, precision or Config.INFERENCE_PRECISION, device)
         logger.info(f"Model loaded in {time.time() - start_time:.2f} seconds")
         
-        # Cache the model
-        cls._loaded_models[model_key] = model
+        return model
+    
+    @staticmethod
+    def _apply_precision(model, precision, device):
+        """
+        Convert a loaded fp32 model for reduced-precision CPU inference.
+        
+        'bf16' keeps fp32 weights and runs the encoder and decoder under
+        bfloat16 autocast, casting their outputs back to fp32 so whisper's
+        decoding code sees the dtype it expects. 'int8' replaces every
+        Linear layer with a dynamically quantized one; embeddings, convs and
+        layer norms stay in fp32.
+        
+        Args:
+            model (whisper.Whisper): Model loaded in fp32
+            precision (str): 'fp32', 'bf16' or 'int8'
+            device (str): Device the model was loaded on
         
+        Returns:
+            whisper.Whisper: Model ready for inference
+        """
+        import torch
+        import whisper
+        
+        if precision not in PRECISION_MODES:
+            raise ValueError(f"Unknown inference precision: {precision}")
+        if precision == 'fp32':
+            return model
+        if device != 'cpu':
+            logger.warning(f"Ignoring {precision} precision on {device}; decoding uses fp16 there")
+            return model
+        
+        if precision == 'bf16':
+            for module in (model.encoder, model.decoder):
+                module.forward = _bf16_autocast(module.forward)
+        else:
+            # quantize_dynamic only swaps exact nn.Linear instances; whisper's
+            # subclass differs only in casting weights to the input dtype
+            for module in model.modules():
+                if type(module) is whisper.model.Linear:
+                    module.__class__ = torch.nn.Linear
+            model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+        
+        logger.info(f"Using {precision} inference precision")
         return model
     
-    def transcribe_audio_file(self, file_path):
+    def close(self):
+        """Release this service's hold on its model so the registry may evict it."""
+        if self.model is not None:
+            model_registry.release(self.model_key)
+            self.model = None
+        if self.draft_model is not None:
+            model_registry.release(self.draft_key)
+            self.draft_model = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
+    def _transcribe_options(self):
+        """Decoding options shared by every transcription path."""
+        import torch
+        return {
+            "language": "en" if Config.WHISPER_ENGLISH_ONLY else None,
+            "task": "transcribe",
+            "fp16": torch.cuda.is_available()
+        }
+    
+    def transcribe_segments(self, audio, speech_segments=None):
         """
-        Transcribe an audio file with optional preprocessing.
+        Transcribe each speech region of a waveform exactly once.
+        
+        Every region is decoded from an in-memory slice of ``audio`` and the
+        resulting Whisper segments are shifted back onto the file timeline.
         
         Args:
-            file_path (str): Path to the audio file
+            audio (np.ndarray): Mono float32 waveform at 16kHz
+            speech_segments (list): (start, end) pairs in seconds, detected with VAD if omitted
+        
+        Returns:
+            list: Segment dicts with 'start', 'end' and 'text', in file time
+        """
+        if speech_segments is None:
+            speech_segments = self.preprocessor.detect_speech_segments(audio)
+        
+        sample_rate = self.preprocessor.sample_rate
+        options = self._transcribe_options()
+        segments = []
+        
+        for i, (start, end) in enumerate(speech_segments):
+            logger.info(f"Transcribing segment {i+1}/{len(speech_segments)}: {start:.2f}s to {end:.2f}s")
             
+            region = audio[int(start * sample_rate):int(end * sample_rate)]
+            segments.extend(self._transcribe_region(start, end, region, options))
+        
+        return segments
+    
+    def _transcribe_region(self, start, end, region, options):
+        result = self.model.transcribe(region, word_timestamps=self.word_timestamps, **options)
+        
+        segments = []
+        for seg in result["segments"]:
+            text = seg["text"].strip()
+            if not text:
+                continue
+            segments.append(self._shift_segment({
+                "start": seg["start"],
+                "end": seg["end"],
+                "text": text,
+                "avg_logprob": round(seg["avg_logprob"], 3),
+                "no_speech_prob": round(seg["no_speech_prob"], 3),
+                **({"words": seg["words"]} if "words" in seg else {})
+            }, start, end))
+        self._emit_segments(segments)
+        return segments
+    
+    @staticmethod
+    def _shift_segment(seg, offset, limit=None):
+        """Move a window-relative segment and its words onto the file timeline."""
+        def shift(t):
+            t = offset + t
+            return round(min(t, limit) if limit is not None else t, 3)
+        
+        seg["start"], seg["end"] = shift(seg["start"]), shift(seg["end"])
+        if "words" in seg:
+            seg["words"] = [
+                {"word": w["word"], "start": shift(w["start"]), "end": shift(w["end"]),
+                 "probability": round(w["probability"], 3)}
+                for w in seg["words"]
+            ]
+        return seg
+    
+    def _emit_segments(self, segments):
+        """Map freshly decoded segments back onto the untrimmed input, then report them."""
+        if self._kept is not None:
+            self._restore_times(segments, self._kept)
+        if self.progress_callback is None:
+            return
+        for seg in segments:
+            self.progress_callback(seg)
+    
+    def transcribe_batched(self, audio, speech_segments=None, batch_size=None):
+        """
+        Transcribe speech regions in batches of padded 30-second mel windows.
+        
+        Each batch goes through the encoder and the (greedy or beam) decoder in
+        a single forward pass, which keeps CPU matmuls busy where decoding one
+        region at a time would not. Regions must fit a single window, which
+        detect_speech_segments guarantees via VAD_MAX_SEGMENT_DURATION.
+        
+        Args:
+            audio (np.ndarray): Mono float32 waveform at 16kHz
+            speech_segments (list): (start, end) pairs in seconds, detected with VAD if omitted
+            batch_size (int): Windows per forward pass, defaults to Config.TRANSCRIBE_BATCH_SIZE
+        
         Returns:
-            str: Transcribed text
+            tuple: (segments, stats) where segments are dicts with 'start', 'end'
+                and 'text', and stats holds 'audio_seconds', 'wall_seconds'
+                and 'throughput' (audio-seconds per wall-second)
         """
-        try:
-            start_time = time.time()
-            logger.info(f"Starting transcription for: {file_path}")
+        if speech_segments is None:
+            speech_segments = self.preprocessor.detect_speech_segments(audio)
+        batch_size = batch_size or Config.TRANSCRIBE_BATCH_SIZE
+        
+        sample_rate = self.preprocessor.sample_rate
+        
+        segments = []
+        start_time = time.time()
+        
+        for batch_start in range(0, len(speech_segments), batch_size):
+            batch = [
+                (start, end, audio[int(start * sample_rate):int(end * sample_rate)])
+                for start, end in speech_segments[batch_start:batch_start + batch_size]
+            ]
+            segments.extend(self._decode_batch(batch))
+        
+        wall_seconds = time.time() - start_time
+        audio_seconds = sum(end - start for start, end in speech_segments)
+        stats = {
+            "audio_seconds": round(audio_seconds, 3),
+            "wall_seconds": round(wall_seconds, 3),
+            "throughput": round(audio_seconds / wall_seconds, 2) if wall_seconds > 0 else 0.0
+        }
+        logger.info(f"Batched decoding: {stats['audio_seconds']:.2f}s of audio in {stats['wall_seconds']:.2f}s "
+                    f"({stats['throughput']:.2f} audio-s/s, batch size {batch_size})")
+        
+        return segments, stats
+    
+    def _decoding_options(self, prompt=None, with_timestamps=False):
+        import whisper
+        return whisper.DecodingOptions(
+            **self._transcribe_options(),
+            beam_size=Config.DECODE_BEAM_SIZE or None,
+            prompt=prompt,
+            without_timestamps=not with_timestamps
+        )
+    
+    def decode_windows(self, windows, prompt=None, with_timestamps=False, word_timestamps=False):
+        """
+        Decode a batch of audio windows in a single encoder/decoder pass.
+        
+        Args:
+            windows (list): Mono float32 waveforms of at most 30 seconds each
+            prompt (str): Optional text prompt shared by every window
+            with_timestamps (bool): Split each window into timestamped segments
+            word_timestamps (bool): Align words to the audio (needs with_timestamps);
+                costs one teacher-forced forward pass per window, not a re-decode
+        
+        Returns:
+            list: One list per window of segment dicts with 'start', 'end'
+                (relative to the window), 'text', 'avg_logprob',
+                'no_speech_prob' and optionally 'words'; empty for windows
+                without speech
+        """
+        import torch
+        import whisper
+        
+        sample_rate = self.preprocessor.sample_rate
+        options = self._decoding_options(prompt=prompt, with_timestamps=with_timestamps)
+        
+        mel = torch.stack([
+            whisper.log_mel_spectrogram(whisper.pad_or_trim(window), n_mels=self.model.dims.n_mels)
+            for window in windows
+        ]).to(self.model.device)
+        
+        # Speculation decodes one window at a time, so batches of several keep the batched decoder
+        speculative = self._speculative_decoder() if len(windows) == 1 else None
+        if speculative is not None:
+            results = speculative.decode(mel, options)
+        else:
+            results = whisper.decode(self.model, mel, options)
+        
+        decoded = []
+        for i, (window, result) in enumerate(zip(windows, results)):
+            duration = len(window) / sample_rate
+            if result.no_speech_prob > 0.6 and result.avg_logprob < -1.0:
+                decoded.append([])
+                continue
             
-            # Apply preprocessing if enabled
-            if self.enable_preprocessing:
-                processed_path = self.preprocessor.preprocess_file(file_path)
-                file_path_to_use = processed_path
-                logger.info(f"Preprocessing completed in {time.time() - start_time:.2f}s")
+            if with_timestamps:
+                segments = self._segments_from_tokens(result.tokens, duration)
+                if word_timestamps:
+                    self._align_words(segments, mel[i], len(window))
             else:
-                file_path_to_use = file_path
+                text = result.text.strip()
+                segments = [{"start": 0.0, "end": round(duration, 3), "text": text}] if text else []
             
-            # Apply VAD if enabled
-            if self.enable_vad:
-                # Read the file
-                with open(file_path_to_use, 'rb') as f:
-                    audio_bytes = f.read()
-                
-                # Detect speech segments
-                segments = self.preprocessor.detect_voice_activity(audio_bytes)
-                
-                if segments:
-                    logger.info(f"Detected {len(segments)} speech segments")
-                    
-                    # Prepare to collect transcriptions from each segment
-                    segment_transcriptions = []
-                    
-                    for i, (start, end) in enumerate(segments):
-                        logger.info(f"Transcribing segment {i+1}/{len(segments)}: {start:.2f}s to {end:.2f}s")
-                        
-                        # Use Whisper's built-in timestamp feature
-                        options = {
-                            "language": "en" if Config.WHISPER_ENGLISH_ONLY else None,
-                            "task": "transcribe",
-                            "fp16": torch.cuda.is_available(),
-                            "time_stamps": True,  # Request timestamps in output
-                        }
-                        
-                        result = self.model.transcribe(file_path_to_use, **options)
-                        
-                        # Filter to segments within our VAD bounds
-                        filtered_segments = [
-                            seg for seg in result["segments"] 
-                            if (seg["start"] >= start and seg["end"] <= end) or
-                               (seg["start"] <= end and seg["end"] >= start)
-                        ]
-                        
-                        segment_text = " ".join([seg["text"] for seg in filtered_segments])
-                        segment_transcriptions.append(segment_text)
-                    
-                    # Combine all segment transcriptions
-                    transcription = " ".join(segment_transcriptions)
-                else:
-                    logger.warning("No speech segments detected, falling back to full transcription")
-                    options = {
-                        "language": "en" if Config.WHISPER_ENGLISH_ONLY else None,
-                        "task": "transcribe",
-                        "fp16": torch.cuda.is_available()
-                    }
-                    result = self.model.transcribe(file_path_to_use, **options)
-                    transcription = result["text"]
-            else:
-                # Standard transcription without VAD
-                options = {
-                    "language": "en" if Config.WHISPER_ENGLISH_ONLY else None,
-                    "task": "transcribe",
-                    "fp16": torch.cuda.is_available()
-                }
-                result = self.model.transcribe(file_path_to_use, **options)
-                transcription = result["text"]
+            for seg in segments:
+                seg.pop("tokens", None)
+                seg["avg_logprob"] = round(result.avg_logprob, 3)
+                seg["no_speech_prob"] = round(result.no_speech_prob, 3)
+            decoded.append(segments)
+        return decoded
+    
+    def _speculative_decoder(self):
+        """
+        Speculative decoder pairing this service's model with the draft model.
+        
+        Returns:
+            SpeculativeDecoder: Or None when speculative decoding is off or
+                cannot reproduce plain decoding (beam search, bf16 autocast,
+                a draft with a different tokenizer)
+        """
+        if self.draft_key is None or self.draft_key == self.model_key:
+            return None
+        if Config.DECODE_BEAM_SIZE or Config.INFERENCE_PRECISION == 'bf16':
+            return None
+        
+        from app.transcription.speculative import SpeculativeDecoder, compatible
+        
+        if self.draft_model is None:
+            self.draft_model = model_registry.acquire(self.draft_key)
+            if not compatible(self.model, self.draft_model):
+                logger.warning(f"Draft model {self.draft_key} does not share {self.model_key}'s tokenizer; "
+                               f"decoding without speculation")
+                model_registry.release(self.draft_key)
+                self.draft_model = self.draft_key = None
+                return None
+        return SpeculativeDecoder(self.model, self.draft_model, Config.SPECULATIVE_DRAFT_TOKENS)
+    
+    def _tokenizer(self):
+        import whisper
+        return whisper.tokenizer.get_tokenizer(
+            self.model.is_multilingual, num_languages=self.model.num_languages, task="transcribe"
+        )
+    
+    def _align_words(self, segments, mel, n_samples):
+        """Add window-relative 'words' to segments that still carry their 'tokens'."""
+        import whisper
+        
+        if not segments:
+            return
+        for seg in segments:
+            seg["seek"] = 0
+        whisper.timing.add_word_timestamps(
+            segments=segments,
+            model=self.model,
+            tokenizer=self._tokenizer(),
+            mel=mel,
+            num_frames=n_samples // whisper.audio.HOP_LENGTH,
+            last_speech_timestamp=0.0
+        )
+        for seg in segments:
+            seg.pop("seek")
+            seg["words"] = [
+                {"word": w["word"], "start": w["start"], "end": w["end"], "probability": w["probability"]}
+                for w in seg.get("words", [])
+            ]
+    
+    def _segments_from_tokens(self, tokens, duration):
+        """Split decoded tokens into segments at Whisper's timestamp tokens."""
+        tokenizer = self._tokenizer()
+        
+        segments = []
+        start = 0.0
+        text_tokens = []
+        for token in tokens:
+            if token < tokenizer.timestamp_begin:
+                text_tokens.append(token)
+                continue
+            
+            # Timestamp tokens count in 20ms steps
+            time_s = (token - tokenizer.timestamp_begin) * 0.02
+            if text_tokens:
+                text = tokenizer.decode(text_tokens).strip()
+                if text:
+                    segments.append({"start": round(start, 3), "end": round(min(time_s, duration), 3),
+                                     "text": text, "tokens": text_tokens})
+                text_tokens = []
+            start = time_s
+        
+        if text_tokens:
+            text = tokenizer.decode(text_tokens).strip()
+            if text:
+                segments.append({"start": round(start, 3), "end": round(duration, 3), "text": text, "tokens": text_tokens})
+        return segments
+    
+    def _decode_batch(self, batch):
+        """
+        Decode up to one batch of (start, end, audio) regions in a single forward pass.
+        
+        Returns:
+            list: Segment dicts with 'start', 'end' and 'text'
+        """
+        logger.info(f"Decoding batch of {len(batch)} segments starting at {batch[0][0]:.2f}s")
+        
+        # Captions need timings inside each region, so word timing implies timestamp tokens
+        decode_windows = self.window_decoder or self.decode_windows
+        windows = decode_windows(
+            [region for _, _, region in batch],
+            with_timestamps=self.word_timestamps,
+            word_timestamps=self.word_timestamps
+        )
+        
+        segments = []
+        for (start, end, _), decoded in zip(batch, windows):
+            segments.extend(self._shift_segment(seg, start, end) for seg in decoded)
+        self._emit_segments(segments)
+        return segments
+    
+    def transcribe_stream(self, regions, batch_size=None):
+        """
+        Transcribe speech regions as they arrive from a streaming source.
+        
+        Only one batch of regions is held at a time, so memory stays bounded
+        for arbitrarily long inputs.
+        
+        Args:
+            regions (iterable): (start, audio) pairs, start in seconds, each at most one window long
+            batch_size (int): Regions per forward pass, defaults to Config.TRANSCRIBE_BATCH_SIZE
+        
+        Yields:
+            dict: Segments with 'start', 'end' and 'text', in stream time
+        """
+        batch_size = batch_size or Config.TRANSCRIBE_BATCH_SIZE
+        sample_rate = self.preprocessor.sample_rate
+        transcribe_options = self._transcribe_options()
+        
+        batch = []
+        for start, region in regions:
+            end = start + len(region) / sample_rate
+            if not self.enable_batching:
+                yield from self._transcribe_region(start, end, region, transcribe_options)
+                continue
             
-            # Clean up temporary file if we created one
-            if self.enable_preprocessing and file_path_to_use != file_path:
-                os.unlink(file_path_to_use)
+            batch.append((start, end, region))
+            if len(batch) == batch_size:
+                yield from self._decode_batch(batch)
+                batch = []
+        
+        if batch:
+            yield from self._decode_batch(batch)
+    
+    def transcribe_audio(self, audio):
+        """
+        Transcribe a decoded waveform with optional preprocessing and VAD.
+        
+        The structured result is left in ``last_result``.
+        
+        Args:
+            audio (np.ndarray): Mono float32 waveform at 16kHz
+        
+        Returns:
+            str: Transcribed text
+        """
+        start_time = time.time()
+        duration = len(audio) / self.preprocessor.sample_rate
+        timings = self.last_timings = {'audio': duration}
+        
+        # Identical audio with identical settings is served from the cache
+        cache_key = None
+        self.last_cache_status = 'disabled'
+        if Config.ENABLE_RESULT_CACHE:
+            cache_key = get_result_cache().make_key(audio, self.model_key, self._cache_settings())
+            if self._cached(cache_key):
+                return self.last_result['text']
+        
+        # Apply preprocessing if enabled
+        kept = None
+        if self.enable_preprocessing:
+            stage_start = time.time()
+            audio, kept = self.preprocessor.preprocess(audio, return_kept=True)
+            timings['preprocess'] = time.time() - stage_start
+            logger.info(f"Preprocessing completed in {timings['preprocess']:.2f}s")
+        
+        options = self._transcribe_options()
+        
+        # Silence trimming shifts everything; segments are mapped back to times
+        # in the uploaded audio as they are decoded, before progress sees them
+        self._kept = kept
+        try:
+            segments = self._transcribe_preprocessed(audio, options, timings)
+        finally:
+            self._kept = None
+        
+        self.last_result = build_result(segments, duration, self.model_key)
+        transcription = self.last_result['text']
+        
+        if cache_key is not None:
+            get_result_cache().put(cache_key, self.last_result)
+        
+        # Log timing information
+        total_time = time.time() - start_time
+        timings['model'] = total_time - timings.get('preprocess', 0.0) - timings.get('vad', 0.0)
+        logger.info(f"Transcription completed in {total_time:.2f}s")
+        
+        return transcription
+    
+    def _transcribe_preprocessed(self, audio, options, timings):
+        """Run VAD (if enabled) and decode a preprocessed waveform into segments."""
+        if self.enable_vad:
+            # Detect speech segments
+            stage_start = time.time()
+            speech_segments = self.preprocessor.detect_speech_segments(audio)
+            timings['vad'] = time.time() - stage_start
             
-            # Log timing information
-            total_time = time.time() - start_time
-            logger.info(f"Transcription completed in {total_time:.2f}s")
+            if speech_segments:
+                logger.info(f"Detected {len(speech_segments)} speech segments")
+                if self.enable_batching:
+                    segments, _ = self.transcribe_batched(audio, speech_segments)
+                else:
+                    segments = self.transcribe_segments(audio, speech_segments)
+            else:
+                logger.warning("No speech segments detected, falling back to full transcription")
+                segments = self._transcribe_whole(audio, options)
+        else:
+            # Standard transcription without VAD
+            segments = self._transcribe_whole(audio, options)
+        return segments
+    
+    def _transcribe_whole(self, audio, options):
+        duration = len(audio) / self.preprocessor.sample_rate
+        if self.window_decoder is not None:
+            # Only clips of at most one window are handed a window decoder
+            return self._decode_batch([(0.0, duration, audio)]) if len(audio) else []
+        return self._transcribe_region(0.0, duration, audio, options)
+    
+    def _cache_settings(self):
+        """Settings that change the transcription of a given waveform."""
+        return cache_settings(self.preprocessor, self.enable_preprocessing, self.enable_vad,
+                              self.enable_batching, self.word_timestamps)
+    
+    def _cached(self, cache_key):
+        """Look up a result, leaving it in last_result on a hit and setting last_cache_status."""
+        cached = get_result_cache().get(cache_key)
+        if cached is None:
+            self.last_cache_status = 'miss'
+            return False
+        
+        self.last_cache_status = 'hit'
+        logger.info(f"Result cache hit for {cache_key}")
+        self.last_result = cached
+        self.last_timings['audio'] = cached['duration']
+        return True
+    
+    def _restore_times(self, segments, kept):
+        """Map segment and word times from trimmed audio back to the original, in place."""
+        times = [t for seg in segments for t in self._segment_times(seg)]
+        restored = iter(self.preprocessor.source_times(times, kept).round(3).tolist())
+        for seg in segments:
+            seg["start"], seg["end"] = next(restored), next(restored)
+            for word in seg.get("words", []):
+                word["start"], word["end"] = next(restored), next(restored)
+    
+    @staticmethod
+    def _segment_times(seg):
+        yield seg["start"]
+        yield seg["end"]
+        for word in seg.get("words", []):
+            yield word["start"]
+            yield word["end"]
+    
+    def transcribe_audio_file(self, file_path):
+        """
+        Transcribe an audio file with optional preprocessing.
+        
+        Args:
+            file_path (str): Path to the audio file
+        
+        Returns:
+            str: Transcribed text
+        """
+        try:
+            logger.info(f"Starting transcription for: {file_path}")
             
-            return transcription
+            # Long recordings are streamed through block preprocessing in bounded memory
+            if os.path.getsize(file_path) >= Config.CHUNKED_PREPROCESSING_MIN_BYTES:
+                self.last_cache_status = 'disabled'
+                return self._transcribe_blocks(self.preprocessor.stream_file(file_path))
             
+            return self.transcribe_audio(self.preprocessor.load_audio(file_path))
+        
         except Exception as e:
             logger.error(f"Error transcribing audio: {str(e)}")
             raise
     
-    def transcribe_audio_chunk(self, audio_chunk, temp_format="wav"):
+    def transcribe_shard(self, audio, offset):
+        """
+        Transcribe one shard of a longer recording.
+        
+        The shard goes through the normal pipeline, cache included; the
+        structured result in ``last_result`` is then moved onto the
+        recording's timeline.
+        
+        Args:
+            audio (np.ndarray): Mono float32 waveform at 16kHz
+            offset (float): Start of the shard in the recording, in seconds
+        
+        Returns:
+            str: Transcribed text of the shard
+        """
+        transcription = self.transcribe_audio(audio)
+        # Shift copies, so a cached result keeps shard-relative times
+        segments = [self._shift_segment(dict(seg), offset) for seg in self.last_result['segments']]
+        self.last_result = build_result(segments, self.last_result['duration'], self.model_key)
+        return transcription
+    
+    def _transcribe_blocks(self, blocks):
+        """
+        Transcribe a stream of decoded blocks in bounded memory.
+        
+        Blocks are denoised when preprocessing is enabled and cut into speech
+        regions when VAD is, then transcribed as the regions complete. The
+        structured result is left in ``last_result``.
+        
+        Args:
+            blocks (iterable): Mono float32 blocks at 16kHz
+        
+        Returns:
+            str: Transcribed text
+        """
+        start_time = time.time()
+        timings = self.last_timings = {'audio': 0.0, 'preprocess': 0.0}
+        
+        regions = self.preprocessor.preprocess_stream(
+            self._counted_blocks(blocks), denoise=self.enable_preprocessing, vad=self.enable_vad
+        )
+        segments = list(self.transcribe_stream(self._timed_stream(regions)))
+        self.last_result = build_result(segments, timings['audio'], self.model_key)
+        
+        # Stages interleave block by block; decoding and VAD count as preprocessing here
+        timings['model'] = time.time() - start_time - timings['preprocess']
+        logger.info(f"Block transcription of {timings['audio']:.1f}s of audio completed in {time.time() - start_time:.2f}s")
+        return self.last_result['text']
+    
+    def _counted_blocks(self, blocks):
+        for block in blocks:
+            self.last_timings['audio'] += len(block) / self.preprocessor.sample_rate
+            yield block
+    
+    def _timed_stream(self, regions):
+        """Add the time spent producing each region to last_timings['preprocess']."""
+        regions = iter(regions)
+        while True:
+            stage_start = time.time()
+            region = next(regions, None)
+            self.last_timings['preprocess'] += time.time() - stage_start
+            if region is None:
+                return
+            yield region
+    
+    def transcribe_audio_bytes(self, audio_bytes):
+        """
+        Transcribe an encoded audio file held in memory.
+        
+        Files of at least Config.CHUNKED_PREPROCESSING_MIN_BYTES are decoded
+        through an ffmpeg pipe and transcribed block by block, so the whole
+        waveform and its spectrogram are never held at once. Their results
+        are cached under the encoded bytes.
+        
+        Args:
+            audio_bytes (bytes): Encoded audio (WAV, MP3, WebM, ...)
+        
+        Returns:
+            str: Transcribed text
+        """
         try:
-            if self.enable_preprocessing:
-                processed_bytes = self.preprocessor.preprocess_bytes(audio_chunk)
-                chunk_to_use = processed_bytes
-            else:
-                chunk_to_use = audio_chunk
-            
-            with tempfile.NamedTemporaryFile(suffix=f".{temp_format}", delete=False) as temp_file:
-                temp_path = temp_file.name
-                temp_file.write(chunk_to_use)
+            logger.info(f"Starting transcription for {len(audio_bytes)} bytes of audio")
+            if len(audio_bytes) < Config.CHUNKED_PREPROCESSING_MIN_BYTES:
+                return self.transcribe_audio(self.preprocessor.decode_bytes(audio_bytes))
             
-            # Transcribe the file
-            transcription = self.transcribe_audio_file(temp_path)
-            
-            # Clean up
-            os.unlink(temp_path)
+            cache_key = None
+            self.last_cache_status = 'disabled'
+            self.last_timings = {'audio': 0.0}
+            if Config.ENABLE_RESULT_CACHE:
+                cache_key = get_result_cache().make_key(audio_bytes, self.model_key, self._cache_settings())
+                if self._cached(cache_key):
+                    return self.last_result['text']
             
+            transcription = self._transcribe_blocks(self.preprocessor.stream_bytes([audio_bytes]))
+            if cache_key is not None:
+                get_result_cache().put(cache_key, self.last_result)
             return transcription
-            
+        
+        except Exception as e:
+            logger.error(f"Error transcribing audio: {str(e)}")
+            raise
+    
+    def transcribe_audio_chunk(self, audio_chunk):
+        try:
+            return self.transcribe_audio_bytes(audio_chunk)
+        
         except Exception as e:
             logger.error(f"Error transcribing audio chunk: {str(e)}")
             raise
     
+    def transcribe_from_microphone(self, audio_data):
+        try:
+            return self.transcribe_audio_bytes(audio_data)
+        
+        except Exception as e:
+            logger.error(f"Error transcribing microphone audio: {str(e)}")
+            raise
+    
     def transcribe_from_url(self, url):
+        """
+        Transcribe a remote audio file while it downloads.
+        
+        The body streams into ffmpeg, decoded blocks stream through VAD (and
+        denoising when preprocessing is enabled), and speech regions are
+        transcribed as they complete, so the first segments are decoded
+        before the download ends. Size, time and domain limits from Config
+        are enforced on the stream. Results are cached under the URL and the
+        response's ETag or Last-Modified header; responses without either
+        are not cached.
+        
+        Args:
+            url (str): http(s) URL on an allowed domain
+        
+        Returns:
+            str: Transcribed text
+        """
         try:
-            logger.info(f"Downloading audio from URL: {url}")
-            
-            # Download the file with timeout
-            import requests
-            response = requests.get(
-                url, 
-                stream=True, 
-                timeout=300  # 5 minutes timeout
-            )
-            response.raise_for_status()
+            logger.info(f"Streaming audio from URL: {url}")
+            self.last_cache_status = 'disabled'
+            self.last_timings = {'audio': 0.0}
             
-            # Save to temporary file
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as temp_file:
-                temp_path = temp_file.name
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        temp_file.write(chunk)
-            
-            # Transcribe the downloaded file
-            transcription = self.transcribe_audio_file(temp_path)
-            
-            # Clean up
-            os.unlink(temp_path)
+            with open_url(url) as response:
+                cache_key = None
+                validator = cache_validator(response)
+                if Config.ENABLE_RESULT_CACHE and validator:
+                    cache_key = get_result_cache().make_url_key(response.url, validator, self.model_key, self._cache_settings())
+                    if self._cached(cache_key):
+                        return self.last_result['text']
+                
+                # The download overlaps with transcription and counts as preprocessing
+                blocks = self.preprocessor.stream_bytes(read_url(response), Config.URL_BLOCK_SECONDS)
+                transcription = self._transcribe_blocks(blocks)
             
+            if cache_key is not None:
+                get_result_cache().put(cache_key, self.last_result)
             return transcription
-            
+        
         except Exception as e:
             logger.error(f"Error transcribing from URL: {str(e)}")
             raise
     
     def process_real_time_audio(self, audio_stream, chunk_size=1024, sample_rate=16000):
-
+    
         # Buffer to accumulate audio chunks
         buffer = []
         buffer_duration_ms = 0
@@ -252,24 +878,15 @@ class WhisperService:
             if buffer_duration_ms >= target_duration_ms:
                 logger.info(f"Processing real-time audio chunk: {buffer_duration_ms/1000:.2f}s")
                 
-                # Concatenate chunks
-                audio_data = b''.join(buffer)
+                # Concatenate chunks into a 16-bit PCM waveform
+                audio = self.preprocessor.pcm16_to_float(b''.join(buffer), sample_rate)
                 
-                # Create a temporary file
-                with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as temp_file:
-                    temp_path = temp_file.name
-                    temp_file.write(audio_data)
-                
-                # Transcribe the temporary file
                 try:
-                    transcription = self.transcribe_audio_file(temp_path)
+                    transcription = self.transcribe_audio(audio)
                     yield transcription
                 except Exception as e:
                     logger.error(f"Error in real-time transcription: {str(e)}")
                     yield ""
-                finally:
-                    # Clean up the temporary file
-                    os.unlink(temp_path)
                 
                 # Reset buffer
                 buffer = []
@@ -278,4 +895,8 @@ class WhisperService:
     @classmethod
     def get_available_models(cls):
         """Get information about available models."""
-        return Config.WHISPER_MODELS
\ No newline at end of file
+        return Config.WHISPER_MODELS
+
+
+# Models shared by every WhisperService in this process
+model_registry = ModelRegistry(WhisperService._load_model)
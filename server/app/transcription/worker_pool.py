@@ -0,0 +1,288 @@
+import os
+import time
+import queue
+import atexit
+import logging
+import threading
+import itertools
+import multiprocessing
+from concurrent.futures import Future
+from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+# WhisperService methods a job may invoke inside a worker
+WORKER_METHODS = {
+    'transcribe_audio',
+    'transcribe_audio_bytes',
+    'transcribe_from_url',
+    'transcribe_from_microphone',
+    'transcribe_shard',
+}
+
+class QueueFullError(Exception):
+    """Raised when the job queue is at capacity and a job cannot be accepted."""
+    pass
+
+class WorkerCrashedError(Exception):
+    """Raised when the worker process running a job exits before finishing it."""
+    pass
+
+def _worker_main(worker_id, job_queue, result_queue, torch_threads):
+    """
+    Entry point of a worker process.
+    
+    Each worker caps torch's intra-op threads, warms up the default model
+    and then serves jobs until it receives the None sentinel.
+    """
+    import torch
+    from app.transcription.whisper_service import WhisperService, model_registry
+    from app.transcription.warm_up import warm_up
+    
+    torch.set_num_threads(torch_threads)
+    torch.set_num_interop_threads(1)
+    
+    # The first stats message doubles as this worker's readiness signal
+    warm_up()
+    result_queue.put((None, 'stats', (worker_id, model_registry.stats())))
+    logger.info(f"Worker {worker_id} ready (pid {os.getpid()}, {torch_threads} torch threads)")
+    
+    while True:
+        job = job_queue.get()
+        if job is None:
+            break
+        
+        job_id, model_key, method, args, settings = job
+        started_at = time.time()
+        # Tells the parent which job to fail if this process dies
+        result_queue.put((job_id, 'started', worker_id))
+        try:
+            # Each job gets its own service; models stay resident in the registry
+            # Preprocessing settings are the requesting client's
+            with WhisperService(model_key, settings['enable_preprocessing'], settings['enable_vad']) as service:
+                if settings['report_progress']:
+                    service.progress_callback = lambda segment: result_queue.put((job_id, 'progress', segment))
+                
+                result = getattr(service, method)(*args)
+                result_queue.put((job_id, 'result', {
+                    'transcription': result,
+                    'result': service.last_result,
+                    'cache': service.last_cache_status,
+                    'timings': service.last_timings,
+                    'started_at': started_at
+                }))
+        except Exception as e:
+            logger.error(f"Worker {worker_id} failed job {job_id}: {str(e)}")
+            result_queue.put((job_id, 'error', str(e)))
+        
+        # The parent reports each worker's registry on /metrics
+        result_queue.put((None, 'stats', (worker_id, model_registry.stats())))
+
+class TranscriptionWorkerPool:
+    """
+    Pool of worker processes that each hold loaded Whisper models.
+    
+    Jobs go through a bounded queue; submit raises QueueFullError instead of
+    queueing unbounded work, so callers can shed load. Results are delivered
+    through concurrent.futures.Future objects resolved by a collector thread.
+    The collector also watches the workers: when one dies, the job it held
+    fails with WorkerCrashedError and a replacement worker is started.
+    """
+    
+    def __init__(self, num_workers=None, torch_threads=None, max_queued_jobs=None, health_check_interval=1.0):
+        """
+        Start the worker processes.
+        
+        Args:
+            num_workers (int): Worker processes, defaults to Config.MAX_CONCURRENT_JOBS
+            torch_threads (int): Torch threads per worker, defaults to Config.WORKER_TORCH_THREADS
+            max_queued_jobs (int): Queue capacity, defaults to Config.MAX_QUEUED_JOBS
+            health_check_interval (float): Seconds between checks for dead workers
+        """
+        self.num_workers = num_workers or Config.MAX_CONCURRENT_JOBS
+        self.torch_threads = torch_threads or Config.WORKER_TORCH_THREADS
+        self.health_check_interval = health_check_interval
+        max_queued_jobs = max_queued_jobs or Config.MAX_QUEUED_JOBS
+        
+        # spawn avoids forking a parent that may already hold torch/OpenMP state
+        self._context = multiprocessing.get_context('spawn')
+        self.job_queue = self._context.Queue(maxsize=max_queued_jobs)
+        self.result_queue = self._context.Queue()
+        
+        self._futures = {}
+        self._submitted_at = {}
+        self._progress_callbacks = {}
+        self._worker_jobs = {}   # worker_id -> job_id it is running
+        self.worker_stats = {}
+        self._lock = threading.Lock()
+        self._job_ids = itertools.count()
+        self._closing = False
+        
+        self.workers = [self._start_worker(i) for i in range(self.num_workers)]
+        
+        self._collector = threading.Thread(target=self._collect_results, daemon=True)
+        self._collector.start()
+        
+        logger.info(f"Started {self.num_workers} transcription workers "
+                    f"({self.torch_threads} torch threads each, queue size {max_queued_jobs})")
+    
+    def submit(self, model_key, method, *args, on_progress=None, enable_preprocessing=None, enable_vad=None):
+        """
+        Queue a WhisperService call for a worker.
+        
+        Args:
+            model_key (str): Model the worker should use
+            method (str): Name of a method in WORKER_METHODS
+            *args: Positional arguments for the method (must be picklable)
+            on_progress (callable): Called from the collector thread with each decoded segment
+            enable_preprocessing (bool): Defaults to Config.ENABLE_AUDIO_PREPROCESSING
+            enable_vad (bool): Defaults to Config.ENABLE_VAD
+        
+        Returns:
+            Future: Resolves to a dict with the method's return value under
+                'transcription', the structured result under 'result', the
+                result cache status under 'cache', stage
+                timings under 'timings' and seconds spent queued under 'queue_wait'
+        
+        Raises:
+            QueueFullError: If the job queue is at capacity
+        """
+        if method not in WORKER_METHODS:
+            raise ValueError(f"Unsupported worker method: {method}")
+        
+        future = Future()
+        job_id = next(self._job_ids)
+        settings = {
+            'enable_preprocessing': Config.ENABLE_AUDIO_PREPROCESSING if enable_preprocessing is None else enable_preprocessing,
+            'enable_vad': Config.ENABLE_VAD if enable_vad is None else enable_vad,
+            'report_progress': on_progress is not None
+        }
+        
+        with self._lock:
+            self._futures[job_id] = future
+            self._submitted_at[job_id] = time.time()
+            if on_progress is not None:
+                self._progress_callbacks[job_id] = on_progress
+        try:
+            self.job_queue.put((job_id, model_key, method, args, settings), block=False)
+        except queue.Full:
+            with self._lock:
+                del self._futures[job_id]
+                del self._submitted_at[job_id]
+                self._progress_callbacks.pop(job_id, None)
+            raise QueueFullError("Transcription queue is full, try again later")
+        
+        return future
+    
+    def _start_worker(self, worker_id):
+        worker = self._context.Process(
+            target=_worker_main,
+            args=(worker_id, self.job_queue, self.result_queue, self.torch_threads),
+            daemon=True
+        )
+        worker.start()
+        return worker
+    
+    def _check_workers(self):
+        """Fail the job of every worker that has died and start a replacement."""
+        for worker_id, worker in enumerate(self.workers):
+            if worker.is_alive() or self._closing:
+                continue
+            
+            with self._lock:
+                job_id = self._worker_jobs.pop(worker_id, None)
+                future = self._futures.pop(job_id, None)
+                self._submitted_at.pop(job_id, None)
+                self._progress_callbacks.pop(job_id, None)
+                # The replacement is not ready until it has warmed up
+                self.worker_stats.pop(worker_id, None)
+            
+            logger.error(f"Worker {worker_id} (pid {worker.pid}) exited with code {worker.exitcode}"
+                         + (f" while running job {job_id}" if job_id is not None else "") + ", restarting it")
+            if future is not None and not future.done():
+                future.set_exception(WorkerCrashedError(
+                    f"Transcription worker exited with code {worker.exitcode} before finishing the job"
+                ))
+            self.workers[worker_id] = self._start_worker(worker_id)
+    
+    def _collect_results(self):
+        last_check = time.time()
+        while True:
+            # A busy queue never times out, so also check on a fixed schedule
+            if time.time() - last_check >= self.health_check_interval:
+                self._check_workers()
+                last_check = time.time()
+            try:
+                job_id, kind, payload = self.result_queue.get(timeout=self.health_check_interval)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                break
+            
+            if kind == 'started':
+                with self._lock:
+                    self._worker_jobs[payload] = job_id
+                continue
+            
+            if kind == 'stats':
+                worker_id, stats = payload
+                with self._lock:
+                    self.worker_stats[worker_id] = stats
+                continue
+            
+            if kind == 'progress':
+                with self._lock:
+                    callback = self._progress_callbacks.get(job_id)
+                if callback is not None:
+                    try:
+                        callback(payload)
+                    except Exception as e:
+                        logger.error(f"Progress callback failed for job {job_id}: {str(e)}")
+                continue
+            
+            with self._lock:
+                future = self._futures.pop(job_id, None)
+                submitted_at = self._submitted_at.pop(job_id, None)
+                self._progress_callbacks.pop(job_id, None)
+                for worker_id in [w for w, j in self._worker_jobs.items() if j == job_id]:
+                    del self._worker_jobs[worker_id]
+            if future is None or future.done():
+                continue
+            if kind == 'result':
+                payload['queue_wait'] = payload.pop('started_at') - submitted_at
+                future.set_result(payload)
+            else:
+                future.set_exception(RuntimeError(payload))
+    
+    def shutdown(self, timeout=5):
+        """Stop all workers, letting them finish the job in hand."""
+        self._closing = True
+        for _ in self.workers:
+            try:
+                self.job_queue.put(None, timeout=timeout)
+            except queue.Full:
+                break
+        for worker in self.workers:
+            worker.join(timeout)
+            if worker.is_alive():
+                worker.terminate()
+
+_worker_pool = None
+_worker_pool_lock = threading.Lock()
+
+def get_worker_pool():
+    """Return the process-wide worker pool, starting it on first use."""
+    global _worker_pool
+    
+    with _worker_pool_lock:
+        if _worker_pool is None:
+            _worker_pool = TranscriptionWorkerPool()
+            atexit.register(_worker_pool.shutdown)
+    return _worker_pool
+
+def get_worker_stats():
+    """Last registry stats reported by each worker, without starting the pool."""
+    if _worker_pool is None:
+        return {}
+    with _worker_pool._lock:
+        return dict(_worker_pool.worker_stats)
@@ -1,33 +1,235 @@
 import base64
 import logging
-from flask_socketio import emit
-from app import socketio
-from app.transcription import whisper_service
+from flask import session, request
+from flask_socketio import emit, join_room
+from app import metrics
+from app.config import Config
+from app.extensions import socketio, batch_scheduler
+from app.transcription.whisper_service import WhisperService
+from app.transcription.streaming_session import StreamingSession
+from app.transcription.job_store import job_store
+from app.audio.audio_frames import parse_audio_frame, frame_samples
+from app.audio.streaming_decoder import StreamingDecoder
 
 logger = logging.getLogger(__name__)
 
+# Live streaming sessions keyed by (socket session id, recording_id), so
+# clients that pick the same recording_id never share or close each
+# other's sessions, plus the recording_ids each socket has open
+streaming_sessions = {}
+sessions_by_sid = {}
+metrics.STREAMING_SESSIONS.set_function(lambda: len(streaming_sessions))
+
+def open_streaming_session(sid, recording_id, model_key=None):
+    """
+    Start a streaming session with its own service handle on the requested
+    model (or the model selected over HTTP), replacing any previous session
+    for the same client and recording.
+    
+    In two-tier mode the session decodes with the small STREAMING_FAST_MODEL
+    and a background task re-transcribes its committed stretches with the
+    requested model.
+    """
+    model_key = model_key or session.get('selected_model', Config.DEFAULT_WHISPER_MODEL)
+    close_streaming_session(sid, recording_id)
+    scheduler = batch_scheduler if Config.ENABLE_MICRO_BATCHING else None
+    
+    fast_key = Config.STREAMING_FAST_MODEL
+    if Config.ENABLE_TWO_TIER_STREAMING and fast_key in Config.WHISPER_MODELS and fast_key != model_key:
+        stream = StreamingSession(
+            recording_id, WhisperService(fast_key), scheduler=scheduler,
+            refine_model=model_key, refine_scheduler=batch_scheduler,
+            min_decode_seconds=Config.STREAMING_FAST_MIN_DECODE_SECONDS
+        )
+        socketio.start_background_task(refine_streaming_session, stream, sid)
+    else:
+        stream = StreamingSession(recording_id, WhisperService(model_key), scheduler=scheduler)
+    
+    streaming_sessions[(sid, recording_id)] = stream
+    sessions_by_sid.setdefault(sid, set()).add(recording_id)
+    return stream
+
+def refine_streaming_session(stream, sid, poll_interval=0.1):
+    """Emit transcription_revision events for a two-tier session until it closes and drains."""
+    while True:
+        try:
+            for revision in stream.refine_pending():
+                socketio.emit("transcription_revision", revision, to=sid)
+        except Exception as e:
+            logger.error(f"Error refining recording {stream.recording_id}: {e}")
+            metrics.record_error(Config.AUDIO_SOURCES['MICROPHONE'], 'refinement')
+        
+        if stream.closed and not stream.refinements:
+            return
+        socketio.sleep(poll_interval)
+
+def close_streaming_session(sid, recording_id):
+    stream = streaming_sessions.pop((sid, recording_id), None)
+    recordings = sessions_by_sid.get(sid)
+    if recordings is not None:
+        recordings.discard(recording_id)
+        if not recordings:
+            del sessions_by_sid[sid]
+    if stream is not None:
+        # Refinements already queued still run; the refine model is not held by the session
+        stream.closed = True
+        if stream.decoder is not None:
+            stream.decoder.close()
+        stream.service.close()
+    return stream
+
+def close_client_sessions(sid):
+    """Close every streaming session a disconnected client left open."""
+    for recording_id in list(sessions_by_sid.get(sid, ())):
+        close_streaming_session(sid, recording_id)
+
+def session_decoder(stream, audio_format):
+    """Start the recording's WebM decoder on its first WebM fragment."""
+    if audio_format != 'webm':
+        return None
+    if stream.decoder is None:
+        stream.decoder = StreamingDecoder(stream.sample_rate)
+    return stream.decoder
+
+def get_streaming_session(sid, recording_id):
+    stream = streaming_sessions.get((sid, recording_id))
+    if stream is None:
+        stream = open_streaming_session(sid, recording_id)
+    return stream
+
 @socketio.on('start_recording')
 def handle_start_recording(data):
     recording_id = data.get('recording_id', 'unknown')
     logger.info(f'Start recording: {recording_id}')
+    open_streaming_session(request.sid, recording_id, data.get('model'))
     socketio.emit('recording_started', {'status': 'success', 'recording_id': recording_id})
 
 @socketio.on('stop_recording')
 def handle_stop_recording(data):
     recording_id = data.get('recording_id', 'unknown')
     logger.info(f'Stop recording: {recording_id}')
+    finish_streaming_session(request.sid, recording_id)
     socketio.emit('recording_stopped', {'status': 'success', 'recording_id': recording_id})
 
+def finish_streaming_session(sid, recording_id):
+    """Flush a recording's decoder and session, emit the final results and close it."""
+    stream = streaming_sessions.get((sid, recording_id))
+    if stream is None:
+        return
+    
+    try:
+        # Samples still inside the WebM decoder belong to the end of the recording
+        if stream.decoder is not None:
+            decoder, stream.decoder = stream.decoder, None
+            for result in stream.push(decoder.close()):
+                emit("transcription_result", result)
+        for result in stream.finish():
+            emit("transcription_result", result)
+    except Exception as e:
+        logger.error(f"Error finishing recording {recording_id}: {e}")
+        metrics.record_error(Config.AUDIO_SOURCES['MICROPHONE'], 'streaming')
+        emit("transcription_result", {"recording_id": recording_id, "error": str(e)})
+    finally:
+        close_streaming_session(sid, recording_id)
+
+@socketio.on('audio_stream')
+def handle_audio_stream(fragment):
+    """
+    Receives MediaRecorder WebM/Opus fragments sent as raw binary. The
+    connection's session id identifies the recording, and every fragment
+    goes through the same persistent decoder.
+    """
+    recording_id = request.sid
+    try:
+        stream = get_streaming_session(request.sid, recording_id)
+        audio = session_decoder(stream, 'webm').feed(fragment)
+        for result in stream.push(audio):
+            emit("transcription_result", result)
+    
+    except Exception as e:
+        logger.error(f"Error processing audio stream: {e}")
+        metrics.record_error(Config.AUDIO_SOURCES['MICROPHONE'], 'streaming')
+        emit("transcription_result", {"recording_id": recording_id, "error": str(e)})
+
+@socketio.on('audio_stream_end')
+def handle_audio_stream_end():
+    logger.info(f'Audio stream ended: {request.sid}')
+    finish_streaming_session(request.sid, request.sid)
+
 @socketio.on('audio_chunk')
 def handle_audio_chunk(data):
     """
-    Receives audio chunks from WebSocket, processes them with Whisper, and returns transcription.
+    Receives audio chunks from WebSocket and feeds them into the recording's
+    streaming session, emitting partial and final transcription results.
     """
+    recording_id = data.get('recording_id', 'unknown')
     try:
-        audio_bytes = base64.b64decode(data["audio"])
-        transcription = whisper_service.transcribe_audio_chunk(audio_bytes)
-        emit("transcription_result", {"text": transcription})
+        stream = get_streaming_session(request.sid, recording_id)
+        
+        # Binary attachments arrive as bytes; older clients send base64 strings
+        audio_bytes = data["audio"]
+        if isinstance(audio_bytes, str):
+            audio_bytes = base64.b64decode(audio_bytes)
+        
+        # Only chunks marked as WebM belong to one continuous stream; chunks
+        # without a known format are complete files, decoded one by one
+        audio_format = data.get('format')
+        if audio_format not in ('pcm16', 'float32', 'webm'):
+            audio_format = None
+        audio = frame_samples(audio_bytes, audio_format, data.get('sample_rate'),
+                              stream.service.preprocessor, session_decoder(stream, audio_format))
+        
+        for result in stream.push(audio):
+            emit("transcription_result", result)
     
     except Exception as e:
-        logging.error(f"Error processing audio chunk: {e}")
-        emit("transcription_result", {"error": str(e)})
\ No newline at end of file
+        logger.error(f"Error processing audio chunk: {e}")
+        metrics.record_error(Config.AUDIO_SOURCES['MICROPHONE'], 'streaming')
+        emit("transcription_result", {"recording_id": recording_id, "error": str(e)})
+
+@socketio.on('audio_frame')
+def handle_audio_frame(frame):
+    """
+    Receives a binary audio frame (see app.audio.audio_frames for the layout)
+    and feeds its samples into the recording's streaming session without
+    base64 or JSON overhead. Duplicate and out-of-order frames are dropped.
+    """
+    recording_id = 'unknown'
+    try:
+        frame = parse_audio_frame(frame)
+        recording_id = frame.recording_id
+        stream = get_streaming_session(request.sid, recording_id)
+        
+        if stream.last_sequence is not None:
+            if frame.sequence <= stream.last_sequence:
+                logger.debug(f"Dropping stale frame {frame.sequence} for {recording_id}")
+                return
+            if frame.sequence != stream.last_sequence + 1:
+                logger.warning(f"Recording {recording_id} lost frames "
+                               f"{stream.last_sequence + 1}-{frame.sequence - 1}")
+        stream.last_sequence = frame.sequence
+        
+        audio = frame_samples(frame.payload, frame.format, frame.sample_rate,
+                              stream.service.preprocessor, session_decoder(stream, frame.format))
+        for result in stream.push(audio):
+            emit("transcription_result", result)
+    
+    except Exception as e:
+        logger.error(f"Error processing audio frame: {e}")
+        metrics.record_error(Config.AUDIO_SOURCES['MICROPHONE'], 'streaming')
+        emit("transcription_result", {"recording_id": recording_id, "error": str(e)})
+
+@socketio.on('subscribe_job')
+def handle_subscribe_job(data):
+    """
+    Join the room for an asynchronous job so its job_progress and
+    job_completed/job_failed events reach this client.
+    """
+    job_id = data.get('job_id')
+    job = job_store.describe(job_id) if job_id else None
+    if job is None:
+        emit('job_status', {'job_id': job_id, 'error': 'Job not found'})
+        return
+    
+    join_room(job_id)
+    emit('job_status', job)
\ No newline at end of file
@@ -0,0 +1,59 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from app.audio.audio_frames import FRAME_HEADER, FRAME_VERSION, parse_audio_frame, frame_samples
+
+def make_frame(recording_id, payload, format_code=0, sample_rate=16000, sequence=7, version=FRAME_VERSION):
+    encoded_id = recording_id.encode('utf-8')
+    padding = b'\0' * (-len(encoded_id) % 4)
+    return FRAME_HEADER.pack(version, format_code, len(encoded_id), sample_rate, sequence) + encoded_id + padding + payload
+
+class FakePreprocessor:
+    sample_rate = 16000
+    
+    def decode_bytes(self, audio_bytes):
+        return ('decoded', audio_bytes)
+
+def test_parses_header_fields_and_payload():
+    payload = np.arange(4, dtype='<i2').tobytes()
+    frame = parse_audio_frame(make_frame('rec-1', payload, format_code=0, sample_rate=48000, sequence=3))
+    
+    assert frame.recording_id == 'rec-1'
+    assert frame.format == 'pcm16'
+    assert frame.sample_rate == 48000
+    assert frame.sequence == 3
+    assert bytes(frame.payload) == payload
+
+def test_payload_is_aligned_and_not_copied():
+    samples = np.linspace(-1, 1, 8, dtype='<f4')
+    data = bytearray(make_frame('abc', samples.tobytes(), format_code=1))
+    frame = parse_audio_frame(data)
+    
+    # The recording id is padded so float32 samples can be viewed in place
+    assert (len(data) - len(frame.payload)) % 4 == 0
+    np.testing.assert_array_equal(np.frombuffer(frame.payload, dtype='<f4'), samples)
+    
+    data[-4:] = np.float32(5.0).tobytes()
+    assert np.frombuffer(frame.payload, dtype='<f4')[-1] == 5.0
+
+@pytest.mark.parametrize("frame, message", [
+    (b'\x01\x00', "shorter than its header"),
+    (make_frame('rec', b'', version=2), "version"),
+    (make_frame('rec', b'', format_code=9), "format"),
+    (make_frame('recording', b'')[:FRAME_HEADER.size + 4], "recording id"),
+])
+def test_rejects_malformed_frames(frame, message):
+    with pytest.raises(ValueError, match=message):
+        parse_audio_frame(frame)
+
+def test_pcm16_at_the_session_rate_is_a_view():
+    payload = bytearray(np.arange(6, dtype='<i2').tobytes())
+    samples = frame_samples(memoryview(payload), 'pcm16', 16000, FakePreprocessor())
+    
+    assert samples.dtype == np.int16
+    payload[0:2] = np.int16(-1).tobytes()
+    assert samples[0] == -1
+
+def test_unknown_format_is_decoded_as_a_complete_file():
+    assert frame_samples(b'RIFF', None, None, FakePreprocessor()) == ('decoded', b'RIFF')
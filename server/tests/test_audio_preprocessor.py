@@ -0,0 +1,129 @@
+import shutil
+import subprocess
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("webrtcvad")
+
+from app.audio.audio_preprocessor import AudioPreprocessor, needs_seekable_input
+
+SAMPLE_RATE = 16000
+FRAME = 480   # 30ms VAD frame
+
+class EnergyVad:
+    """Stands in for webrtcvad: any non-zero sample in a frame counts as speech."""
+    
+    def is_speech(self, frame, sample_rate):
+        return any(frame)
+
+@pytest.fixture
+def preprocessor():
+    preprocessor = AudioPreprocessor(sample_rate=SAMPLE_RATE)
+    preprocessor.vad = EnergyVad()
+    return preprocessor
+
+def burst(length, start, end):
+    y = np.zeros(length, dtype=np.float32)
+    y[start:end] = 0.5
+    return y
+
+def test_speech_run_is_padded(preprocessor):
+    y = burst(3 * SAMPLE_RATE, SAMPLE_RATE, 2 * SAMPLE_RATE)
+    intervals = preprocessor.speech_intervals(y, frame_duration_ms=30, padding_ms=210, min_speech_ms=90)
+    
+    # Frames 33-66 hold the burst; 7 frames of hangover on each side
+    assert intervals.tolist() == [[26 * FRAME, 74 * FRAME]]
+
+def test_short_runs_are_dropped(preprocessor):
+    y = burst(SAMPLE_RATE, 10 * FRAME, 12 * FRAME)
+    assert len(preprocessor.speech_intervals(y, frame_duration_ms=30, padding_ms=0, min_speech_ms=90)) == 0
+    assert preprocessor.speech_intervals(y, frame_duration_ms=30, padding_ms=0, min_speech_ms=0).tolist() == [
+        [10 * FRAME, 12 * FRAME]
+    ]
+
+def test_hangover_bridges_short_pauses(preprocessor):
+    y = burst(SAMPLE_RATE, 5 * FRAME, 10 * FRAME)
+    y[12 * FRAME:17 * FRAME] = 0.5
+    intervals = preprocessor.speech_intervals(y, frame_duration_ms=30, padding_ms=60, min_speech_ms=0)
+    assert intervals.tolist() == [[3 * FRAME, 19 * FRAME]]
+
+def test_intervals_end_at_the_signal(preprocessor):
+    y = burst(SAMPLE_RATE + 100, SAMPLE_RATE - FRAME, SAMPLE_RATE + 100)
+    intervals = preprocessor.speech_intervals(y, frame_duration_ms=30, padding_ms=210, min_speech_ms=0)
+    assert intervals[-1][1] == len(y)
+
+def test_silence_and_empty_input(preprocessor):
+    assert len(preprocessor.speech_intervals(np.zeros(SAMPLE_RATE, dtype=np.float32))) == 0
+    assert preprocessor.speech_intervals(np.zeros(0, dtype=np.float32)).shape == (0, 2)
+
+def denoise(preprocessor, y, block_sizes):
+    blocks, start = [], 0
+    for size in block_sizes:
+        blocks.append(y[start:start + size])
+        start += size
+    blocks.append(y[start:])
+    return np.concatenate(list(preprocessor._denoise_stream(blocks, normalize=False)))
+
+def test_denoise_stream_is_continuous_across_block_seams(preprocessor):
+    rng = np.random.default_rng(0)
+    y = (rng.standard_normal(5 * SAMPLE_RATE) * 0.1).astype(np.float32)
+    y[SAMPLE_RATE:3 * SAMPLE_RATE] += np.sin(np.arange(2 * SAMPLE_RATE) * 0.05).astype(np.float32)
+    
+    whole = denoise(preprocessor, y, [])
+    # The first block spans the noise-profile second; the rest cut at awkward sizes
+    pieces = denoise(preprocessor, y, [20000, 777, 1, 12345, 513, 2048])
+    
+    assert len(whole) == len(pieces) == len(y)
+    np.testing.assert_allclose(pieces, whole, atol=1e-5)
+
+def test_denoise_matches_full_stft_frames(preprocessor):
+    librosa = pytest.importorskip("librosa")
+    rng = np.random.default_rng(1)
+    y = (rng.standard_normal(3 * SAMPLE_RATE + 123) * 0.1).astype(np.float32)
+    
+    S = librosa.stft(y, n_fft=preprocessor.n_fft, hop_length=preprocessor.hop_length)
+    expected = (np.abs(S) ** 2).mean(axis=0)
+    
+    frame_power = preprocessor._denoise(y.copy())
+    assert frame_power.shape == expected.shape
+    np.testing.assert_allclose(frame_power, expected, rtol=1e-3, atol=1e-9)
+
+def test_preprocess_leaves_input_alone_by_default(preprocessor):
+    rng = np.random.default_rng(2)
+    y = (rng.standard_normal(2 * SAMPLE_RATE) * 0.1).astype(np.float32)
+    original = y.copy()
+    
+    preprocessor.preprocess(y)
+    np.testing.assert_array_equal(y, original)
+    
+    preprocessor.preprocess(y, copy=False)
+    assert not np.array_equal(y, original)
+
+@pytest.fixture(scope="module")
+def late_index_m4a(tmp_path_factory):
+    # ffmpeg's mp4 muxer writes the index after the audio unless asked for faststart;
+    # at this length the index is too far in to be found from a pipe
+    if shutil.which("ffmpeg") is None:
+        pytest.skip("ffmpeg is not installed")
+    path = tmp_path_factory.mktemp("audio") / "late.m4a"
+    subprocess.run([
+        "ffmpeg", "-nostdin", "-loglevel", "error", "-f", "lavfi", "-i", "sine=frequency=440:duration=300",
+        "-c:a", "aac", str(path)
+    ], check=True)
+    data = path.read_bytes()
+    assert data.find(b'moov') > data.find(b'mdat')
+    return data
+
+def test_mp4_containers_need_seekable_input():
+    assert needs_seekable_input(b'\0\0\0\x20ftypM4A ')
+    assert not needs_seekable_input(b'RIFF\0\0\0\0WAVE')
+    assert not needs_seekable_input(b'\x1aE\xdf\xa3')
+
+def test_decodes_m4a_with_index_at_end(preprocessor, late_index_m4a):
+    y = preprocessor.decode_bytes(late_index_m4a)
+    assert abs(len(y) - 300 * SAMPLE_RATE) < SAMPLE_RATE // 10
+
+def test_streams_m4a_with_index_at_end(preprocessor, late_index_m4a):
+    chunks = [late_index_m4a[i:i + 65536] for i in range(0, len(late_index_m4a), 65536)]
+    blocks = list(preprocessor.stream_bytes(chunks, block_seconds=30))
+    assert abs(sum(len(block) for block in blocks) - 300 * SAMPLE_RATE) < SAMPLE_RATE // 10
@@ -0,0 +1,80 @@
+import pytest
+
+pytest.importorskip("dotenv")
+
+from app.transcription import job_store as job_store_module
+from app.transcription.job_store import JobStore, JobStoreFullError, TranscriptionJob
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+    
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(job_store_module.time, 'time', clock)
+    return clock
+
+def test_finished_jobs_expire_after_ttl(clock):
+    store = JobStore(max_jobs=10, ttl=60)
+    done = store.create('base', 'file')
+    running = store.create('base', 'file')
+    store.complete(done.id, "text")
+    store.add_segment(running.id, {"start": 0.0, "end": 1.0, "text": "hi"})
+    
+    clock.now += 59
+    assert store.get(done.id) is done
+    
+    clock.now += 2
+    assert store.get(done.id) is None
+    # Unfinished jobs never expire
+    assert store.get(running.id).status == TranscriptionJob.RUNNING
+
+def test_full_store_evicts_oldest_finished_job(clock):
+    store = JobStore(max_jobs=2, ttl=60)
+    first = store.create('base', 'file')
+    second = store.create('base', 'file')
+    store.fail(first.id, "boom")
+    store.complete(second.id, "text")
+    
+    third = store.create('base', 'file')
+    assert store.get(first.id) is None
+    assert store.get(second.id) is second
+    assert store.get(third.id) is third
+
+def test_full_store_of_unfinished_jobs_rejects_new_ones(clock):
+    store = JobStore(max_jobs=1, ttl=60)
+    store.create('base', 'file')
+    with pytest.raises(JobStoreFullError):
+        store.create('base', 'file')
+
+def test_describe_returns_new_segments_only(clock):
+    store = JobStore(max_jobs=1, ttl=60)
+    job = store.create('base', 'url')
+    for i in range(3):
+        store.add_segment(job.id, {"start": float(i), "end": i + 1.0, "text": str(i)})
+    
+    snapshot = store.describe(job.id, since=2)
+    assert snapshot['progress'] == {'segments_completed': 3, 'processed_seconds': 3.0}
+    assert [seg['text'] for seg in snapshot['segments']] == ['2']
+    assert 'transcription' not in snapshot
+
+def test_zero_ttl_expires_finished_jobs_at_once(clock):
+    store = JobStore(max_jobs=1, ttl=0)
+    job = store.create('base', 'file')
+    store.complete(job.id, "text", {"text": "text"})
+    
+    clock.now += 0.001
+    assert store.describe_with_result(job.id) == (None, None)
+
+def test_describe_with_result_is_one_snapshot(clock):
+    store = JobStore(max_jobs=1, ttl=60)
+    job = store.create('base', 'file')
+    store.complete(job.id, "text", {"text": "text"})
+    
+    snapshot, result = store.describe_with_result(job.id)
+    assert snapshot['transcription'] == "text"
+    assert result == {"text": "text"}
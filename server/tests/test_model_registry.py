@@ -0,0 +1,95 @@
+import threading
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from app.config import Config
+from app.transcription.model_registry import ModelRegistry
+
+MB = 1024 * 1024
+
+@pytest.fixture
+def models(monkeypatch):
+    # Three 1MB fp32 "models" the registry sizes through their state dicts
+    specs = {key: {'memory_mb': 1} for key in ('a', 'b', 'c')}
+    monkeypatch.setattr(Config, 'WHISPER_MODELS', specs)
+    return specs
+
+def make_model(model_key):
+    return torch.nn.Linear(MB // 4, 1, bias=False)
+
+def test_evicts_least_recently_used_idle_model(models):
+    registry = ModelRegistry(make_model, budget_mb=2)
+    registry.acquire('a')
+    registry.release('a')
+    registry.acquire('b')
+    registry.release('b')
+    
+    # 'a' becomes the most recently used, so 'b' goes to make room for 'c'
+    registry.acquire('a')
+    registry.release('a')
+    registry.acquire('c')
+    
+    stats = registry.stats()
+    assert [m['model'] for m in stats['models']] == ['a', 'c']
+    assert stats['resident_mb'] == 2
+
+def test_pinned_models_are_never_evicted(models):
+    registry = ModelRegistry(make_model, budget_mb=2)
+    registry.acquire('a')
+    registry.acquire('b')
+    registry.acquire('c')
+    
+    # Over budget rather than evicting a model in use
+    assert [m['model'] for m in registry.stats()['models']] == ['a', 'b', 'c']
+    
+    registry.release('a')
+    registry.release('c')
+    registry.acquire('a')
+    assert [m['model'] for m in registry.stats()['models']] == ['b', 'c', 'a']
+
+def test_cached_model_is_not_reloaded(models):
+    registry = ModelRegistry(make_model, budget_mb=2)
+    first = registry.acquire('a')
+    assert registry.acquire('a') is first
+    assert registry.stats()['loads'] == {'a': 1}
+    assert registry.stats()['models'][0]['in_use'] == 2
+
+def test_loads_without_holding_the_lock(models):
+    started, finish = threading.Event(), threading.Event()
+    
+    def slow_loader(model_key):
+        started.set()
+        finish.wait(5)
+        return make_model(model_key)
+    
+    registry = ModelRegistry(slow_loader, budget_mb=2)
+    loads = [threading.Thread(target=registry.acquire, args=('a',)) for _ in range(2)]
+    for thread in loads:
+        thread.start()
+    assert started.wait(5)
+    
+    # stats() answers while the load is still running
+    assert registry.stats()['models'] == []
+    
+    finish.set()
+    for thread in loads:
+        thread.join(5)
+    stats = registry.stats()
+    assert stats['loads'] == {'a': 1}
+    assert stats['models'][0]['in_use'] == 2
+
+def test_failed_load_can_be_retried(models):
+    attempts = []
+    
+    def flaky_loader(model_key):
+        attempts.append(model_key)
+        if len(attempts) == 1:
+            raise RuntimeError("checkpoint unavailable")
+        return make_model(model_key)
+    
+    registry = ModelRegistry(flaky_loader, budget_mb=2)
+    with pytest.raises(RuntimeError):
+        registry.acquire('a')
+    registry.acquire('a')
+    assert registry.stats()['loads'] == {'a': 1}
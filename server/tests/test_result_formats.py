@@ -0,0 +1,42 @@
+import json
+from app.transcription.result_formats import build_result, render
+
+SEGMENTS = [
+    {"start": 0.0, "end": 2.5, "text": "Hello there."},
+    {"start": 3661.002, "end": 3662.25, "text": "An hour later."},
+]
+
+def rendered(output_format, document=None):
+    return "".join(render(document or {}, output_format, build_result(SEGMENTS, 3663.0, 'base')))
+
+def test_build_result_joins_segment_text():
+    result = build_result(SEGMENTS, 3663.0004, 'base')
+    assert result['text'] == "Hello there. An hour later."
+    assert result['duration'] == 3663.0
+    assert result['model'] == 'base'
+
+def test_srt():
+    assert rendered('srt') == (
+        "1\n00:00:00,000 --> 00:00:02,500\nHello there.\n\n"
+        "2\n01:01:01,002 --> 01:01:02,250\nAn hour later.\n\n"
+    )
+
+def test_vtt():
+    assert rendered('vtt') == (
+        "WEBVTT\n\n"
+        "00:00:00.000 --> 00:00:02.500\nHello there.\n\n"
+        "01:01:01.002 --> 01:01:02.250\nAn hour later.\n\n"
+    )
+
+def test_negative_times_are_clamped():
+    result = build_result([{"start": -0.2, "end": 1.0, "text": "Early."}])
+    assert "".join(render({}, 'srt', result)).startswith("1\n00:00:00,000 --> 00:00:01,000\n")
+
+def test_text():
+    assert rendered('text') == "Hello there.\nAn hour later.\n"
+
+def test_json_is_streamed_as_one_document():
+    document = json.loads(rendered('json', {'transcription': "Hello there. An hour later.", 'model_used': 'base'}))
+    assert document['model_used'] == 'base'
+    assert document['duration'] == 3663.0
+    assert document['segments'] == SEGMENTS
@@ -0,0 +1,65 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+from app.transcription.sharding import plan_shards, stitch
+
+def segment(start, end, text):
+    return {"start": start, "end": end, "text": text}
+
+def test_short_recording_is_one_shard():
+    assert plan_shards(100.0, [], shard_seconds=300, overlap_seconds=2) == [(0.0, 100.0, 0.0, 100.0)]
+
+def test_cores_tile_the_recording():
+    shards = plan_shards(1000.0, [], shard_seconds=300, overlap_seconds=2)
+    cores = [(core_start, core_end) for _, _, core_start, core_end in shards]
+    assert cores[0][0] == 0.0 and cores[-1][1] == 1000.0
+    assert all(prev[1] == nxt[0] for prev, nxt in zip(cores, cores[1:]))
+    
+    # Without pauses, cuts fall at the target length
+    assert [core_end for _, core_end in cores[:-1]] == [300.0, 600.0]
+
+def test_shards_overlap_at_cuts():
+    shards = plan_shards(1000.0, [], shard_seconds=300, overlap_seconds=2)
+    assert shards[0] == (0.0, 302.0, 0.0, 300.0)
+    assert shards[1][:2] == (298.0, 602.0)
+    assert shards[-1][1] == 1000.0
+
+def test_cut_goes_in_longest_pause():
+    speech = [(0.0, 200.0), (201.0, 340.0), (345.0, 500.0), (502.0, 1000.0)]
+    shards = plan_shards(1000.0, speech, shard_seconds=300, overlap_seconds=0)
+    
+    # The 5s pause at 340-345 beats the 1s and 2s ones
+    assert shards[0][3] == 342.5
+
+def test_pauses_outside_the_window_are_ignored():
+    speech = [(0.0, 100.0), (120.0, 1000.0)]
+    shards = plan_shards(1000.0, speech, shard_seconds=300, overlap_seconds=0)
+    assert shards[0][3] == 300.0
+
+def test_stitch_keeps_segment_in_core_of_its_midpoint():
+    shards = [
+        (0.0, 300.0, [segment(290.0, 296.0, "a"), segment(297.0, 303.0, "b")]),
+        (300.0, 600.0, [segment(297.2, 303.1, "b"), segment(304.0, 310.0, "c")]),
+    ]
+    assert [seg["text"] for seg in stitch(shards)] == ["a", "b", "c"]
+    assert stitch(shards)[1]["start"] == 297.2
+
+def test_stitch_drops_overlapping_repeat():
+    # Both shards place "b" in their own core, a few hundred ms apart
+    shards = [
+        (0.0, 300.0, [segment(295.0, 299.8, "b")]),
+        (300.0, 600.0, [segment(299.0, 301.2, "b"), segment(302.0, 305.0, "c")]),
+    ]
+    assert [seg["text"] for seg in stitch(shards)] == ["b", "c"]
+
+def test_stitch_keeps_repeated_text_that_does_not_overlap():
+    shards = [
+        (0.0, 300.0, [segment(10.0, 12.0, "yes")]),
+        (300.0, 600.0, [segment(310.0, 312.0, "yes")]),
+    ]
+    assert len(stitch(shards)) == 2
+
+def test_last_shard_keeps_segment_at_the_end():
+    shards = [(0.0, 10.0, [segment(9.0, 11.0, "end")])]
+    assert [seg["text"] for seg in stitch(shards)] == ["end"]
@@ -0,0 +1,60 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+torch = pytest.importorskip("torch")
+whisper = pytest.importorskip("whisper")
+
+from whisper.model import ModelDimensions, Whisper
+from app.transcription.speculative import SpeculativeDecoder, compatible
+
+def make_model(seed, n_text_layer, n_vocab=51864):
+    # Randomly initialised English-only models; a short text context keeps greedy runs short
+    torch.manual_seed(seed)
+    dims = ModelDimensions(
+        n_mels=80, n_audio_ctx=1500, n_audio_state=64, n_audio_head=2, n_audio_layer=1,
+        n_vocab=n_vocab, n_text_ctx=64, n_text_state=64, n_text_head=2, n_text_layer=n_text_layer
+    )
+    return Whisper(dims).eval()
+
+@pytest.fixture(scope="module")
+def models():
+    return make_model(0, n_text_layer=4), make_model(1, n_text_layer=1)
+
+@pytest.fixture(scope="module")
+def mel():
+    rng = np.random.default_rng(0)
+    t = np.arange(16000 * 5) / 16000
+    windows = [
+        (0.3 * np.sin(2 * np.pi * 220 * t) + 0.05 * rng.standard_normal(len(t))).astype(np.float32),
+        (0.1 * rng.standard_normal(16000 * 12)).astype(np.float32)
+    ]
+    return torch.stack([whisper.log_mel_spectrogram(whisper.pad_or_trim(w)) for w in windows])
+
+def test_draft_must_share_the_tokenizer(models):
+    target, draft = models
+    assert compatible(target, draft)
+    assert not compatible(target, make_model(2, n_text_layer=1, n_vocab=51865))
+
+@pytest.mark.parametrize("prompt", [None, "hello world, this is a test"])
+@pytest.mark.parametrize("with_timestamps", [False, True])
+def test_matches_plain_greedy_decoding(models, mel, prompt, with_timestamps):
+    target, draft = models
+    options = whisper.DecodingOptions(
+        language="en", fp16=False, prompt=prompt, without_timestamps=not with_timestamps
+    )
+    
+    expected = whisper.decode(target, mel, options)
+    actual = SpeculativeDecoder(target, draft, draft_tokens=4).decode(mel, options)
+    
+    assert [r.tokens for r in actual] == [r.tokens for r in expected]
+    assert [r.text for r in actual] == [r.text for r in expected]
+    for a, e in zip(actual, expected):
+        assert a.avg_logprob == pytest.approx(e.avg_logprob, abs=1e-4)
+        assert a.no_speech_prob == pytest.approx(e.no_speech_prob, abs=1e-4)
+
+def test_rejects_sampling_and_beam_search(models, mel):
+    decoder = SpeculativeDecoder(*models)
+    with pytest.raises(ValueError):
+        decoder.decode(mel, whisper.DecodingOptions(language="en", fp16=False, beam_size=2))
+    with pytest.raises(ValueError):
+        decoder.decode(mel, whisper.DecodingOptions(language="en", fp16=False, temperature=0.5))
@@ -0,0 +1,141 @@
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+
+pytest.importorskip("requests")
+
+from app.config import Config
+from app.audio.url_source import MAX_REDIRECTS, DownloadLimitError, url_error, open_url, read_url, cache_validator
+
+BODY = bytes(range(256)) * 1024   # 256KB, four read chunks
+
+REDIRECTS = {
+    # Same server, but under a host name that is not allowed
+    '/redirect': "http://localhost:{port}/audio.mp3",
+    '/redirect-allowed': "/audio.mp3",
+    '/redirect-loop': "/redirect-loop",
+}
+
+class AudioHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.requests.append((self.headers['Host'].split(':')[0], self.path))
+        if self.path in REDIRECTS:
+            self.send_response(302)
+            self.send_header('Location', REDIRECTS[self.path].format(port=self.server.server_address[1]))
+            self.end_headers()
+            return
+        
+        self.send_response(200)
+        self.send_header('ETag', '"v1"')
+        if self.path != '/unsized':
+            self.send_header('Content-Length', str(len(BODY)))
+        self.end_headers()
+        
+        if self.path == '/trickle':
+            # A byte at a time, well within the per-read timeout
+            try:
+                for i in range(200):
+                    self.wfile.write(BODY[i:i + 1])
+                    self.wfile.flush()
+                    time.sleep(0.05)
+            except OSError:
+                pass  # the client gave up
+            return
+        
+        # /slow trickles the body out; the others send it at once
+        pieces = 8 if self.path == '/slow' else 1
+        step = len(BODY) // pieces
+        for i in range(pieces):
+            self.wfile.write(BODY[i * step:(i + 1) * step])
+            self.wfile.flush()
+            if self.path == '/slow':
+                time.sleep(0.1)
+    
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setattr(Config, 'ALLOWED_URL_DOMAINS', ['127.0.0.1'])
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), AudioHandler)
+    httpd.daemon_threads = True
+    httpd.requests = []
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+@pytest.mark.parametrize("url, allowed", [
+    ("https://youtube.com/watch?v=1", True),
+    ("https://www.youtube.com/watch?v=1", True),
+    ("https://notyoutube.com/watch?v=1", False),
+    ("https://youtube.com.evil.org/a.mp3", False),
+    ("ftp://youtube.com/a.mp3", False),
+    ("file:///etc/passwd", False),
+    ("https:///a.mp3", False),
+])
+def test_url_error(monkeypatch, url, allowed):
+    monkeypatch.setattr(Config, 'ALLOWED_URL_DOMAINS', ['youtube.com', 'vimeo.com'])
+    assert (url_error(url) is None) == allowed
+
+def test_wildcard_allows_any_host(monkeypatch):
+    monkeypatch.setattr(Config, 'ALLOWED_URL_DOMAINS', ['*'])
+    assert url_error("https://example.org/a.mp3") is None
+
+@pytest.fixture
+def base_url(server):
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+def test_reads_whole_body(base_url):
+    with open_url(f"{base_url}/audio.mp3") as response:
+        assert cache_validator(response) == '"v1"'
+        assert b''.join(read_url(response)) == BODY
+
+def test_declared_size_over_limit(base_url):
+    with pytest.raises(DownloadLimitError):
+        open_url(f"{base_url}/audio.mp3", max_bytes=len(BODY) - 1)
+
+def test_streamed_size_over_limit(base_url):
+    with open_url(f"{base_url}/unsized", max_bytes=len(BODY) - 1) as response:
+        with pytest.raises(DownloadLimitError):
+            b''.join(read_url(response, max_bytes=len(BODY) - 1))
+
+def test_redirect_off_allowed_domains_is_never_requested(server, base_url):
+    with pytest.raises(ValueError):
+        open_url(f"{base_url}/redirect")
+    assert server.requests == [('127.0.0.1', '/redirect')]
+
+def test_redirect_on_allowed_domain_is_followed(server, base_url):
+    with open_url(f"{base_url}/redirect-allowed") as response:
+        assert b''.join(read_url(response)) == BODY
+    assert server.requests == [('127.0.0.1', '/redirect-allowed'), ('127.0.0.1', '/audio.mp3')]
+
+def test_redirect_hops_are_capped(server, base_url):
+    with pytest.raises(ValueError, match="Too many redirects"):
+        open_url(f"{base_url}/redirect-loop")
+    assert len(server.requests) == MAX_REDIRECTS + 1
+
+def test_deadline_excludes_consumer_time(base_url):
+    # The consumer is far slower than the allowed network time, which must not count
+    with open_url(f"{base_url}/audio.mp3") as response:
+        received = 0
+        for chunk in read_url(response, timeout=0.3):
+            received += len(chunk)
+            time.sleep(0.2)
+    assert received == len(BODY)
+
+def test_deadline_applies_to_network_time(base_url):
+    with open_url(f"{base_url}/slow") as response:
+        with pytest.raises(DownloadLimitError):
+            for _ in read_url(response, timeout=0.3):
+                pass
+
+def test_deadline_cuts_off_a_trickling_server(base_url):
+    # Each byte arrives well within the read timeout, and a whole chunk would take ten seconds
+    start = time.monotonic()
+    with open_url(f"{base_url}/trickle") as response:
+        with pytest.raises(DownloadLimitError):
+            for _ in read_url(response, timeout=0.3):
+                pass
+    assert time.monotonic() - start < 2